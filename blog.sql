@@ -517,6 +517,76 @@ alter table search_history
     add foreign key (user_id) references users
         on delete set null;
 
+create index if not exists idx_search_history_user_created
+    on search_history (user_id, created_at);
+
+-- 全文检索倒排索引
+create table if not exists search_index
+(
+    term       varchar(32)      not null,
+    article_id int              not null
+        references articles
+            on delete cascade,
+    weight     double precision not null default 1,
+    primary key (term, article_id)
+);
+
+create index if not exists idx_search_index_article_id
+    on search_index (article_id);
+
+-- 文章列表物化表（首页、精选、标签、分类），position 在列表内连续编号
+create table if not exists article_listing
+(
+    list_key   varchar(64) not null,
+    article_id int         not null,
+    position   int         not null,
+    primary key (list_key, article_id)
+);
+
+-- 同一列表内的位置唯一，并发维护时重复的位置会写入失败
+create unique index if not exists uix_article_listing_position
+    on article_listing (list_key, position);
+
+create index if not exists idx_article_listing_article_id
+    on article_listing (article_id);
+
+-- 标签及文章标签关联（由 articles.tags 规范化）
+create table if not exists tags
+(
+    id            serial
+        primary key,
+    name          varchar(64)                         not null
+        unique,
+    article_count integer   default 0                 not null,
+    created_at    timestamp default CURRENT_TIMESTAMP
+);
+
+create table if not exists article_tags
+(
+    article_id int not null,
+    tag_id     int not null
+        references tags
+            on delete cascade,
+    primary key (article_id, tag_id)
+);
+
+create index if not exists idx_article_tags_tag_id
+    on article_tags (tag_id);
+
+-- 用户空间统计（由各写入路径增量维护，调度器定期校正）
+create table if not exists user_stats
+(
+    user_id              integer not null
+        primary key,
+    articles_count       integer   default 0 not null,
+    followers_count      integer   default 0 not null,
+    following_count      integer   default 0 not null,
+    total_views          bigint    default 0 not null,
+    total_likes          bigint    default 0 not null,
+    unread_notifications integer   default 0 not null,
+    updated_at           timestamp default CURRENT_TIMESTAMP
+);
+
 create table if not exists upload_tasks
 (
     id              varchar(36) default gen_random_uuid() not null,
@@ -598,6 +668,18 @@ alter table user_sessions
 alter table user_sessions
     add unique (access_token);
 
+-- 已有会话补齐令牌摘要（PostgreSQL 11+）
+alter table user_sessions
+    add column if not exists access_token_digest varchar(64);
+
+update user_sessions
+set access_token_digest = encode(sha256(convert_to(access_token, 'UTF8')), 'hex')
+where access_token is not null
+  and access_token_digest is null;
+
+create unique index if not exists idx_user_sessions_access_token_digest
+    on user_sessions (access_token_digest);
+
 alter table user_sessions
     add unique (refresh_token);
 
@@ -4,6 +4,7 @@ import logging
 import mimetypes
 import os
 import urllib.parse
+import uuid
 from datetime import datetime
 from decimal import Decimal
 
@@ -14,6 +15,7 @@ from src.database import get_db
 from src.extensions import csrf
 from src.models import Media, FileHash, User, db
 from src.setting import app_config
+from src.upload.instant_upload import create_challenge, verify_challenge
 
 logger = logging.getLogger(__name__)
 
@@ -770,7 +772,7 @@ def register_plugin(app):
 
         def handle_put_file(self, filename, user_info):
             """Handle file upload"""
-            global temp_file_path
+            temp_file_path = None
             try:
                 original_filename = urllib.parse.unquote(filename)
                 total_size, used_size, free_size = get_disk_usage(user_info)
@@ -779,9 +781,16 @@ def register_plugin(app):
                 if content_length > free_size:
                     return self.error_response(507, "Insufficient Storage")
 
+                # 秒传协商，不读取请求体
+                if request.headers.get('X-Instant-Challenge'):
+                    return self.handle_instant_put(original_filename, user_info)
+                if request.headers.get('X-File-Hash') and content_length == 0:
+                    return self.handle_instant_negotiate(original_filename, user_info, free_size)
+
                 # 使用流式上传避免内存问题
                 file_hash = hashlib.sha256()
-                temp_file_path = os.path.join(self.temp_dir, f"temp_upload_{user_info['id']}_{original_filename}")
+                # 临时文件名与文件名无关，并发上传同名文件互不影响
+                temp_file_path = os.path.join(self.temp_dir, f"{uuid.uuid4().hex}.part")
 
                 with open(temp_file_path, 'wb') as f:
                     while True:
@@ -795,6 +804,9 @@ def register_plugin(app):
 
                 # 获取文件大小
                 file_size = os.path.getsize(temp_file_path)
+                if file_size == 0:
+                    os.remove(temp_file_path)
+                    return self.bad_request("Empty file content")
 
                 with get_db() as db:
                     existing_hash = db.query(FileHash).filter(FileHash.hash == file_hash_value).first()
@@ -805,16 +817,11 @@ def register_plugin(app):
                             Media.hash == file_hash_value
                         ).first()
 
+                        os.remove(temp_file_path)  # 文件已存储，删除临时文件
                         if existing_media:
-                            os.remove(temp_file_path)  # 删除临时文件
                             return self.error_response(409, "File already exists")
 
-                        # 移动文件到正确位置
-                        hash_dir = os.path.join(self.upload_dir, file_hash_value[:2])
-                        os.makedirs(hash_dir, exist_ok=True)
-                        final_path = os.path.join(hash_dir, file_hash_value)
-                        os.rename(temp_file_path, final_path)
-
+                        existing_hash.reference_count += 1
                         new_media = Media(
                             user_id=user_info['id'],
                             original_filename=original_filename,
@@ -833,7 +840,6 @@ def register_plugin(app):
                         final_path = os.path.join(hash_dir, file_hash_value)
                         os.rename(temp_file_path, final_path)
 
-                        import mimetypes
                         mime_type, _ = mimetypes.guess_type(original_filename)
 
                         new_file_hash = FileHash(
@@ -862,10 +868,68 @@ def register_plugin(app):
             except Exception as e:
                 logger.error(f"File upload error: {e}", exc_info=True)
                 # 清理临时文件
-                if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
+                if temp_file_path and os.path.exists(temp_file_path):
                     os.remove(temp_file_path)
                 return self.error_response(500, f"Upload failed: {str(e)}")
 
+        def handle_instant_negotiate(self, filename, user_info, free_size):
+            """
+            秒传第一步：请求头 X-File-Hash 与 X-File-Size 给出完整文件的 SHA-256 与大小，请求体为空
+            文件已存在时返回 202，X-Instant-Challenge 为挑战令牌，X-Instant-Ranges 为抽样区间（偏移:长度，逗号分隔）；
+            否则返回 412，客户端改为上传文件内容
+            """
+            try:
+                file_size = int(request.headers.get('X-File-Size', ''))
+            except ValueError:
+                return self.bad_request("Invalid X-File-Size")
+            if file_size > free_size:
+                return self.error_response(507, "Insufficient Storage")
+
+            challenge = create_challenge(user_info['id'], filename, file_size,
+                                         request.headers['X-File-Hash'].strip().lower())
+            if challenge is None:
+                return self.error_response(412, "File content required")
+            return Response(
+                status=202,
+                headers={
+                    'X-Instant-Challenge': challenge['challenge'],
+                    'X-Instant-Ranges': ','.join(f"{offset}:{length}" for offset, length in challenge['ranges'])
+                }
+            )
+
+        def handle_instant_put(self, filename, user_info):
+            """秒传第二步：请求头 X-Instant-Samples 为各抽样区间的 SHA-256（逗号分隔），校验通过后创建媒体记录"""
+            sample_hashes = [h.strip() for h in request.headers.get('X-Instant-Samples', '').split(',') if h.strip()]
+            meta = verify_challenge(user_info['id'], request.headers['X-Instant-Challenge'], sample_hashes)
+            if meta is None or meta['filename'] != filename:
+                return self.error_response(412, "Instant upload verification failed")
+
+            file_hash_value = meta['file_hash']
+            with get_db() as db:
+                existing_hash = db.query(FileHash).filter(FileHash.hash == file_hash_value).first()
+                if not existing_hash:
+                    return self.error_response(412, "File content required")
+
+                existing_media = db.query(Media).filter(
+                    Media.user_id == user_info['id'],
+                    Media.hash == file_hash_value
+                ).first()
+                if existing_media:
+                    return self.error_response(409, "File already exists")
+
+                existing_hash.reference_count += 1
+                db.add(Media(
+                    user_id=user_info['id'],
+                    original_filename=filename,
+                    hash=file_hash_value
+                ))
+                db.commit()
+
+            return Response(
+                status=201,
+                headers={'ETag': f'"{file_hash_value}"'}
+            )
+
         @staticmethod
         def generate_xml_response(items, safe_date_string):
             """Generate WebDAV XML response from a list of items"""
@@ -1190,54 +1254,9 @@ def register_plugin(app):
                     if len(path_parts) < 2:
                         return self.bad_request()
 
+                    # 流式写入，并支持秒传协商
                     filename = '/'.join(path_parts[1:])
-                    original_filename = urllib.parse.unquote(filename)
-                    file_data = request.get_data()
-
-                    if not file_data:
-                        return self.bad_request("Empty file content")
-
-                    # 计算文件哈希
-                    file_hash = hashlib.sha256(file_data).hexdigest()
-                    file_size = len(file_data)
-                    mime_type = mimetypes.guess_type(original_filename)[0] or 'application/octet-stream'
-
-                    with get_db() as db_session:
-                        # 检查文件是否已存在
-                        file_hash_record = db_session.query(FileHash).filter_by(hash=file_hash).first()
-
-                        if not file_hash_record:
-                            # 存储文件
-                            storage_dir = os.path.join(self.base_dir, 'hashed_files', file_hash[:2], file_hash[2:4])
-                            os.makedirs(storage_dir, exist_ok=True)
-                            storage_path = os.path.join(storage_dir, file_hash)
-
-                            with open(storage_path, 'wb') as f:
-                                f.write(file_data)
-
-                            # 创建FileHash记录
-                            file_hash_record = FileHash(
-                                hash=file_hash,
-                                filename=original_filename,
-                                file_size=file_size,
-                                mime_type=mime_type,
-                                storage_path=storage_path
-                            )
-                            db_session.add(file_hash_record)
-                        else:
-                            # 增加引用计数
-                            file_hash_record.reference_count += 1
-
-                        # 创建Media记录
-                        media = Media(
-                            user_id=user_info['id'],
-                            hash=file_hash,
-                            original_filename=original_filename
-                        )
-                        db_session.add(media)
-                        db_session.commit()
-
-                        return Response(status=201)
+                    return self.handle_put_file(filename, user_info)
 
                 elif method == 'DELETE':
                     # 处理文件删除
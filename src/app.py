@@ -6,17 +6,18 @@ import logging
 import os
 from datetime import datetime, timezone
 
-from flask import Flask, g
+from flask import Flask, g, request
 from flask import jsonify
 from flask_principal import identity_loaded, RoleNeed
 from werkzeug.exceptions import NotFound
 
 from src.auth_utils import jwt_required
+from src.blog.article.render import article_html_filter
 from src.blueprints.admin_vip import admin_vip_bp
 from src.blueprints.api import api_bp
 from src.blueprints.auth_view import auth_bp
-from src.blueprints.blog import blog_bp, get_site_beian, get_site_title, get_site_domain, get_username_no_check, \
-    get_site_menu, get_current_menu_slug, get_footer, get_banner, blog_detail_back
+from src.blog.site_chrome import get_site_chrome
+from src.blueprints.blog import blog_bp, get_username_no_check, blog_detail_back
 from src.blueprints.category import category_bp
 from src.blueprints.dashboard import admin_bp
 from src.blueprints.media import media_bp
@@ -37,7 +38,10 @@ from src.other.search import search_handler
 from src.plugin import plugin_bp
 from src.scheduler import init_scheduler
 from src.security import PermissionNeed, init_security_headers
+from src.models.userSession import token_digest
 from src.setting import ProductionConfig
+from src.user.session_activity import record_activity
+from src.utils.config.system_settings import get_settings
 from src.utils.filters import json_filter, string_split, article_author, md2html, relative_time_filter, category_filter, \
     f2list
 
@@ -109,14 +113,16 @@ def register_context_processors(app, config_class):
 
     @app.context_processor
     def inject_variables():
+        chrome = get_site_chrome()
+        settings = get_settings()
         return dict(
-            beian=get_site_beian() or config_class.beian,
-            title=get_site_title() or config_class.sitename,
-            domain=get_site_domain() or config_class.domain,
+            beian=settings.get('site_beian') or config_class.beian,
+            title=settings.get('site_title') or config_class.sitename,
+            domain=settings.get('site_domain') or config_class.domain,
             username=get_username_no_check(),
-            menu=get_site_menu(get_current_menu_slug()) or default_menu_data,
-            footer=get_footer(),
-            banner=get_banner()
+            menu=chrome['menu'] or default_menu_data,
+            footer=chrome['footer'],
+            banner=chrome['banner']
         )
 
 
@@ -125,9 +131,10 @@ def register_direct_routes(app, config_class):
 
     @login_manager.user_loader
     def load_user(user_id):
-        from src.models.user import User, db
+        from src.models.user import db
+        from src.user.entities import get_user
         try:
-            user = db.session.query(User).filter_by(id=user_id).first()
+            user = get_user(user_id)
             return user
         except Exception as e:
             db.session.rollback()
@@ -140,22 +147,23 @@ def register_direct_routes(app, config_class):
     def on_identity_loaded(_sender, identity):
         """当身份加载时，设置用户拥有的角色和权限"""
         if hasattr(identity, 'id') and identity.id:
-            from src.models import User
-            user = User.query.get(identity.id)
-            if user:
+            from src.user.authz.permission_set import get_permission_set
+            permission_set = get_permission_set(identity.id)
+            if permission_set.exists:
                 # 添加用户角色
                 identity.provides.add(RoleNeed('authenticated'))
 
-                # 添加用户拥有的所有角色
-                for role in user.roles:
-                    identity.provides.add(RoleNeed(role.name))
-
-                    # 添加角色对应的所有权限
-                    for permission in role.permissions:
-                        identity.provides.add(PermissionNeed(permission.code))
+                # 添加用户拥有的所有角色与权限
+                identity.provides.update(RoleNeed(name) for name in permission_set.roles)
+                identity.provides.update(PermissionNeed(code) for code in permission_set.permissions)
 
     @app.after_request
     def after_request(response):
+        # 记录会话活动，由调度器合并后批量落库
+        access_token = request.cookies.get('access_token')
+        if access_token:
+            record_activity(token_digest(access_token))
+
         # 设置新的 access_token 如果存在
         if hasattr(g, 'new_access_token'):
             response.set_cookie(
@@ -179,8 +187,7 @@ def register_direct_routes(app, config_class):
     @jwt_required
     @limiter.limit("10 per minute")
     def search(user_id):
-        return search_handler(user_id, config_class.domain, config_class.global_encoding,
-                              app.config['MAX_CACHE_TIMESTAMP'])
+        return search_handler(user_id, config_class.domain, app.config['MAX_CACHE_TIMESTAMP'])
 
     @app.route('/p/<slug_name>', methods=['GET', 'POST'])
     def blog_detail(slug_name):
@@ -243,6 +250,7 @@ def register_template_filters(app):
     app.add_template_filter(string_split, 'string.split')
     app.add_template_filter(article_author, 'Author')
     app.add_template_filter(md2html, 'md2html')
+    app.add_template_filter(article_html_filter, 'article_html')
     app.add_template_filter(relative_time_filter, 'relative_time')
     app.add_template_filter(category_filter, 'CategoryName')
     app.add_template_filter(f2list, 'F2list')
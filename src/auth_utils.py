@@ -29,12 +29,10 @@ def refresh_tokens_if_needed():
         if exp_timestamp - current_timestamp < 300:
             # 使用 session 中的用户信息来刷新
             if s_current_user.is_authenticated:
+                from src.user.authz.stateless import token_claims
                 new_access_token = create_access_token(
                     identity=str(s_current_user.id),
-                    additional_claims={
-                        'user_id': s_current_user.id,
-                        'email': s_current_user.email
-                    }
+                    additional_claims=token_claims(s_current_user.id, s_current_user.email)
                 )
 
                 # 将新的 token 存储在 g 对象中，在 after_request 中设置
@@ -66,27 +64,13 @@ def is_safe_url(target):
 
 
 def cached_check_user_banned():
-    """检查当前用户是否被封禁(带缓存)"""
-    from src.extensions import cache
+    """检查当前用户是否被封禁（读取缓存的权限集，封禁后随用户权限版本失效）"""
+    from src.user.authz.permission_set import get_permission_set
 
     if not s_current_user.is_authenticated:
         return False
 
-    # 使用用户ID作为缓存键的一部分
-    cache_key = f"user_banned_status_{s_current_user.id}"
-
-    # 尝试从缓存中获取结果
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return cached_result
-
-    # 缓存未命中，执行实际检查
-    is_banned = s_current_user.has_role('banned')
-
-    # 将结果缓存30分钟
-    cache.set(cache_key, is_banned, timeout=300 * 6)
-
-    return is_banned
+    return get_permission_set(s_current_user.id).has_role('banned')
 
 
 def check_user_banned():
@@ -101,33 +85,10 @@ def check_user_banned():
 
 
 def check_access_token(access_token: str, ):
-    """检查指定会话是否已过期"""
-    from src.extensions import cache
-    from src.models.userSession import UserSession
-
-    hash_key = hash(str(access_token))
-    # 使用哈希键作为缓存键的一部分
-    cache_key = f"session_{hash_key}"
-    # print(cache_key)
-
-    # 尝试从缓存中获取结果
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        # print("缓存命中")
-        return cached_result
-    # 缓存未命中，查询数据库
-    session = UserSession.query.filter_by(
-        access_token=access_token
-    ).first()
-    if session is None:
-        # 将结果缓存5分钟(300秒)，统一缓存时间以保持一致性
-        # print("if分支缓存未命中，将结果缓存5分钟")
-        cache.set(cache_key, False, timeout=300)
-        return False
-    else:
-        cache.set(cache_key, True, timeout=300)
-        # print("else分支缓存未命中，将结果缓存5分钟")
-        return True
+    """检查指定会话是否有效（未退出、未过期）"""
+    from src.user.authz.session_validation import validate_access_token
+
+    return validate_access_token(str(access_token))
 
 
 def jwt_required(f: object) -> Callable[[tuple[Any, ...], dict[str, Any]], Response | Any]:
@@ -137,6 +98,13 @@ def jwt_required(f: object) -> Callable[[tuple[Any, ...], dict[str, Any]], Respo
 
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
+        # 无状态模式：令牌有效且未吊销时直接放行，不加载 Session 用户
+        if current_app.config.get('JWT_STATELESS_AUTH'):
+            from src.user.authz.stateless import authenticate_stateless
+            user_id = authenticate_stateless()
+            if user_id is not None:
+                return f(user_id, *args, **kwargs)
+
         # 主要验证 Session
         if not s_current_user.is_authenticated:
             # 保存 next 参数到重定向 URL
@@ -183,6 +151,13 @@ def admin_required(f):
 
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
+        # 无状态模式：令牌有效、未吊销且角色声明中包含管理员时直接放行
+        if current_app.config.get('JWT_STATELESS_AUTH'):
+            from src.user.authz.stateless import authenticate_stateless, token_roles
+            user_id = authenticate_stateless()
+            if user_id is not None and (user_id == 1 or 'admin' in token_roles(user_id)):
+                return f(user_id, *args, **kwargs)
+
         # 首先验证 Session
         if not s_current_user.is_authenticated:
             # 保存 next 参数到重定向 URL
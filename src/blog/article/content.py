@@ -1,4 +1,9 @@
 from src.models import Article, db
+from src.blog.article.render import warm_article_html
+from src.blog.listing import refresh_article_listing
+from src.blog.tag import sync_article_tags
+from src.other.search_index import index_article
+from src.user.stats import refresh_author_article_stats
 
 
 def get_article_slugs():
@@ -10,3 +15,17 @@ def get_article_slugs():
     # 组合成字典返回
     article_dict = {row[0]: row[1] for row in results}
     return article_dict
+
+
+def on_article_changed(article_id, author_id=None):
+    """
+    文章创建、编辑、状态变更或删除并提交后调用，维护依赖文章数据的派生结构；
+    删除文章时文章已不存在，需由调用方传入作者ID
+    """
+    if author_id is None:
+        author_id = db.session.query(Article.user_id).filter(Article.article_id == article_id).scalar()
+    index_article(article_id)
+    refresh_article_listing(article_id)
+    sync_article_tags(article_id)
+    refresh_author_article_stats(author_id)
+    warm_article_html(article_id)
@@ -0,0 +1,174 @@
+"""
+文章详情加载
+一次联表查询取出文章、正文、作者与多语言版本列表，组装为只读的视图对象供模板使用；
+另提供不读取正文的数据版本查询，用于在加载详情之前计算 ETag。
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+
+from src.models import Article, ArticleContent, ArticleI18n, User, db
+
+
+@dataclass(frozen=True)
+class ArticleView:
+    article_id: int
+    title: str
+    slug: str
+    user_id: Optional[int]
+    hidden: bool
+    views: int
+    likes: int
+    status: int
+    cover_image: Optional[str]
+    excerpt: Optional[str]
+    tags: str
+    article_ad: Optional[str]
+    is_vip_only: bool
+    required_vip_level: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class ContentView:
+    aid: int
+    content: Optional[str]
+    updated_at: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class AuthorView:
+    id: int
+    username: str
+    profile_picture: Optional[str]
+    bio: Optional[str]
+
+
+@dataclass(frozen=True)
+class TranslationView:
+    language_code: str
+    slug: str
+    title: str
+
+
+@dataclass(frozen=True)
+class ArticleDetail:
+    article: ArticleView
+    content: Optional[ContentView]
+    author: Optional[AuthorView]
+    i18n_versions: Tuple[TranslationView, ...]
+
+
+def _load_detail(*criteria):
+    """
+    文章与正文、作者为一对一关系，与多语言版本为一对多关系，
+    外连接后每个多语言版本一行，没有多语言版本时只有一行
+    """
+    rows = db.session.query(
+        Article,
+        ArticleContent.aid, ArticleContent.content, ArticleContent.updated_at,
+        User.id, User.username, User.profile_picture, User.bio,
+        ArticleI18n.language_code, ArticleI18n.slug, ArticleI18n.title
+    ).outerjoin(
+        ArticleContent, ArticleContent.aid == Article.article_id
+    ).outerjoin(
+        User, User.id == Article.user_id
+    ).outerjoin(
+        ArticleI18n, ArticleI18n.article_id == Article.article_id
+    ).filter(
+        Article.status == 1,
+        *criteria
+    ).order_by(ArticleI18n.language_code).all()
+
+    if not rows:
+        return None
+
+    first = rows[0]
+    article = first[0]
+    content = None
+    if first[1] is not None:
+        content = ContentView(aid=first[1], content=first[2], updated_at=first[3])
+    author = None
+    if first[4] is not None:
+        author = AuthorView(id=first[4], username=first[5], profile_picture=first[6], bio=first[7])
+    i18n_versions = tuple(
+        TranslationView(language_code=row[8], slug=row[9], title=row[10])
+        for row in rows if row[8] is not None
+    )
+
+    return ArticleDetail(
+        article=ArticleView(
+            article_id=article.article_id,
+            title=article.title,
+            slug=article.slug,
+            user_id=article.user_id,
+            hidden=bool(article.hidden),
+            views=article.views or 0,
+            likes=article.likes or 0,
+            status=article.status,
+            cover_image=article.cover_image,
+            excerpt=article.excerpt,
+            tags=article.tags,
+            article_ad=article.article_ad,
+            is_vip_only=bool(article.is_vip_only),
+            required_vip_level=article.required_vip_level or 0,
+            created_at=article.created_at,
+            updated_at=article.updated_at,
+        ),
+        content=content,
+        author=author,
+        i18n_versions=i18n_versions,
+    )
+
+
+def _load_version(*criteria):
+    """
+    文章详情页的数据版本，只读取访问控制字段和各部分的更新时间，不读取正文
+
+    Returns:
+        Row(article_id, user_id, hidden, is_vip_only, required_vip_level, views, likes,
+            updated_at, content_updated_at, i18n_count, i18n_updated_at)，不存在时返回 None
+    """
+    return db.session.query(
+        Article.article_id,
+        Article.user_id,
+        Article.hidden,
+        Article.is_vip_only,
+        Article.required_vip_level,
+        Article.views,
+        Article.likes,
+        Article.updated_at,
+        ArticleContent.updated_at.label('content_updated_at'),
+        func.count(ArticleI18n.i18n_id).label('i18n_count'),
+        func.max(ArticleI18n.updated_at).label('i18n_updated_at')
+    ).outerjoin(
+        ArticleContent, ArticleContent.aid == Article.article_id
+    ).outerjoin(
+        ArticleI18n, ArticleI18n.article_id == Article.article_id
+    ).filter(
+        Article.status == 1,
+        *criteria
+    ).group_by(
+        Article.article_id, ArticleContent.updated_at
+    ).first()
+
+
+def load_article_version_by_slug(slug):
+    return _load_version(Article.slug == slug)
+
+
+def load_article_version_by_id(article_id):
+    return _load_version(Article.article_id == article_id)
+
+
+def load_article_detail_by_slug(slug):
+    """按 slug 加载已发布文章的详情，不存在时返回 None"""
+    return _load_detail(Article.slug == slug)
+
+
+def load_article_detail_by_id(article_id):
+    """按文章ID加载已发布文章的详情，不存在时返回 None"""
+    return _load_detail(Article.article_id == article_id)
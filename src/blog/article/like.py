@@ -0,0 +1,132 @@
+"""
+文章点赞
+点赞记录使用 INSERT ... ON CONFLICT DO NOTHING 写入，由 (user_id, article_id) 唯一约束保证幂等；
+只有新写入记录时才以 likes = likes + 1 原子更新计数，整个点赞在一个事务内完成。
+每个用户点赞过的文章ID缓存为集合（Redis 集合或进程内缓存），文章列表的点赞状态一次查询即可得到。
+"""
+import logging
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.database import redis_client
+from src.extensions import cache
+from src.models import Article, ArticleLike, db
+from src.user.stats import adjust_author_stats
+
+logger = logging.getLogger(__name__)
+
+LIKED_KEY_PREFIX = 'article:liked:'
+LIKED_SET_TIMEOUT = 24 * 3600
+# Redis 集合中的占位成员，使没有点赞记录的用户也能缓存为存在的键
+_EMPTY_MEMBER = '0'
+
+
+def _liked_key(user_id):
+    return f"{LIKED_KEY_PREFIX}{user_id}"
+
+
+def _insert_like_ignore(user_id, article_id):
+    """写入点赞记录，已存在时忽略，返回是否新写入"""
+    dialect = db.session.get_bind().dialect.name
+    values = {'user_id': user_id, 'article_id': article_id}
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        statement = insert(ArticleLike).values(**values).on_conflict_do_nothing(
+            index_elements=['user_id', 'article_id'])
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(ArticleLike).values(**values).on_conflict_do_nothing(
+            index_elements=['user_id', 'article_id'])
+    elif dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(ArticleLike).values(**values).prefix_with('IGNORE')
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.add(ArticleLike(**values))
+            return True
+        except IntegrityError:
+            return False
+    return db.session.execute(statement).rowcount == 1
+
+
+def add_article_like(user_id, article_id):
+    """
+    点赞文章
+
+    Returns:
+        (liked, likes) liked 为本次是否新增点赞，likes 为文章当前点赞数；文章不存在时返回 (False, None)
+    """
+    try:
+        inserted = _insert_like_ignore(user_id, article_id)
+        if inserted:
+            updated = db.session.execute(
+                update(Article).where(Article.article_id == article_id, Article.status == 1)
+                .values(likes=Article.likes + 1)
+            ).rowcount
+            if updated != 1:
+                db.session.rollback()
+                return False, None
+            adjust_author_stats(article_id, total_likes=1)
+        likes = db.session.execute(
+            select(Article.likes).where(Article.article_id == article_id, Article.status == 1)
+        ).scalar()
+        db.session.commit()
+    except IntegrityError:
+        # 外键约束：文章不存在
+        db.session.rollback()
+        return False, None
+
+    if likes is None:
+        return False, None
+    if inserted:
+        _add_to_liked_set(user_id, article_id)
+    return inserted, likes
+
+
+def _load_liked_ids(user_id):
+    return {row[0] for row in db.session.query(ArticleLike.article_id).filter(ArticleLike.user_id == user_id).all()}
+
+
+def _add_to_liked_set(user_id, article_id):
+    """新增点赞后更新缓存中的集合，集合未缓存时不处理"""
+    if redis_client is not None:
+        try:
+            key = _liked_key(user_id)
+            if redis_client.exists(key):
+                redis_client.sadd(key, article_id)
+            return
+        except Exception as e:
+            logger.warning(f"更新点赞集合失败: {e}")
+    cache.delete(_liked_key(user_id))
+
+
+def get_liked_article_ids(user_id):
+    """用户点赞过的全部文章ID集合"""
+    key = _liked_key(user_id)
+    if redis_client is not None:
+        try:
+            members = redis_client.smembers(key)
+            if members:
+                return {int(member) for member in members if member != _EMPTY_MEMBER}
+            liked_ids = _load_liked_ids(user_id)
+            pipe = redis_client.pipeline()
+            pipe.sadd(key, _EMPTY_MEMBER, *liked_ids)
+            pipe.expire(key, LIKED_SET_TIMEOUT)
+            pipe.execute()
+            return liked_ids
+        except Exception as e:
+            logger.warning(f"读取点赞集合失败: {e}")
+
+    liked_ids = cache.get(key)
+    if liked_ids is None:
+        liked_ids = frozenset(_load_liked_ids(user_id))
+        cache.set(key, liked_ids, timeout=LIKED_SET_TIMEOUT)
+    return set(liked_ids)
+
+
+def filter_liked(user_id, article_ids):
+    """返回 article_ids 中用户已点赞的文章ID"""
+    liked_ids = get_liked_article_ids(user_id)
+    return [article_id for article_id in article_ids if article_id in liked_ids]
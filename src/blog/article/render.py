@@ -0,0 +1,128 @@
+"""
+文章渲染缓存
+按 (文章ID, 正文更新时间, 渲染选项) 缓存 Markdown 渲染后的 HTML，
+优先存放在 Redis，Redis 不可用时存放在磁盘；文章保存后预先渲染详情页使用的主题。
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from src.database import redis_client
+from src.models import ArticleContent, db
+from src.setting import app_config
+from src.utils.filters import md2html
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'article:html:'
+# md2html 输出结构变化时递增，使旧的渲染结果失效
+RENDER_FORMAT = 2
+# 详情页根据 theme cookie 使用的样式主题
+DETAIL_THEMES = ('light', 'dark')
+
+_cache_dir = os.path.join(app_config.base_dir, app_config.RENDER_CACHE_FOLDER)
+
+
+def content_version(updated_at):
+    """正文版本号，正文更新时间变化即失效"""
+    if updated_at is None:
+        return '0'
+    return updated_at.strftime('%Y%m%d%H%M%S%f')
+
+
+def _options_digest(options):
+    raw = json.dumps([RENDER_FORMAT, options], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _redis_key(aid, version, digest):
+    return f"{KEY_PREFIX}{aid}:{version}:{digest}"
+
+
+def _file_path(aid, version, digest):
+    return os.path.join(_cache_dir, str(aid), f"{version}-{digest}.html")
+
+
+def _load(aid, version, digest):
+    if redis_client is not None:
+        try:
+            return redis_client.get(_redis_key(aid, version, digest))
+        except Exception as e:
+            logger.warning(f"读取渲染缓存失败: {e}")
+            return None
+    try:
+        with open(_file_path(aid, version, digest), 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"读取渲染缓存文件失败: {e}")
+        return None
+
+
+def _store(aid, version, digest, html):
+    if redis_client is not None:
+        try:
+            redis_client.set(_redis_key(aid, version, digest), html, ex=app_config.RENDER_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"写入渲染缓存失败: {e}")
+        return
+    path = _file_path(aid, version, digest)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，避免并发读取到不完整的内容
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"写入渲染缓存文件失败: {e}")
+
+
+def purge_article_html(aid):
+    """删除文章所有版本的渲染缓存"""
+    if redis_client is not None:
+        try:
+            keys = list(redis_client.scan_iter(match=f"{KEY_PREFIX}{aid}:*", count=100))
+            if keys:
+                redis_client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"清除渲染缓存失败: {e}")
+        return
+    shutil.rmtree(os.path.join(_cache_dir, str(aid)), ignore_errors=True)
+
+
+def render_article_html(aid, updated_at, markdown_text, **options):
+    """获取文章正文渲染后的 HTML，未命中缓存时渲染并写入缓存"""
+    version = content_version(updated_at)
+    digest = _options_digest(options)
+    html = _load(aid, version, digest)
+    if html is None:
+        html = md2html(markdown_text or '', **options)
+        _store(aid, version, digest, html)
+    return html
+
+
+def article_html_filter(content, **options):
+    """模板过滤器，content 为带有 aid、content、updated_at 属性的正文对象"""
+    if content is None or not content.content:
+        return ''
+    return render_article_html(content.aid, content.updated_at, content.content, **options)
+
+
+def warm_article_html(article_id):
+    """文章保存后清除旧版本缓存，并预先渲染详情页使用的主题"""
+    try:
+        purge_article_html(article_id)
+        row = db.session.query(ArticleContent.content, ArticleContent.updated_at).filter(
+            ArticleContent.aid == article_id
+        ).first()
+        if row is None or not row.content:
+            return
+        for theme in DETAIL_THEMES:
+            render_article_html(article_id, row.updated_at, row.content, style_theme=theme)
+    except Exception as e:
+        logger.error(f"预渲染文章 {article_id} 失败: {e}")
@@ -0,0 +1,179 @@
+"""
+文章浏览量计数
+记录浏览时不访问数据库：Redis 可用时对哈希 article:views:pending 执行 HINCRBY，
+Redis 不可用或出错时计入进程内的分片计数器。调度器定期将累计的增量用一条
+UPDATE 语句批量加到 articles.views 上。
+
+Redis 中的增量在落库前先整体改名为 article:views:flushing，写库成功后才删除；
+写库失败时该键保留到下次落库重试，进程内的增量则放回计数器，两次落库之间的浏览量不会丢失。
+超出 INTEGER 范围的文章ID不计数；落库前只保留数据库中存在的文章，每批在单独的保存点中执行，
+个别批次写入出错时只丢弃该批，不会让整个键反复重试而阻塞全站的浏览量落库。
+"""
+import logging
+import threading
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+
+from src.database import get_db, redis_client
+from src.setting import app_config
+from src.user.stats import apply_author_view_deltas
+from src.utils.cache_protection import CacheLock
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'article:views:pending'
+FLUSHING_KEY = 'article:views:flushing'
+FLUSH_LOCK_KEY = 'article_views_flush'
+# articles.article_id 为 serial（INTEGER）
+MAX_ARTICLE_ID = 2 ** 31 - 1
+
+_EXISTING_IDS = text("SELECT article_id FROM articles WHERE article_id IN :ids").bindparams(
+    bindparam('ids', expanding=True))
+
+
+class ShardedViewCounter:
+    """进程内浏览量计数器，按文章ID分片加锁以减少并发请求之间的竞争"""
+
+    def __init__(self, shards=16):
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+
+    def incr(self, article_id, amount=1):
+        counts, lock = self._shards[article_id % len(self._shards)]
+        with lock:
+            counts[article_id] = counts.get(article_id, 0) + amount
+
+    def drain(self):
+        """取出并清空全部增量"""
+        deltas = {}
+        for counts, lock in self._shards:
+            with lock:
+                items = list(counts.items())
+                counts.clear()
+            for article_id, delta in items:
+                deltas[article_id] = deltas.get(article_id, 0) + delta
+        return deltas
+
+    def merge(self, deltas):
+        """落库失败时放回增量"""
+        for article_id, delta in deltas.items():
+            self.incr(article_id, delta)
+
+
+local_view_counter = ShardedViewCounter()
+
+
+def is_valid_article_id(article_id):
+    return 0 < article_id <= MAX_ARTICLE_ID
+
+
+def record_view(article_id):
+    """记录一次浏览，文章ID超出范围时不计数并返回 False"""
+    if not is_valid_article_id(article_id):
+        return False
+    if redis_client is not None:
+        try:
+            redis_client.hincrby(PENDING_KEY, article_id, 1)
+            return True
+        except Exception as e:
+            logger.warning(f"Redis 记录浏览量失败，改用进程内计数: {e}")
+    local_view_counter.incr(article_id)
+    return True
+
+
+def _update_views(session, batch):
+    """用一条 UPDATE 语句将一批增量加到文章浏览量上，作者统计在同一事务中更新"""
+    params = {}
+    for n, (article_id, delta) in enumerate(batch):
+        params[f"a{n}"] = article_id
+        params[f"d{n}"] = delta
+
+    if app_config.db_engine == 'postgresql':
+        values = ', '.join(f"(CAST(:a{n} AS INTEGER), CAST(:d{n} AS BIGINT))" for n in range(len(batch)))
+        statement = (
+            "UPDATE articles SET views = articles.views + v.delta "
+            f"FROM (VALUES {values}) AS v(article_id, delta) "
+            "WHERE articles.article_id = v.article_id"
+        )
+    else:
+        # 其他数据库不支持 UPDATE ... FROM (VALUES ...)，改用 CASE 表达式
+        cases = ' '.join(f"WHEN :a{n} THEN :d{n}" for n in range(len(batch)))
+        ids = ', '.join(f":a{n}" for n in range(len(batch)))
+        statement = (
+            f"UPDATE articles SET views = views + CASE article_id {cases} ELSE 0 END "
+            f"WHERE article_id IN ({ids})"
+        )
+    session.execute(text(statement), params)
+    apply_author_view_deltas(session, dict(batch))
+
+
+def _apply_deltas(deltas, batch_size=500):
+    """
+    分批写入浏览量增量，超出范围或已不存在的文章的增量直接丢弃
+    每批在单独的保存点中写入，写入出错的批次记录日志后丢弃；数据库连接失效时抛出异常，由调用方保留增量重试
+
+    Returns:
+        写入的文章数
+    """
+    items = sorted((article_id, delta) for article_id, delta in deltas.items() if is_valid_article_id(article_id))
+    applied = 0
+    with get_db() as session:
+        for i in range(0, len(items), batch_size):
+            batch = items[i:i + batch_size]
+            existing = {row[0] for row in session.execute(_EXISTING_IDS, {'ids': [item[0] for item in batch]})}
+            batch = [item for item in batch if item[0] in existing]
+            if not batch:
+                continue
+            try:
+                with session.begin_nested():
+                    _update_views(session, batch)
+                applied += len(batch)
+            except SQLAlchemyError as e:
+                if isinstance(e, DBAPIError) and e.connection_invalidated:
+                    raise
+                logger.error(f"写入浏览量失败，丢弃 {len(batch)} 篇文章的增量: {e}")
+    return applied
+
+
+def _take_redis_deltas():
+    """将待落库的增量改名为落库中的键并读出，上次落库失败时直接重试该键"""
+    if not redis_client.exists(FLUSHING_KEY):
+        try:
+            redis_client.rename(PENDING_KEY, FLUSHING_KEY)
+        except Exception:
+            # 没有待落库的增量
+            return {}
+    return {int(article_id): int(delta) for article_id, delta in redis_client.hgetall(FLUSHING_KEY).items()}
+
+
+def flush_article_views():
+    """
+    将累计的浏览量增量写入数据库，返回更新的文章数
+    多个进程同时调用时只有获得锁的进程执行 Redis 部分的落库
+    """
+    flushed = 0
+
+    local_deltas = local_view_counter.drain()
+    if local_deltas:
+        try:
+            flushed += _apply_deltas(local_deltas)
+        except Exception as e:
+            local_view_counter.merge(local_deltas)
+            logger.error(f"写入浏览量失败: {e}")
+
+    if redis_client is None:
+        return flushed
+
+    lock = CacheLock(FLUSH_LOCK_KEY, expire=60)
+    if not lock.acquire(timeout=0):
+        return flushed
+    try:
+        redis_deltas = _take_redis_deltas()
+        if redis_deltas:
+            flushed += _apply_deltas(redis_deltas)
+            redis_client.delete(FLUSHING_KEY)
+    except Exception as e:
+        logger.error(f"写入 Redis 中的浏览量失败，将在下次重试: {e}")
+    finally:
+        lock.release()
+    return flushed
@@ -1,17 +1,19 @@
-import hashlib
-from datetime import datetime
-
 from flask import render_template, request, make_response, current_app
 
-# from src.database import get_db
+from src.blog.listing import LIST_ALL, LIST_FEATURED, get_listing_page, get_listing_version, tag_list_key
+from src.blog.tag import get_tag
 from src.error import error
-from src.models import Article, Category, db
+from src.extensions import cache
 from src.utils.config.theme import get_all_themes
+from src.utils.http.etag import data_etag, not_modified
+
+# 列表页渲染结果缓存时间，缓存键包含数据版本，数据变化后自然失效
+LISTING_HTML_TIMEOUT = 300
 
 
 def proces_page_data(total_articles, article_info, current_page, page_size, theme='default'):
     """
-    处理分页数据并生成HTML内容和ETag
+    处理分页数据并生成HTML内容
     """
     try:
         # 计算总页数
@@ -59,65 +61,10 @@ def proces_page_data(total_articles, article_info, current_page, page_size, them
                 total_articles=total_articles
             )
 
-        # 生成ETag
-        content_hash = hashlib.md5(html_content.encode()).hexdigest()
-        etag = f"{content_hash}-{int(datetime.now().timestamp())}"
-
-        return html_content, etag
+        return html_content
 
     except Exception as e:
         current_app.logger.error(f"Error processing page data: {e}")
-        return error("获取文章时发生错误。", status_code=500)
-
-
-def get_articles_with_filters(filters, page, page_size):
-    """
-    通用函数：根据提供的过滤器获取文章
-    """
-    try:
-        # 基本查询
-        query = db.session.query(
-            Article.article_id,
-            Article.title,
-            Article.user_id,
-            Article.views,
-            Article.likes,
-            Article.cover_image,
-            Article.category_id,
-            Article.excerpt,
-            Article.is_featured,
-            Article.tags,
-            Article.slug,
-            Article.updated_at
-        ).outerjoin(Category, Article.category_id == Category.id).filter(
-            Article.hidden == False,
-            Article.status == 1,
-            Article.is_vip_only == False,
-        )
-
-        # 添加额外过滤器
-        for filter_cond in filters:
-            query = query.filter(filter_cond)
-
-        # 获取当前页的文章
-        articles = query.order_by(
-            Article.article_id.desc()
-        ).limit(page_size).offset((page - 1) * page_size).all()
-
-        # 获取总文章数
-        count_query = db.session.query(Article).filter(
-            Article.hidden == False,
-            Article.status == 1
-        )
-        for filter_cond in filters:
-            count_query = count_query.filter(filter_cond)
-
-        total_articles = count_query.count()
-
-        return [tuple(article) for article in articles], total_articles
-
-    except Exception as e:
-        current_app.logger.error(f"Database error: {e}")
         raise
 
 
@@ -129,14 +76,32 @@ def create_response(html_content, etag):
     return response
 
 
+def listing_page_response(list_key, page, page_size, theme='default'):
+    """
+    列表页响应：先由列表的数据版本计算 ETag，命中 If-None-Match 时直接返回 304，
+    否则以 ETag 为键读取渲染结果缓存，未命中时再查询文章并渲染模板
+    """
+    total, page_count, last_updated = get_listing_version(list_key, page, page_size)
+    etag = data_etag(list_key, page, page_size, theme, total, page_count, last_updated)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    cache_key = f"listing_html:{etag}"
+    html_content = cache.get(cache_key)
+    if html_content is None:
+        article_info, total_articles = get_listing_page(list_key, page, page_size)
+        html_content = proces_page_data(total_articles, article_info, page, page_size, theme)
+        cache.set(cache_key, html_content, timeout=LISTING_HTML_TIMEOUT)
+    return create_response(html_content, etag)
+
+
 def index_page_back():
     page = max(request.args.get('page', 1, type=int), 1)
     page_size = 45
     theme = request.cookies.get('site-theme') or 'default'
     try:
-        article_info, total_articles = get_articles_with_filters([], page, page_size)
-        html_content, etag = proces_page_data(total_articles, article_info, page, page_size, theme)
-        return create_response(html_content, etag)
+        return listing_page_response(LIST_ALL, page, page_size, theme)
     except Exception as e:
         return error(str(e), 500)
 
@@ -149,11 +114,10 @@ def tag_page_back(tag_name, encoding):
     page_size = 45
 
     try:
-        article_info, total_articles = get_articles_with_filters(
-            [Article.tags.like(f'%{tag_name}%')], page, page_size
-        )
-        html_content, etag = proces_page_data(total_articles, article_info, page, page_size)
-        return create_response(html_content, etag)
+        # 标签表中没有的标签直接返回 404，不再查询列表
+        if get_tag(tag_name) is None:
+            return error("标签不存在。", status_code=404)
+        return listing_page_response(tag_list_key(tag_name), page, page_size)
     except Exception as e:
         current_app.logger.error(f"Error in tag_page_back: {e}")
         return error("获取文章时发生错误。", status_code=500)
@@ -164,11 +128,7 @@ def featured_page_back():
     page_size = 45
 
     try:
-        article_info, total_articles = get_articles_with_filters(
-            [Article.is_featured == True], page, page_size
-        )
-        html_content, etag = proces_page_data(total_articles, article_info, page, page_size)
-        return create_response(html_content, etag)
+        return listing_page_response(LIST_FEATURED, page, page_size)
     except Exception as e:
         current_app.logger.error(f"Error in featured_page_back: {e}")
         return error("获取文章时发生错误。", status_code=500)
@@ -0,0 +1,328 @@
+"""
+文章列表物化层
+首页、精选、标签、分类列表的文章ID保存在 article_listing 表中，每个列表内 position 按文章ID
+升序连续编号。按页号读取时直接换算出 position 区间走 (list_key, position) 索引，
+总数为列表的最大 position，任意页的查询代价与页号无关。
+列表在文章发布、编辑、下线、删除后由 on_article_changed 增量维护，并由调度器定期重建。
+增量维护时按列表加锁并持有到提交，同一列表的插入与移除串行执行；提交前检查被修改列表的行数与最大 position，
+出现空位（例如加锁前遗留的并发写入）时在锁内重新编号。(list_key, position) 上的唯一索引防止重复位置。
+"""
+import logging
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from src.blog.tag import split_tags
+from src.models import Article, ArticleListing, db
+from src.utils.cache_protection import CacheLock
+
+logger = logging.getLogger(__name__)
+
+LIST_ALL = 'all'
+LIST_FEATURED = 'featured'
+MAX_LIST_KEY_LENGTH = 64
+# 并发维护冲突时的重试次数
+REFRESH_ATTEMPTS = 3
+REBUILD_LOCK_KEY = 'article_listing_rebuild'
+REBUILD_LOCK_EXPIRE = 3600
+LIST_LOCK_PREFIX = 'article_listing:'
+LIST_LOCK_EXPIRE = 60
+LIST_LOCK_TIMEOUT = 10
+
+
+def tag_list_key(tag_name):
+    return f"tag:{tag_name}"
+
+
+def category_list_key(category_id):
+    return f"category:{category_id}"
+
+
+def _is_listable(article):
+    return (article is not None and article.status == 1 and not article.hidden
+            and not article.is_vip_only)
+
+
+def _list_keys(tags, category_id, is_featured):
+    """文章应出现在的列表"""
+    keys = {LIST_ALL}
+    if is_featured:
+        keys.add(LIST_FEATURED)
+    if category_id:
+        keys.add(category_list_key(category_id))
+    keys.update(tag_list_key(tag) for tag in split_tags(tags))
+    return {key for key in keys if len(key) <= MAX_LIST_KEY_LENGTH}
+
+
+def _shift(list_key, first_position, delta):
+    """
+    将位置不小于 first_position 的文章整体移动 delta
+    先移到负数区间再取反，语句执行中途不会与唯一索引上的其他位置冲突
+    """
+    db.session.query(ArticleListing).filter(
+        ArticleListing.list_key == list_key,
+        ArticleListing.position >= first_position
+    ).update({ArticleListing.position: -(ArticleListing.position + delta)}, synchronize_session=False)
+    db.session.query(ArticleListing).filter(
+        ArticleListing.list_key == list_key,
+        ArticleListing.position < 0
+    ).update({ArticleListing.position: -ArticleListing.position}, synchronize_session=False)
+
+
+def _insert(list_key, article_id):
+    """将文章插入列表，之后的文章位置依次后移"""
+    last = db.session.query(ArticleListing.article_id, ArticleListing.position).filter(
+        ArticleListing.list_key == list_key
+    ).order_by(ArticleListing.position.desc()).first()
+
+    if last is None:
+        position = 1
+    elif article_id > last.article_id:
+        # 新发布的文章ID最大，直接追加到末尾
+        position = last.position + 1
+    else:
+        position = db.session.query(func.count(ArticleListing.article_id)).filter(
+            ArticleListing.list_key == list_key,
+            ArticleListing.article_id < article_id
+        ).scalar() + 1
+        _shift(list_key, position, 1)
+
+    db.session.add(ArticleListing(list_key=list_key, article_id=article_id, position=position))
+
+
+def _remove(list_key, article_id, position):
+    """将文章移出列表，之后的文章位置依次前移"""
+    db.session.query(ArticleListing).filter(
+        ArticleListing.list_key == list_key,
+        ArticleListing.article_id == article_id
+    ).delete(synchronize_session=False)
+    _shift(list_key, position + 1, -1)
+
+
+def _renumber(list_key):
+    """按文章ID重新连续编号整个列表"""
+    article_ids = [row[0] for row in db.session.query(ArticleListing.article_id).filter(
+        ArticleListing.list_key == list_key
+    ).order_by(ArticleListing.article_id).all()]
+    db.session.query(ArticleListing).filter(ArticleListing.list_key == list_key).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(ArticleListing, [
+        {'list_key': list_key, 'article_id': article_id, 'position': position}
+        for position, article_id in enumerate(article_ids, 1)
+    ])
+
+
+def _close_gaps(list_key):
+    """列表的行数与最大 position 不一致时重新编号"""
+    count, last = db.session.query(func.count(ArticleListing.article_id), func.max(ArticleListing.position)).filter(
+        ArticleListing.list_key == list_key
+    ).one()
+    if count != (last or 0):
+        logger.warning(f"列表 {list_key} 的位置不连续（{count} 篇，最大位置 {last}），重新编号")
+        _renumber(list_key)
+
+
+def _listing_state(article_id):
+    """(文章应在的列表, {所在列表: 位置})"""
+    article = db.session.query(Article).filter_by(article_id=article_id).first()
+    wanted = set()
+    if _is_listable(article):
+        wanted = _list_keys(article.tags, article.category_id, article.is_featured)
+
+    current = dict(db.session.query(ArticleListing.list_key, ArticleListing.position).filter(
+        ArticleListing.article_id == article_id
+    ).all())
+    return wanted, current
+
+
+def _acquire_list_locks(list_keys):
+    """按固定顺序获取各列表的锁，任一获取失败时释放已获取的锁并返回 None"""
+    locks = []
+    for list_key in sorted(list_keys):
+        lock = CacheLock(f"{LIST_LOCK_PREFIX}{list_key}", expire=LIST_LOCK_EXPIRE)
+        if not lock.acquire(timeout=LIST_LOCK_TIMEOUT):
+            _release_list_locks(locks)
+            return None
+        locks.append(lock)
+    return locks
+
+
+def _release_list_locks(locks):
+    for lock in reversed(locks):
+        lock.release()
+
+
+def _refresh(article_id):
+    """调整文章所在的列表，未能获得锁或需要修改的列表在加锁期间发生变化时返回 False"""
+    wanted, current = _listing_state(article_id)
+    # 结束读取事务，获得锁后重新读取
+    db.session.rollback()
+    changed = (current.keys() - wanted) | (wanted - current.keys())
+    if not changed:
+        return True
+
+    locks = _acquire_list_locks(changed)
+    if locks is None:
+        return False
+    try:
+        wanted, current = _listing_state(article_id)
+        removed = current.keys() - wanted
+        added = wanted - current.keys()
+        if not (removed | added) <= changed:
+            db.session.rollback()
+            return False
+
+        for list_key in sorted(removed):
+            _remove(list_key, article_id, current[list_key])
+        for list_key in sorted(added):
+            _insert(list_key, article_id)
+        for list_key in sorted(removed | added):
+            _close_gaps(list_key)
+        db.session.commit()
+        return True
+    finally:
+        _release_list_locks(locks)
+
+
+def refresh_article_listing(article_id):
+    """根据文章当前状态调整其所在的列表，与其他事务冲突时重试"""
+    for _ in range(REFRESH_ATTEMPTS):
+        try:
+            if _refresh(article_id):
+                return
+        except IntegrityError as e:
+            db.session.rollback()
+            logger.warning(f"更新文章 {article_id} 的列表时位置冲突，重试: {e}")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"更新文章 {article_id} 的列表失败: {e}")
+            return
+    logger.error(f"更新文章 {article_id} 的列表失败，重试 {REFRESH_ATTEMPTS} 次后仍有冲突")
+
+
+def rebuild_article_listing(batch_size=500):
+    """
+    全量重建所有列表，删除与写入在同一事务中提交
+
+    Returns:
+        列表数；其他进程正在重建时返回 None
+    """
+    lock = CacheLock(REBUILD_LOCK_KEY, expire=REBUILD_LOCK_EXPIRE)
+    if not lock.acquire(timeout=0):
+        logger.info("其他进程正在重建文章列表，跳过")
+        return None
+    try:
+        count = _rebuild_article_listing(batch_size)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        lock.release()
+
+    logger.info(f"文章列表重建完成，共 {count} 个列表")
+    return count
+
+
+def _rebuild_article_listing(batch_size):
+    db.session.query(ArticleListing).delete(synchronize_session=False)
+
+    positions = {}
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            Article.article_id, Article.tags, Article.category_id, Article.is_featured
+        ).filter(
+            Article.status == 1,
+            Article.hidden == False,
+            Article.is_vip_only == False,
+            Article.article_id > last_id
+        ).order_by(Article.article_id).limit(batch_size).all()
+        if not rows:
+            break
+
+        mappings = []
+        for article_id, tags, category_id, is_featured in rows:
+            for list_key in _list_keys(tags, category_id, is_featured):
+                positions[list_key] = positions.get(list_key, 0) + 1
+                mappings.append({'list_key': list_key, 'article_id': article_id, 'position': positions[list_key]})
+        db.session.bulk_insert_mappings(ArticleListing, mappings)
+        last_id = rows[-1][0]
+
+    db.session.commit()
+    return len(positions)
+
+
+def ensure_article_listing():
+    """列表为空时执行一次全量重建"""
+    if db.session.query(ArticleListing.article_id).first() is not None:
+        return 0
+    return rebuild_article_listing() or 0
+
+
+def get_listing_total(list_key):
+    """列表中的文章数，即列表的最大 position（维护时保证连续编号）"""
+    return db.session.query(func.max(ArticleListing.position)).filter(
+        ArticleListing.list_key == list_key
+    ).scalar() or 0
+
+
+def _page_range(total, page, page_size):
+    """页号对应的 position 区间，文章按ID倒序即 position 倒序"""
+    high = total - (page - 1) * page_size
+    return max(high - page_size + 1, 1), high
+
+
+def get_listing_version(list_key, page, page_size):
+    """
+    列表页的数据版本，用于计算 ETag
+
+    Returns:
+        (total, page_count, last_updated) 列表总数、当前页文章数及其中最大的更新时间
+    """
+    total = get_listing_total(list_key)
+    low, high = _page_range(total, page, page_size)
+    if high < 1:
+        return total, 0, None
+    page_count, last_updated = db.session.query(
+        func.count(ArticleListing.article_id), func.max(Article.updated_at)
+    ).join(
+        Article, Article.article_id == ArticleListing.article_id
+    ).filter(
+        ArticleListing.list_key == list_key,
+        ArticleListing.position.between(low, high)
+    ).one()
+    return total, page_count, last_updated
+
+
+def get_listing_page(list_key, page, page_size):
+    """
+    按页号读取列表，文章按ID倒序
+
+    Returns:
+        (articles, total) articles 为与 proces_page_data 对应的元组列表
+    """
+    total = get_listing_total(list_key)
+    low, high = _page_range(total, page, page_size)
+    if high < 1:
+        return [], total
+
+    rows = db.session.query(
+        Article.article_id,
+        Article.title,
+        Article.user_id,
+        Article.views,
+        Article.likes,
+        Article.cover_image,
+        Article.category_id,
+        Article.excerpt,
+        Article.is_featured,
+        Article.tags,
+        Article.slug,
+        Article.updated_at
+    ).join(
+        ArticleListing, ArticleListing.article_id == Article.article_id
+    ).filter(
+        ArticleListing.list_key == list_key,
+        ArticleListing.position.between(low, high)
+    ).order_by(ArticleListing.position.desc()).all()
+
+    return [tuple(row) for row in rows], total
@@ -0,0 +1,140 @@
+"""
+站点页面框架数据
+每个页面都要用到的导航菜单树、页脚与横幅合并为一个快照，按菜单 slug 缓存，系统设置取自进程内的设置快照。
+构建快照时每张表只执行一次批量查询，菜单树在内存中组装；快照中记录构建时的版本号，
+读取时与当前版本比较，后台修改设置、菜单、菜单项或页面后调用 invalidate_site_chrome 更换版本。
+版本号保存在 Redis 中，所有进程共享；Redis 不可用时退化为应用缓存。
+快照同时记录构建时所用设置快照的版本号：设置变更通知是异步的，其他进程可能在收到通知前
+用旧设置按新版本重建快照，设置快照重新加载后版本号不再一致，快照随之重建。
+"""
+import logging
+import uuid
+
+from src.database import redis_client
+from src.extensions import cache
+from src.models import MenuItems, Menus, Pages, db
+from src.utils.config.system_settings import get_settings, get_versioned_settings
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'site_chrome:version'
+KEY_PREFIX = 'site_chrome:menu:'
+SITE_CHROME_TIMEOUT = 24 * 3600
+
+FOOTER_SLUG = 'footer001'
+BANNER_SLUG = 'banner001'
+DEFAULT_FOOTER = '<span>-- 我是有底线的 --</span>'
+
+
+def render_with_settings(template_content, settings):
+    """替换内容中 {{ key_name }} 格式的系统设置占位符"""
+    if not template_content:
+        return template_content
+    for key, value in settings.items():
+        placeholder = '{{ ' + key + ' }}'
+        if placeholder in template_content and value:
+            template_content = template_content.replace(placeholder, value)
+    return template_content
+
+
+def _build_menu_tree(items):
+    """由菜单的全部启用项组装菜单树，只保留从顶级项可达的项"""
+    children = {}
+    for item in sorted(items, key=lambda row: (row.order_index or 0, row.id)):
+        children.setdefault(item.parent_id, []).append(item)
+
+    def build(parent_id):
+        result = []
+        for item in children.get(parent_id, []):
+            data = {
+                'id': item.id,
+                'title': item.title,
+                'url': item.url,
+                'target': item.target,
+                'order_index': item.order_index
+            }
+            subtree = build(item.id)
+            if subtree:
+                data['children'] = subtree
+            result.append(data)
+        return result
+
+    return build(None)
+
+
+def build_site_chrome(slug=None, settings=None):
+    """查询并组装快照，slug 为空时使用系统设置中的 menu_slug"""
+    if settings is None:
+        settings = get_settings()
+    menu_slug = slug or settings.get('menu_slug')
+
+    menu = None
+    if menu_slug:
+        menu_row = db.session.query(Menus.id).filter_by(slug=menu_slug, is_active=True).first()
+        if menu_row:
+            items = db.session.query(
+                MenuItems.id, MenuItems.parent_id, MenuItems.title, MenuItems.url,
+                MenuItems.target, MenuItems.order_index
+            ).filter_by(menu_id=menu_row.id, is_active=True).all()
+            menu = _build_menu_tree(items)
+
+    pages = dict(db.session.query(Pages.slug, Pages.content).filter(
+        Pages.slug.in_((FOOTER_SLUG, BANNER_SLUG))
+    ).all())
+    footer = render_with_settings(pages[FOOTER_SLUG], settings) if FOOTER_SLUG in pages else DEFAULT_FOOTER
+    banner = render_with_settings(pages[BANNER_SLUG], settings) if BANNER_SLUG in pages else ''
+
+    return {
+        'menu_slug': menu_slug,
+        'menu': menu,
+        'footer': footer,
+        'banner': banner,
+    }
+
+
+def _get_version():
+    if redis_client is not None:
+        try:
+            return redis_client.get(VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"读取站点框架版本失败: {e}")
+    return cache.get(VERSION_KEY)
+
+
+def _new_version():
+    """生成新版本号；版本号丢失（Redis 重启或缓存淘汰）后也会重新生成，旧快照随之失效"""
+    version = uuid.uuid4().hex
+    if redis_client is not None:
+        try:
+            redis_client.set(VERSION_KEY, version)
+            return version
+        except Exception as e:
+            logger.warning(f"写入站点框架版本失败: {e}")
+    cache.set(VERSION_KEY, version, timeout=0)
+    return version
+
+
+def get_site_chrome(slug=None):
+    """获取快照，slug 为空时使用当前菜单"""
+    key = f"{KEY_PREFIX}{slug or ''}"
+    version = _get_version()
+    settings, settings_version = get_versioned_settings()
+    cached = cache.get(key)
+    if version is None:
+        version = _new_version()
+    elif (cached is not None and cached.get('version') == version
+          and cached.get('settings_version') == settings_version):
+        return cached['chrome']
+
+    chrome = build_site_chrome(slug, settings)
+    cache.set(key, {'version': version, 'settings_version': settings_version, 'chrome': chrome},
+              timeout=SITE_CHROME_TIMEOUT)
+    return chrome
+
+
+def invalidate_site_chrome():
+    """系统设置、菜单、菜单项或页面修改并提交后调用"""
+    try:
+        _new_version()
+    except Exception as e:
+        logger.error(f"更新站点框架版本失败: {e}")
@@ -0,0 +1,174 @@
+"""
+文章标签
+Article.tags 规范化为 tags / article_tags 两张表，并维护每个标签的文章数；
+标签联想使用按名称排序的标签列表做二分前缀查找。
+全量重建在一个事务中完成，多个进程同时触发时只有取得锁的进程执行。
+"""
+import logging
+import re
+from bisect import bisect_left
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from src.extensions import cache
+from src.models import Article, ArticleTag, Tag, db
+from src.utils.cache_protection import CacheLock
+
+logger = logging.getLogger(__name__)
+
+MAX_TAG_LENGTH = 64
+# 标签联想使用的有序标签列表缓存键
+TAG_NAMES_CACHE_KEY = 'unique_tags'
+REBUILD_LOCK_KEY = 'tag_index_rebuild'
+REBUILD_LOCK_EXPIRE = 3600
+
+_TAG_SEPARATOR_RE = re.compile(r'[;,]')
+
+
+def split_tags(tags):
+    """将文章的标签字符串（分号或逗号分隔）拆分为去重后的标签列表"""
+    if not tags:
+        return []
+    return list(dict.fromkeys(tag.strip() for tag in _TAG_SEPARATOR_RE.split(tags) if tag.strip()))
+
+
+def _get_or_create_tag_ids(names):
+    """获取标签ID，不存在的标签会被创建"""
+    tag_ids = dict(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(names)).all())
+    for name in names:
+        if name in tag_ids:
+            continue
+        try:
+            with db.session.begin_nested():
+                tag = Tag(name=name, article_count=0)
+                db.session.add(tag)
+            tag_ids[name] = tag.id
+        except IntegrityError:
+            # 其他请求已创建同名标签
+            tag_ids[name] = db.session.query(Tag.id).filter(Tag.name == name).scalar()
+    return tag_ids
+
+
+def invalidate_tag_names():
+    cache.delete_many(TAG_NAMES_CACHE_KEY, f"{TAG_NAMES_CACHE_KEY}:stale")
+
+
+def sync_article_tags(article_id):
+    """根据 Article.tags 同步文章的标签关联与标签计数，文章不存在时移除全部关联"""
+    try:
+        tags = db.session.query(Article.tags).filter(Article.article_id == article_id).scalar()
+        wanted = {name for name in split_tags(tags) if len(name) <= MAX_TAG_LENGTH}
+        current = dict(db.session.query(Tag.name, Tag.id).join(
+            ArticleTag, ArticleTag.tag_id == Tag.id
+        ).filter(ArticleTag.article_id == article_id).all())
+
+        removed_ids = [current[name] for name in current.keys() - wanted]
+        added_names = sorted(wanted - current.keys())
+        if not removed_ids and not added_names:
+            return
+
+        if removed_ids:
+            db.session.query(ArticleTag).filter(
+                ArticleTag.article_id == article_id,
+                ArticleTag.tag_id.in_(removed_ids)
+            ).delete(synchronize_session=False)
+            db.session.query(Tag).filter(Tag.id.in_(removed_ids)).update(
+                {Tag.article_count: Tag.article_count - 1}, synchronize_session=False)
+
+        if added_names:
+            added_ids = list(_get_or_create_tag_ids(added_names).values())
+            db.session.bulk_insert_mappings(ArticleTag, [
+                {'article_id': article_id, 'tag_id': tag_id} for tag_id in added_ids
+            ])
+            db.session.query(Tag).filter(Tag.id.in_(added_ids)).update(
+                {Tag.article_count: Tag.article_count + 1}, synchronize_session=False)
+
+        db.session.commit()
+        invalidate_tag_names()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"同步文章 {article_id} 的标签失败: {e}")
+
+
+def rebuild_tag_index(batch_size=500):
+    """
+    由 Article.tags 全量重建标签关联，并重新计算计数、删除无文章的标签
+
+    Returns:
+        标签数；其他进程正在重建时返回 None
+    """
+    lock = CacheLock(REBUILD_LOCK_KEY, expire=REBUILD_LOCK_EXPIRE)
+    if not lock.acquire(timeout=0):
+        logger.info("其他进程正在重建标签索引，跳过")
+        return None
+    try:
+        _rebuild_tag_index(batch_size)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        lock.release()
+    invalidate_tag_names()
+
+    total = db.session.query(func.count(Tag.id)).scalar()
+    logger.info(f"标签索引重建完成，共 {total} 个标签")
+    return total
+
+
+def _rebuild_tag_index(batch_size):
+    db.session.query(ArticleTag).delete(synchronize_session=False)
+
+    last_id = 0
+    while True:
+        rows = db.session.query(Article.article_id, Article.tags).filter(
+            Article.article_id > last_id
+        ).order_by(Article.article_id).limit(batch_size).all()
+        if not rows:
+            break
+
+        article_names = {
+            article_id: {name for name in split_tags(tags) if len(name) <= MAX_TAG_LENGTH}
+            for article_id, tags in rows
+        }
+        tag_ids = _get_or_create_tag_ids(sorted(set().union(*article_names.values())))
+        db.session.bulk_insert_mappings(ArticleTag, [
+            {'article_id': article_id, 'tag_id': tag_ids[name]}
+            for article_id, names in article_names.items() for name in names
+        ])
+        last_id = rows[-1][0]
+
+    article_count = db.session.query(func.count(ArticleTag.article_id)).filter(
+        ArticleTag.tag_id == Tag.id).scalar_subquery()
+    db.session.query(Tag).update({Tag.article_count: article_count}, synchronize_session=False)
+    db.session.query(Tag).filter(Tag.article_count == 0).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def ensure_tag_index():
+    """标签表为空时执行一次全量重建"""
+    if db.session.query(Tag.id).first() is not None:
+        return 0
+    return rebuild_tag_index() or 0
+
+
+def get_tag(name):
+    """按名称获取标签，不存在时返回 None"""
+    return db.session.query(Tag).filter(Tag.name == name).first()
+
+
+def load_tag_names():
+    """按名称排序的有文章的标签列表，供前缀查找使用"""
+    # 在 Python 中排序，保证与 bisect 的比较规则一致（不受数据库排序规则影响）
+    return sorted(row[0] for row in db.session.query(Tag.name).filter(Tag.article_count > 0).all())
+
+
+def match_prefix(sorted_names, prefix, limit=5):
+    """在有序标签列表中二分查找以 prefix 开头的标签"""
+    start = bisect_left(sorted_names, prefix)
+    matched = []
+    for name in sorted_names[start:start + limit]:
+        if not name.startswith(prefix):
+            break
+        matched.append(name)
+    return matched
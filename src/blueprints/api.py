@@ -3,10 +3,13 @@ from pathlib import Path
 
 from flask import Blueprint, jsonify, current_app, request
 from flask_login import login_required
-from sqlalchemy import select, func
 
 from src.auth_utils import jwt_required, admin_required, origin_required
+from src.blog.article.content import on_article_changed
+from src.blog.article.like import add_article_like, filter_liked
 from src.blog.article.password import check_apw_form, get_apw_form
+from src.blog.article.view_counter import record_view
+from src.blog.tag import TAG_NAMES_CACHE_KEY, load_tag_names, match_prefix
 from src.blueprints.blog import get_site_domain
 from src.extensions import cache, csrf, limiter
 from src.models import ArticleI18n, Article, User, db
@@ -15,12 +18,11 @@ from src.setting import app_config
 from src.upload.admin_upload import admin_upload_file
 from src.upload.public_upload import upload_cover_back, handle_user_upload
 from src.user.authz.qrlogin import check_qr_login_back, phone_scan_back, qr_login
-from src.user.entities import get_avatar
+from src.user.entities import get_avatar, get_user
 from src.user.profile.social import get_user_info
 from src.user.views import confirm_email_back
 from src.utils.cache_protection import ProtectedCache, cache_with_regeneration, cache_with_stale_data
 from src.utils.config.theme import get_all_themes
-from src.utils.filters import f2list
 from src.utils.http.generate_response import send_chunk_md
 from src.utils.security.safe import is_valid_iso_language_code
 
@@ -89,41 +91,17 @@ def api_user_avatar(user_identifier=None, identifier_type='id'):
 @api_bp.route('/tags/suggest', methods=['GET'])
 def suggest_tags():
     prefix = request.args.get('q', '')
-    # logger.debug(f"prefix: {prefix}")
 
-    # 使用带保护的缓存来存储去重后的标签列表
-    cache_key = 'unique_tags'  # 使用明确的缓存键名
-    unique_tags = protected_cache.get_with_stale_data(
-        cache_key,
-        lambda: _generate_unique_tags(),
+    # 按名称排序的标签列表来自标签表，使用带保护的缓存
+    tag_names = protected_cache.get_with_stale_data(
+        TAG_NAMES_CACHE_KEY,
+        load_tag_names,
         fresh_timeout=600,  # 10分钟新鲜时间
         stale_timeout=1800  # 30分钟陈旧时间
     )
 
-    # 过滤出匹配前缀的标签
-    matched_tags = [tag for tag in unique_tags if tag.startswith(prefix)]
-    # logger.debug(f"匹配前缀 '{prefix}' 的标签数量: {len(matched_tags)}")
-
-    # 返回前五个匹配的标签
-    return jsonify(matched_tags[:5])
-
-
-def _generate_unique_tags():
-    """生成唯一的标签列表"""
-    logger.info("缓存未命中，从数据库加载标签...")
-    # 获取所有文章的标签字符串
-    tags_results = db.session.execute(select(func.distinct(Article.tags))).scalars().all()
-
-    # 处理标签数据
-    all_tags = []
-    for tag_string in tags_results:
-        if tag_string:  # 确保不是空字符串  
-            all_tags.extend(f2list(tag_string.strip()))
-
-    # 去重并排序
-    unique_tags = sorted(set(all_tags))
-    logger.info(f"加载并处理完成，唯一标签数量: {len(unique_tags)}")
-    return unique_tags
+    # 二分查找前缀，返回前五个匹配的标签
+    return jsonify(match_prefix(tag_names, prefix, limit=5))
 
 
 # 验证并执行换绑的路由
@@ -135,9 +113,13 @@ def confirm_email_change(user_id, token):
 
 # 使用带锁机制的缓存装饰器
 @cache_with_regeneration(cache, timeout=300)
+def get_cached_themes():
+    return get_all_themes()
+
+
 @api_bp.route('/theme', methods=['GET'])
 def get_current_theme():
-    return jsonify(get_all_themes())
+    return jsonify(get_cached_themes())
 
 
 @cache.memoize(timeout=300)
@@ -223,6 +205,7 @@ def update_article_status(user_id, article_id):
     article.status = new_status
     # article.updated_at = datetime.now()
     db.session.commit()
+    on_article_changed(article_id)
     return jsonify({'success': True, 'message': f'文章已{new_status}'})
 
 
@@ -316,7 +299,7 @@ def upload_media_file(user_id):
 
 from src.upload.public_upload import handle_chunked_upload_init, handle_chunked_upload_chunk, \
     handle_chunked_upload_complete, handle_chunked_upload_progress, handle_chunked_upload_cancel, \
-    handle_chunked_upload_chunks
+    handle_chunked_upload_chunks, handle_instant_upload
 
 # 大文件分块上传路由
 api_bp.add_url_rule('/upload/chunked/init', 'chunked_upload_init', handle_chunked_upload_init, methods=['POST'])
@@ -329,6 +312,8 @@ api_bp.add_url_rule('/upload/chunked/chunks', 'chunked_upload_chunks', handle_ch
                     methods=['GET'])
 api_bp.add_url_rule('/upload/chunked/cancel', 'chunked_upload_cancel', handle_chunked_upload_cancel,
                     methods=['POST'])
+# 秒传协商
+api_bp.add_url_rule('/upload/instant', 'instant_upload', handle_instant_upload, methods=['POST'])
 
 
 @cache.cached(timeout=300)
@@ -359,61 +344,41 @@ from src.security import admin_permission, role_required, permission_required, c
 def like_article(user_id, article_id):
     """用户点赞文章"""
     try:
-        # 获取文章
-        from src.models.article import ArticleLike
-        article = Article.query.get(article_id)
-        if not article:
+        liked, likes = add_article_like(user_id, article_id)
+        if likes is None:
             return jsonify({'success': False, 'message': '文章不存在'}), 404
-
-        # 检查用户是否已经点过赞
-        existing_like = ArticleLike.query.filter_by(user_id=user_id, article_id=article_id).first()
-        if existing_like:
+        if not liked:
             return jsonify({'success': False, 'message': '您已经点过赞了'}), 400
 
-        # 增加点赞数
-        article.likes += 1
-
-        # 记录用户点赞
-        new_like = ArticleLike(user_id=user_id, article_id=article_id)
-        db.session.add(new_like)
-
-        db.session.commit()
-
         return jsonify({
             'success': True,
             'message': '点赞成功',
-            'likes': article.likes
+            'likes': likes
         }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': '点赞失败'}), 500
 
 
+@api_bp.route('/article/liked', methods=['GET'])
+@limiter.limit("60 per minute")
+def liked_articles():
+    """查询当前用户在给定文章（ids 参数，逗号分隔）中已点赞的文章ID"""
+    from flask_login import current_user
+    if not current_user.is_authenticated:
+        return jsonify({'liked': []}), 200
+    article_ids = [int(value) for value in request.args.get('ids', '').split(',')[:100] if value.isdigit()]
+    return jsonify({'liked': filter_liked(current_user.id, article_ids)}), 200
+
+
 @api_bp.route('/article/<int:article_id>/view', methods=['POST'])
+@limiter.limit("60 per minute")
 def record_article_view(article_id):
-    """记录文章浏览量（使用缓存异步更新数据库）"""
+    """记录文章浏览量，计入计数器后由调度器批量写入数据库"""
     try:
-        # 检查文章是否存在
-        article = db.session.query(Article).filter_by(article_id=article_id).first()
-        if not article:
+        if not record_view(article_id):
             return jsonify({'success': False, 'message': '文章不存在'}), 404
-
-        # 使用缓存来记录浏览量，避免频繁写入数据库
-        cache_key = f"article_views_{article_id}"
-        current_views = cache.get(cache_key)
-
-        if current_views is None:
-            # 如果缓存中没有，则从数据库获取当前浏览量
-            current_views = article.views
-
-        # 增加浏览量计数
-        current_views += 1
-
-        # 将新的浏览量存回缓存
-        cache.set(cache_key, current_views, timeout=300)  # 缓存5分钟
-
         return jsonify({'success': True, 'message': '浏览量记录成功'})
-
     except Exception as e:
         return jsonify({'success': False, 'message': f'记录浏览量失败: {str(e)}'}), 500
 
@@ -488,7 +453,7 @@ def check_login_status():
 
 @cache.memoize(timeout=300)
 def check_user_exist(user_id):
-    return User.query.get(user_id) is not None
+    return get_user(user_id) is not None
 
 
 @api_bp.route('/user/media', methods=['GET'])
@@ -12,6 +12,7 @@ from flask_login import login_user, logout_user
 from src.extensions import limiter
 from src.models import User, UserSession, db
 from src.setting import app_config
+from src.user.authz.stateless import token_claims
 
 auth_bp = Blueprint('auth', __name__, template_folder='templates')
 from flask_wtf import FlaskForm
@@ -310,6 +311,10 @@ def is_mobile_device(user_agent):
 
 @auth_bp.route('/logout')
 def logout():
+    access_token = request.cookies.get('access_token')
+    if access_token:
+        from src.user.authz.session_validation import revoke_access_token
+        revoke_access_token(access_token)
     response = make_response(redirect('/profile'))
     cookies_to_clear = ['jwt', 'refresh_token', 'access_token', 'zb_session']
     for cookie_name in cookies_to_clear:
@@ -342,7 +347,7 @@ def login_post_response(form, mobile_device=False, next_url=None):
 
         access_token = create_access_token(
             identity=str(user.id),
-            additional_claims={'user_id': user.id, 'email': user.email, 'jti': str(uuid.uuid4()), },
+            additional_claims={**token_claims(user.id, user.email), 'jti': str(uuid.uuid4()), },
             expires_delta=app_config.JWT_ACCESS_TOKEN_EXPIRES
         )
         refresh_token = create_refresh_token(identity=str(user.id),
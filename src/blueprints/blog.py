@@ -1,24 +1,36 @@
 import re
 
 from flask import Blueprint
-from flask import request, render_template, jsonify, current_app
-from flask import url_for, flash, redirect
-from flask_jwt_extended import current_user
+from flask import request, render_template, jsonify, current_app, g
+from flask import url_for, flash, redirect, make_response
+from flask_login import current_user
+from pygments.styles import get_all_styles
 
 from src.auth_utils import jwt_required
+from src.blog.article.content import on_article_changed
+from src.blog.article.detail import load_article_detail_by_id, load_article_detail_by_slug
+from src.blog.article.detail import load_article_version_by_id, load_article_version_by_slug
 from src.blog.article.password import get_article_password
 from src.blog.homepage import index_page_back, tag_page_back, featured_page_back
+from src.blog.site_chrome import get_site_chrome, render_with_settings
 from src.error import error
 from src.extensions import cache, csrf, limiter
-from src.models import Article, ArticleContent, ArticleI18n, User, db, Category, VIPPlan
-from src.models import UserSubscription, Notification, Pages, SystemSettings, MenuItems, Menus
-from src.user.entities import auth_by_uid
+from src.models import Article, ArticleContent, ArticleI18n, db, Category, VIPPlan
+from src.models import UserSubscription, Pages
+from src.user.entities import auth_by_uid, get_user
+from src.user.stats import get_user_stats
 from src.user.views import change_profiles_back, setting_profiles_back
+from src.utils.config.system_settings import get_setting, get_settings
+from src.utils.filters import markdown_stylesheet, markdown_stylesheet_version
+from src.utils.http.etag import data_etag, not_modified
 from src.utils.security.safe import is_valid_iso_language_code, valid_language_codes
 from src.utils.security.safe import random_string
 
 blog_bp = Blueprint('blog', __name__)
 
+# 详情页可能包含 VIP 内容，只允许浏览器缓存并每次验证 ETag
+DETAIL_CACHE_CONTROL = 'private, no-cache'
+
 
 def edit_article_back(user_id, article_id):
     auth = auth_by_uid(article_id, user_id)
@@ -71,6 +83,7 @@ def edit_article_back(user_id, article_id):
 
             # 提交所有更改到数据库
             db.session.commit()
+            on_article_changed(article_id)
             flash('更新成功!', 'success')
 
         except Exception as e:
@@ -129,6 +142,7 @@ def new_article_back(user_id):
         )
         db.session.add(article_content)
         db.session.commit()
+        on_article_changed(new_article.article_id)
         flash('文章创建成功!', 'success')
         return redirect('/my/posts')
 
@@ -229,42 +243,46 @@ def contribute_back(aid):
     return jsonify({'success': False, 'message': 'Invalid request method'}), 400
 
 
-def blog_detail_aid_back(aid, safe_mode=True):
-    try:
-        article = db.session.query(Article).filter(
-            Article.article_id == aid,
-            Article.status == 1
-        ).first()
+def _detail_etag(version):
+    """由文章、正文、多语言版本的数据版本和正文主题计算详情页 ETag"""
+    return data_etag('article', version.article_id, request.cookies.get('theme'), version.updated_at,
+                     version.content_updated_at, version.views, version.likes,
+                     version.i18n_count, version.i18n_updated_at)
 
-        # print(article)
 
-        if article:
-            if safe_mode:
-                # 仅在安全模式下检查是否隐藏
-                if article.hidden:
-                    return render_template('inform.html', aid=article.article_id)
-            # 获取文章内容
-            content = db.session.query(ArticleContent).filter_by(aid=article.article_id).first()
-            print(content)
+def _render_detail(detail, etag):
+    response = make_response(render_template('blog/detail.html',
+                                             article=detail.article,
+                                             content=detail.content,
+                                             author=detail.author,
+                                             i18n_versions=detail.i18n_versions))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = DETAIL_CACHE_CONTROL
+    return response
 
-            # 获取多语言版本
-            i18n_versions = db.session.query(ArticleI18n).filter_by(article_id=article.article_id).all()
 
-            # 获取作者信息
-            author = db.session.query(User).get(article.user_id)
-            print(f'1. author: {author}')
-            print(f'2. content: {content}')
-            print(f'3. i18n: {i18n_versions}')
+def blog_detail_aid_back(aid, safe_mode=True):
+    try:
+        version = load_article_version_by_id(aid)
+        if version is None:
+            return error(message='Article not found', status_code=404)
 
-            return render_template('blog/detail.html',
-                                   article=article,
-                                   content=content,
-                                   author=author,
-                                   i18n_versions=i18n_versions,
-                                   )
-        return error(message='Article not found', status_code=404)
+        if safe_mode:
+            # 仅在安全模式下检查是否隐藏
+            if version.hidden:
+                return render_template('inform.html', aid=version.article_id)
+
+        etag = _detail_etag(version)
+        response = not_modified(etag, cache_control=DETAIL_CACHE_CONTROL)
+        if response is not None:
+            return response
+
+        detail = load_article_detail_by_id(aid)
+        if detail is None:
+            return error(message='Article not found', status_code=404)
+        return _render_detail(detail, etag)
     except Exception as e:
-        print(f"Template error: {str(e)}")
+        current_app.logger.error(f"Template error: {str(e)}")
         return error(message=f'Internal server error: {str(e)}', status_code=500)
 
 
@@ -345,19 +363,16 @@ def new_article(user_id):
 
 @blog_bp.route('/', methods=['GET'])
 @blog_bp.route('/index.html', methods=['GET'])
-@cache.cached(timeout=180, query_string=True)
 def index_html():
     return index_page_back()
 
 
 @blog_bp.route('/tag/<tag_name>', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
 def tag_page(tag_name):
     return tag_page_back(tag_name, current_app.config['global_encoding'])
 
 
 @blog_bp.route('/featured', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
 def featured_page():
     return featured_page_back()
 
@@ -393,37 +408,28 @@ def user_space(user_id, target_user_id):
     # 检查会话是否有效
     from src.auth_utils import check_access_token
     access_token = request.cookies.get('access_token')
-    if access_token and not check_access_token(access_token):
+    # 无状态认证已在 jwt_required 中校验过会话
+    if access_token and not g.get('stateless_auth') and not check_access_token(access_token):
         from flask import flash
         flash("会话已过期，请重新登录", 'error')
         from flask import url_for
         return redirect(url_for('auth.logout'))
     try:
-        target_user = User.query.get_or_404(target_user_id)
+        target_user = get_user(target_user_id)
+        if target_user is None:
+            return error(message="用户不存在", status_code=404)
 
         # 判断是否为当前用户自己的空间
         is_own_profile = user_id == target_user_id
 
-        has_unread_message = False
-
-        if is_own_profile:
-            # 获取用户未读消息数
-            has_unread_message = bool(db.session.query(Notification).filter_by(user_id=target_user_id,
-                                                                               is_read=False).count()) or False
-
         if target_user.profile_private and not is_own_profile:
             return render_template('inform.html', status_code=503, message='<h1>该用户未公开资料</h1><UNK>')
 
-        # 获取用户统计数据
-        stats = {
-            'articles_count': Article.query.filter_by(user_id=target_user_id, status=1).count(),
-            'followers_count': UserSubscription.query.filter_by(subscribed_user_id=target_user_id).count(),
-            'following_count': UserSubscription.query.filter_by(subscriber_id=target_user_id).count(),
-            'total_views': db.session.query(db.func.sum(Article.views)).filter_by(user_id=target_user_id,
-                                                                                  status=1).scalar() or 0,
-            'total_likes': db.session.query(db.func.sum(Article.likes)).filter_by(user_id=target_user_id,
-                                                                                  status=1).scalar() or 0
-        }
+        # 获取用户统计数据（一次主键查询）
+        stats = get_user_stats(target_user_id)
+
+        # 只有自己的空间显示未读消息提示
+        has_unread_message = is_own_profile and stats['unread_notifications'] > 0
 
         # 获取用户最新发布的文章
         recent_articles = Article.query.filter_by(
@@ -455,63 +461,27 @@ def render_template_with_settings(template_content):
     根据 SystemSettings 表中的所有键值对替换模板内容
     模板中的占位符格式为 {{ key_name }}
     """
-    if not template_content:
-        return template_content
-
-    # 获取所有系统设置
-    settings = db.session.query(SystemSettings).all()
+    return render_with_settings(template_content, get_settings())
 
-    # 构建键值对字典
-    settings_dict = {setting.key: setting.value for setting in settings}
 
-    # 替换模板中的占位符
-    for key, value in settings_dict.items():
-        placeholder = '{{ ' + key + ' }}'
-        if placeholder in template_content and value:
-            template_content = template_content.replace(placeholder, value)
-
-    return template_content
-
-
-@cache.cached(timeout=24 * 3600, key_prefix='footer')
 def get_footer():
-    footer_content = db.session.query(Pages).filter_by(slug='footer001').first()
-
-    if not footer_content:
-        return '<span>-- 我是有底线的 --</span>'
+    return get_site_chrome()['footer']
 
-    # 使用通用的模板渲染函数
-    rendered_content = render_template_with_settings(footer_content.content)
 
-    return rendered_content
-
-
-@cache.cached(timeout=24 * 3600, key_prefix='banner')
 def get_banner():
-    banner_content = db.session.query(Pages).filter_by(slug='banner001').first()
-
-    if not banner_content:
-        return ''
-
-    # 使用通用的模板渲染函数
-    rendered_content = render_template_with_settings(banner_content.content)
-
-    return rendered_content
+    return get_site_chrome()['banner']
 
 
 def get_system_setting_value(key):
     """获取系统设置中的某个值"""
-    setting = db.session.query(SystemSettings.value).filter_by(key=key).first()
-    return setting.value if setting else None
+    return get_setting(key)
 
 
-@cache.cached(timeout=24 * 3600, key_prefix='site_title')
 def get_site_title():
     """获取网站标题"""
     return get_system_setting_value('site_title')
 
 
-@cache.cached(timeout=24 * 3600, key_prefix='site_domain')
 def get_site_domain():
     """获取网站域名"""
     return get_system_setting_value('site_domain')
@@ -521,7 +491,7 @@ def get_site_domain():
 @cache.cached(timeout=24 * 3600, key_prefix='site_slug')
 def get_username(user_id):
     if user_id:
-        return User.query.filter_by(id=user_id).first().username
+        return get_user(user_id).username
     else:
         return '未登录'
 
@@ -534,74 +504,31 @@ def get_username_no_check():
         return '未登录'
 
 
-@cache.cached(timeout=24 * 3600, key_prefix='site_beian')
 def get_site_beian():
     """获取网站备案号"""
     return get_system_setting_value('site_beian')
 
 
-def get_menu_by_slug(slug):
-    """根据slug获取菜单及其所有菜单项"""
-    menu = Menus.query.filter_by(slug=slug, is_active=True).first()
-    if not menu:
-        return None
-
-    # 获取所有顶级菜单项（parent_id为None）
-    menu_items = MenuItems.query.filter_by(
-        menu_id=menu.id,
-        parent_id=None,
-        is_active=True
-    ).order_by(MenuItems.order_index).all()
-
-    return {
-        'menu': menu,
-        'items': menu_items
-    }
-
-
-def build_menu_tree(menu_items):
-    """递归构建菜单树"""
-    result = []
-    for item in menu_items:
-        menu_item_data = {
-            'id': item.id,
-            'title': item.title,
-            'url': item.url,
-            'target': item.target,
-            'order_index': item.order_index
-        }
-
-        # 递归处理子菜单
-        children = MenuItems.query.filter_by(
-            parent_id=item.id,
-            is_active=True
-        ).order_by(MenuItems.order_index).all()
-
-        if children:
-            menu_item_data['children'] = build_menu_tree(children)
-
-        result.append(menu_item_data)
-
-    return result
-
-
-@cache.cached(timeout=3 * 3600, key_prefix='site_menu')
 def get_site_menu(slug):
-    """获取网站菜单"""
-    menu_data = get_menu_by_slug(slug)
-    if not menu_data:
-        return None
-    # 构建菜单树
-    menu_tree = build_menu_tree(menu_data['items'])
-    print(menu_tree)
-    return menu_tree
+    """获取网站菜单树"""
+    return get_site_chrome(slug)['menu']
 
 
-@cache.cached(timeout=3600, key_prefix='site_footer')
 def get_current_menu_slug():
     """获取当前菜单的slug"""
-    menu_slug = SystemSettings.query.filter_by(key='menu_slug').first()
-    return menu_slug.value if menu_slug else None
+    return get_system_setting_value('menu_slug')
+
+
+@blog_bp.route('/markdown/<string:theme>.css', methods=['GET'])
+def markdown_stylesheet_route(theme):
+    """文章正文共享样式表，按内容摘要设置 ETag"""
+    pygments_style = request.args.get('pygments', 'default')
+    if pygments_style not in get_all_styles():
+        pygments_style = 'default'
+    response = current_app.response_class(markdown_stylesheet(theme, pygments_style), mimetype='text/css')
+    response.set_etag(markdown_stylesheet_version(theme, pygments_style))
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response.make_conditional(request)
 
 
 @cache.cached(timeout=3600, key_prefix='selfDefined_page')
@@ -614,81 +541,60 @@ def get_self_defined_page(slug):
     return page.content
 
 
-def is_owner_or_vip(user_id, article):
-    # 首先检查用户ID是否存在
-    if user_id is None:
+def is_owner_or_vip(user, article):
+    # 首先检查用户是否登录
+    if user is None or not user.is_authenticated:
         return False, '此文为VIP专享，需要完成登录认证'
 
     # 验证是否为作者
-    if auth_by_uid(article.article_id, user_id):
+    if user.id == article.user_id:
         return True, '您是作者，可以继续阅读'
 
     # 验证VIP权限
-    try:
-        user = db.session.query(User).get(user_id)
-        if user is None:
-            return False, '用户信息不存在，请重新登录'
-
-        if user.vip_level >= article.required_vip_level:
-            return True, f'您是尊贵的VIP{user.vip_level}，可以继续阅读'
-        else:
-            return False, f'此文需要VIP{article.required_vip_level}及以上等级才能阅读，您当前是VIP{user.vip_level}'
-    except Exception as e:
-        # 记录错误日志
-        print(f"VIP权限验证失败: {e}")
-        return False, '权限验证失败，请稍后重试'
+    vip_level = user.vip_level or 0
+    if vip_level >= article.required_vip_level:
+        return True, f'您是尊贵的VIP{vip_level}，可以继续阅读'
+    else:
+        return False, f'此文需要VIP{article.required_vip_level}及以上等级才能阅读，您当前是VIP{vip_level}'
 
 
 def blog_detail_back(blog_slug, safe_mode=True):
     try:
-        # 尝试作为文章slug查找
-        article = db.session.query(Article).filter(
-            Article.slug == blog_slug,
-            Article.status == 1,
-        ).first()
-
-        print(f'0. {article}')
-
-        if not article:
+        # 先读取不含正文的数据版本，完成访问控制后再比较 ETag
+        version = load_article_version_by_slug(blog_slug)
+        if version is None:
             return error(message='Article not found', status_code=404)
 
         if safe_mode:
             # 仅在安全模式下检查是否隐藏
-            if article.hidden:
-                return render_template('inform.html', aid=article.article_id)
+            if version.hidden:
+                return render_template('inform.html', aid=version.article_id)
 
-            if article.is_vip_only:
-                user_id = current_user.id
-                result, message = is_owner_or_vip(article=article, user_id=user_id)
+            if version.is_vip_only:
+                result, message = is_owner_or_vip(user=current_user, article=version)
                 if not result:
                     return render_template('inform.html', status_code=403, message=message)
 
-        # 获取文章内容
-        content = db.session.query(ArticleContent).filter_by(aid=article.article_id).first()
-        if not content:
-            return error(message='Content not found', status_code=404)
+        etag = _detail_etag(version)
+        response = not_modified(etag, cache_control=DETAIL_CACHE_CONTROL)
+        if response is not None:
+            return response
 
-        # 获取多语言版本
-        i18n_versions = db.session.query(ArticleI18n).filter_by(article_id=article.article_id).all()
+        detail = load_article_detail_by_slug(blog_slug)
+        if detail is None:
+            return error(message='Article not found', status_code=404)
 
-        # 获取作者信息
-        author = db.session.query(User).get(article.user_id)
-        if not author:
-            return render_template('inform.html', status_code=404, message='作者信息不存在')
+        if detail.content is None:
+            return error(message='Content not found', status_code=404)
 
-        # print(f'1. author: {author}')
-        # print(f'2. content: {content}')
-        # print(f'3. i18n: {i18n_versions}')
+        if detail.author is None:
+            return render_template('inform.html', status_code=404, message='作者信息不存在')
 
-        return render_template('blog/detail.html',
-                               article=article,
-                               content=content,
-                               author=author,
-                               i18n_versions=i18n_versions
-                               )
+        return _render_detail(detail, etag)
 
     except Exception as e:
-        print(f"博客详情页错误: {e}")
+        current_app.logger.error(f"博客详情页错误: {e}")
+        return error(message='Internal server error', status_code=500)
 
 
 def blog_tmp_url(domain, cache_instance):
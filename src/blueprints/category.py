@@ -2,10 +2,11 @@ from flask import Blueprint
 from flask import render_template, jsonify
 
 from src.auth_utils import jwt_required
-from src.blog.homepage import get_articles_with_filters, proces_page_data, create_response
+from src.blog.homepage import listing_page_response
+from src.blog.listing import category_list_key
 from src.error import error
 from src.models import Category, CategorySubscription
-from src.models import db, Article
+from src.models import db
 
 category_bp = Blueprint('category', __name__, url_prefix='/category')
 
@@ -33,10 +34,8 @@ def category_index(name):
         if not category:
             return error("Category not found", 404)
 
-        # 使用获取到的id来过滤Article
-        article_info, total_articles = get_articles_with_filters([Article.category_id == category.id], page, page_size)
-        html_content, etag = proces_page_data(total_articles, article_info, page, page_size, theme)
-        return create_response(html_content, etag)
+        # 读取该分类的文章列表
+        return listing_page_response(category_list_key(category.id), page, page_size, theme)
     except Exception as e:
         return error(str(e), 500)
 
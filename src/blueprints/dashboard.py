@@ -4,9 +4,15 @@ import bcrypt
 from flask import Blueprint, json
 
 from src.auth_utils import admin_required
+from src.blog.article.content import on_article_changed
+from src.blog.site_chrome import invalidate_site_chrome
 from src.extensions import limiter
 from src.models import User, Article, ArticleContent, ArticleI18n, Category, db, CategorySubscription, Menus, \
     MenuItems, Pages, SystemSettings, FileHash, Media, Url, SearchHistory, Event, Report
+from src.other.search_history import clear_recent_keywords
+from src.user.authz.permission_set import invalidate_user_permissions
+from src.user.entities import get_user as load_user
+from src.utils.config.system_settings import publish_settings_changed
 # from src.error import error
 from src.utils.config.theme import get_all_themes
 from src.utils.security.safe import validate_email_base
@@ -25,7 +31,7 @@ def admin_index(user_id):
         articles_count = db.session.query(Article).count()
         # 获取评论数量
         comments_count = 0
-        current_user = db.session.query(User).filter_by(id=user_id).first()
+        current_user = load_user(user_id)
         return render_template('dashboard/index.html', users_count=users_count, articles_count=articles_count,
                                comments_count=comments_count, current_user=current_user)
     except Exception as e:
@@ -36,7 +42,7 @@ def admin_index(user_id):
 @admin_required
 def admin_user(user_id):
     try:
-        current_user = db.session.query(User).filter_by(id=user_id).first()
+        current_user = load_user(user_id)
         return render_template('dashboard/user.html', current_user=current_user)
     except Exception as e:
         return jsonify({'error': str(e)})
@@ -45,7 +51,7 @@ def admin_user(user_id):
 @admin_bp.route('/blog', methods=['GET'])
 @admin_required
 def admin_blog(user_id):
-    current_user = db.session.query(User).filter_by(id=user_id).first()
+    current_user = load_user(user_id)
     return render_template('dashboard/blog.html', current_user=current_user)
 
 
@@ -202,7 +208,7 @@ def create_user(user_id):
 @admin_required
 def update_user(user_id, user_id2):
     """更新用户信息"""
-    user = db.session.query(User).filter_by(id=user_id2).first()
+    user = load_user(user_id2)
     data = request.get_json()
 
     # 更新用户名
@@ -261,7 +267,7 @@ def update_user(user_id, user_id2):
 def delete_user(user_id, user_id2):
     """删除用户"""
     try:
-        user = db.session.query(User).filter_by(id=user_id2).first()
+        user = load_user(user_id2)
 
         # 检查用户是否有关联数据
         media_count = len(user.media)
@@ -278,8 +284,10 @@ def delete_user(user_id, user_id2):
             }), 409
 
         username = user.username
+        deleted_user_id = user.id
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_permissions(deleted_user_id)
 
         return jsonify({
             'success': True,
@@ -365,7 +373,7 @@ def get_stats(user_id):
 @admin_bp.route('/display', methods=['GET'])
 @admin_required
 def m_display(user_id):
-    current_user = db.session.query(User).filter_by(id=user_id).first()
+    current_user = load_user(user_id)
     return render_template('dashboard/M-display.html',
                            current_user=current_user,
                            displayList=get_all_themes(), user_id=user_id)
@@ -485,7 +493,7 @@ def create_article(user_id):
 
         # 验证作者是否存在
         print(f"[3] 验证作者ID {data['author_id']} 是否存在...")
-        author = User.query.get(data['author_id'])
+        author = load_user(data['author_id'])
         if not author:
             print("[3] 作者不存在")
             return jsonify({'success': False, 'message': '作者不存在'}), 404
@@ -542,6 +550,7 @@ def create_article(user_id):
         # 统一提交
         print("[8] 执行数据库写入...")
         db.session.commit()  # 关键点3：单次提交
+        on_article_changed(new_article.article_id)
         print(f"[8] 文章创建成功，ID：{new_article.article_id}")
 
         return jsonify({
@@ -658,6 +667,7 @@ def update_article(user_id, article_id):
 
         # 保存更改到数据库
         db.session.commit()
+        on_article_changed(article_id)
 
         return jsonify({
             'success': True,
@@ -697,8 +707,10 @@ def delete_article(user_id, article_id):
         db.session.query(ArticleI18n).filter_by(article_id=article.article_id).delete()
 
         title = article.title
+        author_id = article.user_id
         db.session.delete(article)
         db.session.commit()  # 确保提交会话
+        on_article_changed(article_id, author_id)
 
         return jsonify({
             'success': True,
@@ -748,6 +760,7 @@ def update_article_status(user_id, article_id):
         article.status = status_mapping[input_status]
 
         db.session.commit()
+        on_article_changed(article_id)
 
         return jsonify({
             'success': True,
@@ -893,7 +906,7 @@ def get_authors(user_id):
 def admin_categories(user_id):
     try:
         # 获取当前用户信息
-        current_user = db.session.query(User).filter_by(id=user_id).first()
+        current_user = load_user(user_id)
 
         # 处理删除请求
         if request.method == 'DELETE':
@@ -1021,7 +1034,7 @@ def list_categories(user_id):
 def admin_settings(user_id):
     try:
         # 获取当前用户信息
-        current_user = db.session.query(User).filter_by(id=user_id).first()
+        current_user = load_user(user_id)
 
         # 处理系统设置保存
         if request.method == 'POST' and 'settings' in request.form:
@@ -1043,6 +1056,8 @@ def admin_settings(user_id):
                         )
                         db.session.add(setting)
                 db.session.commit()
+                publish_settings_changed()
+                invalidate_site_chrome()
                 return jsonify({'success': True, 'message': '设置已保存'})
             except Exception as e:
                 return jsonify({'success': False, 'message': f'保存失败: {str(e)}'})
@@ -1072,6 +1087,7 @@ def admin_settings(user_id):
                 )
                 db.session.add(menu)
                 db.session.commit()
+                invalidate_site_chrome()
                 return jsonify({'success': True, 'message': '菜单创建成功', 'menu_id': menu.id})
 
             elif action == 'update_menu':
@@ -1087,6 +1103,7 @@ def admin_settings(user_id):
                     menu.is_active = is_active
                     menu.updated_at = datetime.now()
                     db.session.commit()
+                    invalidate_site_chrome()
                     return jsonify({'success': True, 'message': '菜单更新成功'})
                 return jsonify({'success': False, 'message': '菜单不存在'})
 
@@ -1098,6 +1115,7 @@ def admin_settings(user_id):
                     db.session.query(MenuItems).filter_by(menu_id=menu_id).delete()
                     db.session.delete(menu)
                     db.session.commit()
+                    invalidate_site_chrome()
                     return jsonify({'success': True, 'message': '菜单已删除'})
                 return jsonify({'success': False, 'message': '菜单不存在'})
 
@@ -1127,6 +1145,7 @@ def admin_settings(user_id):
                 )
                 db.session.add(item)
                 db.session.commit()
+                invalidate_site_chrome()
                 return jsonify({'success': True, 'message': '菜单项创建成功'})
 
             elif action == 'update_item':
@@ -1145,6 +1164,7 @@ def admin_settings(user_id):
                     item.order_index = order_index
                     item.is_active = is_active
                     db.session.commit()
+                    invalidate_site_chrome()
                     return jsonify({'success': True, 'message': '菜单项更新成功'})
                 return jsonify({'success': False, 'message': '菜单项不存在'})
 
@@ -1159,6 +1179,7 @@ def admin_settings(user_id):
 
                     db.session.delete(item)
                     db.session.commit()
+                    invalidate_site_chrome()
                     return jsonify({'success': True, 'message': '菜单项已删除'})
                 return jsonify({'success': False, 'message': '菜单项不存在'})
 
@@ -1182,7 +1203,7 @@ def admin_settings(user_id):
                 if not title or not slug:
                     return jsonify({'success': False, 'message': '页面标题和别名不能为空'})
 
-                existing_page = db.query(Pages).filter_by(slug=slug).first()
+                existing_page = db.session.query(Pages).filter_by(slug=slug).first()
                 if existing_page:
                     return jsonify({'success': False, 'message': '页面别名已存在'})
 
@@ -1203,8 +1224,9 @@ def admin_settings(user_id):
                     updated_at=datetime.now(),
                     published_at=datetime.now() if status == 1 else None
                 )
-                db.add(page)
-                db.commit()
+                db.session.add(page)
+                db.session.commit()
+                invalidate_site_chrome()
                 return jsonify({'success': True, 'message': '页面创建成功', 'page_id': page.id})
 
             elif action == 'update_page':
@@ -1250,6 +1272,7 @@ def admin_settings(user_id):
                     page.published_at = datetime.now()
 
                 db.session.commit()
+                invalidate_site_chrome()
                 return jsonify({'success': True, 'message': '页面更新成功'})
 
             elif action == 'delete_page':
@@ -1263,6 +1286,7 @@ def admin_settings(user_id):
 
                     db.session.delete(page)
                     db.session.commit()
+                    invalidate_site_chrome()
                     return jsonify({'success': True, 'message': '页面已删除'})
                 return jsonify({'success': False, 'message': '页面不存在'})
 
@@ -1303,7 +1327,7 @@ def admin_settings(user_id):
 def admin_media(user_id):
     try:
         # 获取当前用户信息
-        current_user = db.session.query(User).filter_by(id=user_id).first()
+        current_user = load_user(user_id)
 
         # 处理删除请求
         if request.method == 'DELETE':
@@ -1467,7 +1491,7 @@ from src.utils.database.backup import create_backup_tool
 def backup(user_id):
     try:
         # 获取当前用户信息
-        current_user = db.session.query(User).filter_by(id=user_id).first()
+        current_user = load_user(user_id)
 
         # 初始化备份工具
         backup_dir = Path(base_dir) / 'backup'
@@ -1783,8 +1807,10 @@ def handle_search_history_action_internal(db_session, form_data):
         history_id = form_data.get('history_id')
         history = db_session.query(SearchHistory).filter_by(id=history_id).first()
         if history:
+            history_user_id = history.user_id
             db_session.delete(history)
             db_session.commit()
+            clear_recent_keywords(history_user_id)
             return jsonify({'success': True, 'message': '搜索记录已删除'})
         return jsonify({'success': False, 'message': '搜索记录不存在'})
 
@@ -1792,11 +1818,13 @@ def handle_search_history_action_internal(db_session, form_data):
         user_id_history = form_data.get('user_id')
         db_session.query(SearchHistory).filter_by(user_id=user_id_history).delete()
         db_session.commit()
+        clear_recent_keywords(user_id_history)
         return jsonify({'success': True, 'message': '用户搜索记录已清空'})
 
     elif action == 'clear_all_history':
         db_session.query(SearchHistory).delete()
         db_session.commit()
+        clear_recent_keywords()
         return jsonify({'success': True, 'message': '所有搜索记录已清空'})
 
     return jsonify({'success': False, 'message': '未知的搜索历史操作'})
@@ -12,8 +12,8 @@ from src.auth_utils import jwt_required
 # from src.database import get_db
 from src.extensions import cache
 from src.models import Media, FileHash, db
-from src.models.user import User
 from src.setting import AppConfig, BaseConfig
+from src.user.entities import get_user
 from src.utils.image.processing import generate_video_thumbnail, generate_thumbnail
 from src.utils.security.safe import is_valid_hash
 
@@ -39,7 +39,7 @@ def get_user_storage_limit(user_id):
     VIP 2级: 5GB
     VIP 3级: 20GB
     """
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return BaseConfig.USER_FREE_STORAGE_LIMIT
         
@@ -4,6 +4,7 @@ from src.auth_utils import jwt_required
 # from src.database import get_db
 from src.models import Notification, db
 from src.notification import read_current_notification, get_notifications, read_all_notifications
+from src.user.stats import adjust_user_stats, set_user_stats
 
 noti_bp = Blueprint('noti', __name__, url_prefix='/noti')
 
@@ -35,7 +36,10 @@ def clean_notification(user_id):
     nid = request.args.get('nid', 'all')
     if nid == 'all':
         db.session.query(Notification).filter_by(user_id=user_id).delete()
+        set_user_stats(user_id, unread_notifications=0)
     else:
+        unread_count = db.session.query(Notification).filter_by(user_id=user_id, id=int(nid), is_read=False).delete()
         db.session.query(Notification).filter_by(user_id=user_id, id=int(nid)).delete()
+        adjust_user_stats(user_id, unread_notifications=-unread_count)
     db.session.commit()
     return jsonify({"success": True})
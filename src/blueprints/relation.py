@@ -3,6 +3,8 @@ from flask import jsonify
 
 from src.auth_utils import jwt_required
 from src.models import User, UserSubscription, db
+from src.user.entities import get_user
+from src.user.stats import adjust_user_stats
 
 relation_bp = Blueprint('relation', __name__, template_folder='templates')
 
@@ -37,7 +39,7 @@ def fans_list(user_id):
         ).filter(UserSubscription.subscribed_user_id == user_id).order_by(
             UserSubscription.created_at.desc()
         )
-        current_user = User.query.get(user_id)
+        current_user = get_user(user_id)
 
         fans_list = fans_query.all()
         fans_count = fans_query.count()
@@ -72,6 +74,8 @@ def follow_user(user_id, target_user_id):
         subscribed_user_id=target_user_id,
     )
     db.session.add(subscription)
+    adjust_user_stats(user_id, following_count=1)
+    adjust_user_stats(target_user_id, followers_count=1)
     db.session.commit()
 
     return jsonify({'success': True, 'message': '关注成功'})
@@ -89,6 +93,8 @@ def unfollow_user(user_id, target_user_id):
     if not subscription:
         return jsonify({'success': False, 'message': '未关注该用户'}), 400
     db.session.delete(subscription)
+    adjust_user_stats(user_id, following_count=-1)
+    adjust_user_stats(target_user_id, followers_count=-1)
     db.session.commit()
     return jsonify({'success': True, 'message': '取消关注成功'})
 
@@ -2,7 +2,9 @@ from flask import Blueprint, request, render_template
 from flask import jsonify
 
 from src.auth_utils import admin_required
-from src.models import User, Role, Permission, UserRole, RolePermission, db
+from src.models import Role, Permission, UserRole, RolePermission, db
+from src.user.authz.permission_set import invalidate_all_permissions, invalidate_user_permissions
+from src.user.entities import get_user
 
 role_bp = Blueprint('role', __name__, template_folder='templates')
 
@@ -10,7 +12,7 @@ role_bp = Blueprint('role', __name__, template_folder='templates')
 @role_bp.route('/admin/role', methods=['GET'])
 @admin_required
 def admin_roles(user_id):
-    current_user = db.session.query(User).filter_by(id=user_id).first()
+    current_user = get_user(user_id)
     return render_template('dashboard/role.html', current_user=current_user)
 
 
@@ -90,6 +92,8 @@ def create_role():
                 permission = db.session.query(Permission).get(permission_id)
                 if permission:
                     new_role.permissions.append(permission)
+            db.session.commit()
+            invalidate_all_permissions()
 
         return jsonify({
             'success': True,
@@ -169,6 +173,9 @@ def update_role(role_id):
                 if permission:
                     role.permissions.append(permission)
 
+        db.session.commit()
+        invalidate_all_permissions([role_id])
+
         return jsonify({
             'success': True,
             'message': '角色更新成功',
@@ -203,6 +210,7 @@ def delete_role(role_id):
         role_name = role.name
         db.session.delete(role)
         db.session.commit()
+        invalidate_all_permissions()
 
         return jsonify({
             'success': True,
@@ -330,6 +338,7 @@ def update_permission(permission_id):
         if 'description' in data:
             permission.description = data['description']
         db.session.commit()
+        invalidate_all_permissions([role.id for role in permission.roles])
         return jsonify({
             'success': True,
             'message': '权限更新成功',
@@ -369,6 +378,7 @@ def delete_permission(permission_id):
         permission_code = permission.code
         db.session.delete(permission)
         db.session.commit()
+        invalidate_all_permissions()
 
         return jsonify({
             'success': True,
@@ -387,7 +397,7 @@ def delete_permission(permission_id):
 def get_user_roles(user_id):
     """获取用户的角色"""
     try:
-        user = db.session.query(User).get(user_id)
+        user = get_user(user_id)
 
         if user is None:
             return jsonify({
@@ -423,7 +433,7 @@ def get_user_roles(user_id):
 def update_user_roles(user_id):
     """更新用户角色"""
     try:
-        user = db.session.query(User).get(user_id)
+        user = get_user(user_id)
         if user is None:
             return jsonify({
                 'success': False,
@@ -446,6 +456,7 @@ def update_user_roles(user_id):
             if role:
                 user.roles.append(role)
         db.session.commit()
+        invalidate_user_permissions(user_id)
         return jsonify({
             'success': True,
             'message': '用户角色更新成功',
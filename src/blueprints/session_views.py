@@ -7,6 +7,10 @@ from flask_login import login_required
 
 from src.auth_utils import admin_required
 from src.models import UserSession, User, db, Role
+from src.user.authz.permission_set import invalidate_user_permissions
+from src.user.authz.session_validation import revoke_sessions, revoke_token_digests
+from src.user.session_activity import apply_live_activity
+from src.user.entities import get_user
 
 session_bp = Blueprint('session', __name__)
 
@@ -20,9 +24,9 @@ def logout_session(session_id):
 
     # 检查会话是否存在且属于当前用户
     if user_session and user_session.user_id == current_user.id:
-        # 直接从数据库中删除记录
-        db.session.delete(user_session)
-        db.session.commit()
+        # 停用会话，记录保留到过期以便同步令牌吊销过滤器
+        user_session.deactivate()
+        revoke_sessions([user_session])
         success = True
     else:
         success = False
@@ -50,7 +54,7 @@ def logout_other_sessions():
 @login_required
 def user_sessions():
     """用户查看自己的会话"""
-    sessions = UserSession.get_active_sessions(current_user.id)
+    sessions = apply_live_activity(UserSession.get_active_sessions(current_user.id))
     return render_template('session/user.html', sessions=sessions)
 
 
@@ -100,7 +104,7 @@ def admin_sessions(user_id):
 
     return render_template(
         'session/admin.html',
-        sessions=pagination.items,
+        sessions=apply_live_activity(pagination.items),
         pagination=pagination,
         total_sessions=total_sessions,
         active_sessions=active_sessions,
@@ -117,7 +121,7 @@ def ban_user(user_id):
     """管理员封禁用户"""
     try:
         # 获取要封禁的用户
-        user_to_ban = User.query.get(user_id)
+        user_to_ban = get_user(user_id)
 
         if not user_to_ban:
             return jsonify({
@@ -159,20 +163,12 @@ def ban_user(user_id):
         user_to_ban.roles.append(banned_role)
 
         # 使用户的所有会话失效
-        active_sessions = UserSession.query.filter_by(
-            user_id=user_id,
-            is_active=True
-        ).all()
-
-        for session in active_sessions:
-            session.deactivate()
-
-        # 清除该用户的缓存
-        from src.extensions import cache
-        cache_key = f"user_banned_status_{user_id}"
-        cache.delete(cache_key)
+        digests = UserSession.deactivate_user_sessions(user_id)
 
         db.session.commit()
+        revoke_token_digests(digests)
+        # 使该用户的权限集缓存失效
+        invalidate_user_permissions(user_to_ban.id)
 
         return jsonify({
             'success': True,
@@ -3,7 +3,8 @@ from sqlalchemy import and_, or_
 
 from src.auth_utils import jwt_required
 from src.extensions import cache, limiter
-from src.models import VIPPlan, VIPSubscription, VIPFeature, User, db, Article
+from src.models import VIPPlan, VIPSubscription, VIPFeature, db, Article
+from src.user.entities import get_user
 
 vip_bp = Blueprint('vip', __name__, template_folder='templates', url_prefix='/vip')
 from datetime import datetime, timezone
@@ -30,7 +31,7 @@ def calculate_daily_cost(plans):
 def index(user_id):
     """VIP会员中心首页"""
     try:
-        _user = User.query.filter_by(id=user_id).first()
+        _user = get_user(user_id)
         if _user.vip_expires_at is None:
             active_status = False
         else:
@@ -51,7 +52,7 @@ def plans(user_id):
     try:
         _plans = VIPPlan.query.filter_by(is_active=True).order_by(VIPPlan.level).all()
         features = VIPFeature.query.filter_by(is_active=True).order_by(VIPFeature.required_level).all()
-        current_user = User.query.filter_by(id=user_id).first()
+        current_user = get_user(user_id)
         
         # 计算日均价
         _plans = calculate_daily_cost(_plans)
@@ -114,7 +115,7 @@ def subscribe(user_id, plan_id):
     )
 
     # 更新用户VIP状态
-    current_user = User.query.filter_by(id=user_id).first()
+    current_user = get_user(user_id)
     current_user.vip_level = plan.level
     current_user.vip_expires_at = expires_at
 
@@ -131,7 +132,7 @@ def my_subscription(user_id):
     """我的订阅页面"""
     try:
         # 获取当前用户
-        user = User.query.filter_by(id=user_id).first()
+        user = get_user(user_id)
         if not user:
             return jsonify({'error': '用户不存在'}), 404
 
@@ -206,7 +207,7 @@ def features(user_id):
             features_by_level[feature.required_level] = []
         features_by_level[feature.required_level].append(feature)
 
-    current_user = User.query.filter_by(id=user_id).first()
+    current_user = get_user(user_id)
     return render_template('vip/features.html', current_user=current_user, features_by_level=features_by_level,
                            features=features)
 
@@ -216,7 +217,7 @@ def features(user_id):
 def premium_content(user_id):
     """VIP专属内容页面"""
     try:
-        user = User.query.filter_by(id=user_id).first()
+        user = get_user(user_id)
         premium_articles = Article.query.filter(
             or_(
                 Article.is_vip_only == True,  # 直接使用 True
@@ -246,7 +247,7 @@ def payment_page(user_id, plan_id):
     """支付页面"""
     try:
         plan = VIPPlan.query.filter_by(id=plan_id, is_active=True).first_or_404()
-        current_user = User.query.filter_by(id=user_id).first()
+        current_user = get_user(user_id)
         # 检查用户是否已有有效订阅
         if current_user.vip_expires_at is not None:
             existing_subscription = bool(current_user.vip_level != 0 and current_user.vip_expires_at > datetime.now())
@@ -126,12 +126,11 @@ def get_friends_link():
     return "区域还在建设中，敬请期待"
 
 
-@cache.cached(timeout=24 * 3600, key_prefix='site_img')
 @website_bp.route('/favicon.ico')
 def favicon():
-    from src.models import db, SystemSettings
-    if site_img := db.session.query(SystemSettings).filter_by(key='site_img').first():
-        return redirect(site_img.value)
+    from src.utils.config.system_settings import get_setting
+    if site_img := get_setting('site_img'):
+        return redirect(site_img)
     # 动态获取domain以避免循环导入
     current_domain, _ = get_domain_and_title()
     return redirect(current_domain + 'static/favicon.ico')
\ No newline at end of file
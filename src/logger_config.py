@@ -226,6 +226,11 @@ try:
     LOG_ENTRIES = Counter('app_log_entries_total', 'Total log entries', ['level'])
     REQUEST_SIZE = Summary('app_request_size_bytes', 'Request size')
     RESPONSE_SIZE = Summary('app_response_size_bytes', 'Response size')
+    DB_QUERY_COUNT = Histogram('app_db_queries_per_request', 'Database queries per request', ['endpoint'],
+                               buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+    USER_LOOKUPS = Counter('app_user_lookups_total', 'User lookups by source (request, snapshot, database)',
+                           ['source'])
+    CACHE_REQUESTS = Counter('app_cache_requests_total', 'Cache lookups by key prefix', ['prefix', 'result'])
 
     # 重写日志处理类以添加监控
     class MonitoredRotatingFileHandler(RotatingFileHandler):
@@ -1,30 +1,32 @@
 from src.extensions import db
-from .article import Article, ArticleContent, ArticleI18n, ArticleLike
+from .article import Article, ArticleContent, ArticleI18n, ArticleLike, ArticleListing
 from .category import Category, CategorySubscription
 
 from .media import Media, FileHash
-from .misc import Event, Report, Url, SearchHistory
+from .misc import Event, Report, Url, SearchHistory, SearchIndex
 from .notification import Notification
 from .role import Role, Permission, UserRole, RolePermission
 from .social_account import SocialAccount
 from .subscription import UserSubscription
 from .system import Menus, MenuItems, Pages, SystemSettings
+from .tag import Tag, ArticleTag
 from .upload import UploadChunk, UploadTask
-from .user import User, CustomField, EmailSubscription
+from .user import User, CustomField, EmailSubscription, UserStats
 from .userSession import UserSession
 from .vip import VIPPlan, VIPSubscription, VIPFeature
 
 __all__ = [
     'db',
-    'User', 'CustomField', 'EmailSubscription',
+    'User', 'CustomField', 'EmailSubscription', 'UserStats',
     'Role', 'Permission', 'UserRole', 'RolePermission',
-    'Article', 'ArticleContent', 'ArticleI18n', 'ArticleLike',
+    'Article', 'ArticleContent', 'ArticleI18n', 'ArticleLike', 'ArticleListing',
 
     'Media', 'FileHash',
     'Category', 'CategorySubscription',
+    'Tag', 'ArticleTag',
     'Notification',
     'UserSubscription',
-    'Event', 'Report', 'Url', 'SearchHistory',
+    'Event', 'Report', 'Url', 'SearchHistory', 'SearchIndex',
     'VIPPlan', 'VIPSubscription', 'VIPFeature',
     'SocialAccount',
     'Menus', 'MenuItems', 'Pages', 'SystemSettings',
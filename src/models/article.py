@@ -106,3 +106,24 @@ class ArticleLike(db.Model):
 
     def __repr__(self):
         return f'<ArticleLike user_id={self.user_id} article_id={self.article_id}>'
+
+
+class ArticleListing(db.Model):
+    """
+    文章列表物化表，按列表键（全部、精选、标签、分类）记录已公开文章，
+    position 在每个列表内按文章ID升序连续编号，用于按页号直接定位
+    """
+    __tablename__ = 'article_listing'
+
+    list_key = db.Column(db.String(64), primary_key=True)
+    # 不设外键：文章删除后由列表维护逻辑移除并重排位置
+    article_id = db.Column(db.Integer, primary_key=True)
+    position = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('uix_article_listing_position', 'list_key', 'position', unique=True),
+        db.Index('idx_article_listing_article_id', 'article_id'),
+    )
+
+    def __repr__(self):
+        return f'<ArticleListing list_key={self.list_key} article_id={self.article_id} position={self.position}>'
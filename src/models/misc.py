@@ -82,6 +82,10 @@ class SearchHistory(db.Model):
     results_count = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp())
 
+    __table_args__ = (
+        db.Index('idx_search_history_user_created', 'user_id', 'created_at'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -90,3 +94,18 @@ class SearchHistory(db.Model):
             'results_count': self.results_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class SearchIndex(db.Model):
+    """
+    文章全文检索倒排索引，每行记录一个词项在一篇文章中的权重
+    """
+    __tablename__ = 'search_index'
+
+    term = db.Column(db.String(32), primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('articles.article_id', ondelete='CASCADE'), primary_key=True)
+    weight = db.Column(db.Float, nullable=False, default=1.0)
+
+    __table_args__ = (
+        db.Index('idx_search_index_article_id', 'article_id'),
+    )
@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+from . import db
+
+
+class Tag(db.Model):
+    """标签表，article_count 为带有该标签的文章数"""
+    __tablename__ = 'tags'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False, unique=True)
+    article_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.TIMESTAMP, default=lambda: datetime.now(timezone.utc))
+
+
+class ArticleTag(db.Model):
+    """文章与标签的关联表，由 Article.tags 规范化而来"""
+    __tablename__ = 'article_tags'
+    # 不设外键：文章删除后由标签维护逻辑移除关联并更新计数
+    article_id = db.Column(db.Integer, primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('idx_article_tags_tag_id', 'tag_id'),
+    )
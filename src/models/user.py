@@ -101,24 +101,26 @@ class User(db.Model, UserMixin):
                 return True
         return False
 
+    def get_permission_set(self):
+        """获取用户缓存的角色与权限集合"""
+        from src.user.authz.permission_set import get_permission_set
+        return get_permission_set(self.id)
+
     def has_role(self, role_name):
-        """检查用户是否拥有指定角色"""
-        return any(role.name == role_name for role in self.roles)
+        """检查用户是否拥有指定角色，无状态认证的请求中使用令牌中的角色"""
+        from src.user.authz.stateless import token_roles
+        roles = token_roles(self.id)
+        if roles is not None:
+            return role_name in roles
+        return self.get_permission_set().has_role(role_name)
 
     def has_permission(self, permission_code):
         """检查用户是否拥有指定权限"""
-        for role in self.roles:
-            if any(perm.code == permission_code for perm in role.permissions):
-                return True
-        return False
+        return self.get_permission_set().has_permission(permission_code)
 
     def get_all_permissions(self):
         """获取用户所有权限代码"""
-        permissions = set()
-        for role in self.roles:
-            for perm in role.permissions:
-                permissions.add(perm.code)
-        return list(permissions)
+        return list(self.get_permission_set().permissions)
 
     def get_current_session(self):
         """获取当前会话"""
@@ -133,25 +135,18 @@ class User(db.Model, UserMixin):
 
         if session:
             session.deactivate()
+            from src.user.authz.session_validation import revoke_sessions
+            revoke_sessions([session])
             return True
         return False
 
     def logout_all_other_sessions(self, exclude_session_id=None):
         """退出除当前会话外的所有其他会话"""
-        query = UserSession.query.filter_by(
-            user_id=self.id,
-            is_active=True
-        )
-
-        if exclude_session_id:
-            query = query.filter(UserSession.session_id != exclude_session_id)
-
-        other_sessions = query.all()
-        for session in other_sessions:
-            session.deactivate()
-
+        digests = UserSession.deactivate_user_sessions(self.id, exclude_session_id)
         db.session.commit()
-        return len(other_sessions)
+        from src.user.authz.session_validation import revoke_token_digests
+        revoke_token_digests(digests)
+        return len(digests)
 
     def get_active_sessions_count(self):
         """获取活跃会话数量"""
@@ -191,4 +186,19 @@ class EmailSubscription(db.Model):
 
     __table_args__ = (
         db.Index('idx_user_id_es', 'user_id'),
-    )
\ No newline at end of file
+    )
+
+
+class UserStats(db.Model):
+    """
+    用户空间统计，由文章、关注、点赞、浏览、通知的写入路径增量维护，并由调度器定期校正
+    """
+    __tablename__ = 'user_stats'
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False, doc='用户ID')
+    articles_count = db.Column(db.Integer, default=0, nullable=False, doc='已发布文章数')
+    followers_count = db.Column(db.Integer, default=0, nullable=False, doc='粉丝数')
+    following_count = db.Column(db.Integer, default=0, nullable=False, doc='关注数')
+    total_views = db.Column(db.BigInteger, default=0, nullable=False, doc='已发布文章总浏览量')
+    total_likes = db.Column(db.BigInteger, default=0, nullable=False, doc='已发布文章总点赞数')
+    unread_notifications = db.Column(db.Integer, default=0, nullable=False, doc='未读通知数')
+    updated_at = db.Column(db.TIMESTAMP, server_default=current_timestamp(), onupdate=current_timestamp())
@@ -1,14 +1,20 @@
+import hashlib
 import logging
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, select, update
+from sqlalchemy.orm import relationship, validates
 
 from src.extensions import db
 
 logger = logging.getLogger(__name__)
 
 
+def token_digest(token):
+    """令牌的 SHA-256 摘要，跨进程稳定，用作索引列与缓存键"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
 class UserSession(db.Model):
     __tablename__ = 'user_sessions'
 
@@ -16,6 +22,7 @@ class UserSession(db.Model):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     session_id = Column(String(255), unique=True, nullable=False, index=True)
     access_token = Column(String(512), unique=True, nullable=False)
+    access_token_digest = Column(String(64), unique=True, nullable=True, index=True)
     refresh_token = Column(String(512), unique=True, nullable=True)
     device_type = Column(String(50), nullable=True)
     browser = Column(String(100), nullable=True)
@@ -30,6 +37,11 @@ class UserSession(db.Model):
     # 关联关系
     user = relationship("User", back_populates="sessions")
 
+    @validates('access_token')
+    def _set_access_token_digest(self, key, value):
+        self.access_token_digest = token_digest(value) if value else None
+        return value
+
     def __repr__(self):
         return f"<UserSession(id={self.id}, user_id={self.user_id}, session_id='{self.session_id}')>"
 
@@ -53,9 +65,9 @@ class UserSession(db.Model):
         }
 
     def update_last_activity(self):
-        """更新最后活动时间"""
-        self.last_activity = datetime.now()
-        db.session.commit()
+        """记录最后活动时间，由调度器合并后批量写入"""
+        from src.user.session_activity import record_activity
+        record_activity(self.access_token_digest)
 
     def deactivate(self):
         """停用会话"""
@@ -92,6 +104,25 @@ class UserSession(db.Model):
             db.session.rollback()
             raise e
 
+    @classmethod
+    def deactivate_user_sessions(cls, user_id, exclude_session_id=None):
+        """
+        用一条 UPDATE 停用用户的全部活跃会话，由调用方提交
+
+        Returns:
+            被停用会话的访问令牌摘要列表
+        """
+        conditions = [cls.user_id == user_id, cls.is_active == True]
+        if exclude_session_id:
+            conditions.append(cls.session_id != exclude_session_id)
+        statement = update(cls).where(*conditions).values(is_active=False).execution_options(
+            synchronize_session=False)
+        if db.session.get_bind().dialect.update_returning:
+            return list(db.session.execute(statement.returning(cls.access_token_digest)).scalars())
+        digests = list(db.session.execute(select(cls.access_token_digest).where(*conditions)).scalars())
+        db.session.execute(statement)
+        return digests
+
     @classmethod
     def get_active_sessions(cls, user_id):
         """获取用户所有活跃会话"""
@@ -114,13 +145,13 @@ class UserSession(db.Model):
 
     @classmethod
     def cleanup_expired_sessions(cls, batch_size=1000):
-        """清理过期会话"""
+        """清理过期会话；已停用的会话保留到过期，作为令牌吊销过滤器的数据来源"""
         expired_count = 0
         try:
             # 分批删除过期会话，避免锁表
             while True:
                 expired_sessions = cls.query.filter(
-                    (cls.expiry_time <= datetime.now()) | (cls.is_active == False)
+                    cls.expiry_time <= datetime.now()
                 ).limit(batch_size).all()
 
                 if not expired_sessions:
@@ -131,6 +162,8 @@ class UserSession(db.Model):
                     expired_count += 1
 
                 db.session.commit()
+                from src.user.authz.session_validation import revoke_sessions
+                revoke_sessions(expired_sessions)
                 logger.info(f"已清理 {len(expired_sessions)} 个过期会话")
 
         except Exception as e:
@@ -8,12 +8,21 @@ import time
 from datetime import datetime
 
 import psutil
-from flask import jsonify, request, g
+from flask import jsonify, request, g, has_request_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
-from src.logger_config import REQUEST_COUNT, REQUEST_DURATION
+from src.logger_config import REQUEST_COUNT, REQUEST_DURATION, DB_QUERY_COUNT
+from src.utils.cache_protection import get_cache_stats
 from src.utils.config.theme import get_all_themes
 
 
+def count_db_query(conn, cursor, statement, parameters, context, executemany):
+    """SQLAlchemy 事件回调，累加当前请求的查询次数"""
+    if has_request_context() and hasattr(g, 'db_query_count'):
+        g.db_query_count += 1
+
+
 class SystemMonitor:
     """系统监控类"""
     
@@ -27,6 +36,10 @@ class SystemMonitor:
         # 注册监控中间件
         app.before_request(self.before_request)
         app.after_request(self.after_request)
+
+        # 统计每个请求执行的SQL语句数
+        if not event.contains(Engine, 'before_cursor_execute', count_db_query):
+            event.listen(Engine, 'before_cursor_execute', count_db_query)
         
         # 注册监控端点
         self.register_monitoring_endpoints(app)
@@ -34,6 +47,7 @@ class SystemMonitor:
     def before_request(self):
         """请求前处理"""
         g.start_time = time.time()
+        g.db_query_count = 0
         
     def after_request(self, response):
         """请求后处理"""
@@ -46,6 +60,11 @@ class SystemMonitor:
                 status=response.status_code
             ).inc()
             REQUEST_DURATION.observe(duration)
+
+        if hasattr(g, 'db_query_count'):
+            DB_QUERY_COUNT.labels(endpoint=request.endpoint or 'unknown').observe(g.db_query_count)
+            if current_app.debug:
+                response.headers['X-DB-Query-Count'] = str(g.db_query_count)
             
         return response
         
@@ -100,6 +119,7 @@ class SystemMonitor:
             'themes_count': len(themes),
             'themes_list': themes,
             'process_id': os.getpid(),
+            'cache': get_cache_stats(),
             'uptime': time.time() - psutil.Process(os.getpid()).create_time()
         }
 
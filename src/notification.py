@@ -9,6 +9,7 @@ from flask_caching import Cache
 
 from src.models import Notification, db
 from src.setting import app_config
+from src.user.stats import adjust_user_stats, set_user_stats
 from src.utils.cache_protection import ProtectedCache
 
 noti = Flask(__name__, template_folder='../templates')
@@ -74,6 +75,7 @@ def read_all_notifications(user_id):
         updated_count = db.session.query(Notification).filter(Notification.user_id == user_id,
                                                               Notification.is_read == False).update(
             {Notification.is_read: True})
+        set_user_stats(user_id, unread_notifications=0)
         db.session.commit()
         success = True
     except Exception as e:
@@ -107,8 +109,10 @@ def read_current_notification(user_id, notification_id):
     try:
         # 更新特定通知的已读状态
         updated_count = db.session.query(Notification).filter(Notification.id == notification_id,
-                                                              Notification.user_id == user_id).update(
+                                                              Notification.user_id == user_id,
+                                                              Notification.is_read == False).update(
             {Notification.is_read: True})
+        adjust_user_stats(user_id, unread_notifications=-updated_count)
         db.session.commit()
         success = True
     except Exception as e:
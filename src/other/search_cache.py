@@ -0,0 +1,198 @@
+"""
+搜索结果缓存
+按查询词项和页码缓存结构化的搜索结果，容量有上限（LRU）且带过期时间（TTL）。
+优先使用 Redis 在多个 worker 间共享，Redis 不可用时退化为进程内缓存。
+每条缓存都登记在其查询词项下，文章变更时按文章新旧词项失效相关缓存。
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from src.database import redis_client
+from src.setting import app_config
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'search:result:'
+LRU_KEY = 'search:result:lru'
+TERM_PREFIX = 'search:term:'
+
+
+def _entry_key(terms, page):
+    digest = hashlib.sha1('\x1f'.join(terms).encode('utf-8')).hexdigest()
+    return f"{KEY_PREFIX}{digest}:{page}"
+
+
+class _LocalBackend:
+    """进程内 LRU/TTL 缓存"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, terms, value)
+        self._term_keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, terms, value, timeout):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.time() + timeout, terms, value)
+            for term in terms:
+                self._term_keys.setdefault(term, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_terms(self, terms):
+        with self._lock:
+            keys = set()
+            for term in terms:
+                keys.update(self._term_keys.get(term, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._term_keys.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry[1]:
+            keys = self._term_keys.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._term_keys[term]
+
+
+class _RedisBackend:
+    """基于 Redis 的共享 LRU/TTL 缓存，LRU 顺序记录在有序集合中"""
+
+    def __init__(self, client, max_entries):
+        self.client = client
+        self.max_entries = max_entries
+
+    def get(self, key):
+        raw = self.client.get(key)
+        if raw is None:
+            self.client.zrem(LRU_KEY, key)
+            return None
+        self.client.zadd(LRU_KEY, {key: time.time()})
+        return json.loads(raw)
+
+    def set(self, key, terms, value, timeout):
+        pipe = self.client.pipeline()
+        pipe.set(key, json.dumps(value, ensure_ascii=False), ex=timeout)
+        pipe.zadd(LRU_KEY, {key: time.time()})
+        for term in terms:
+            pipe.sadd(f"{TERM_PREFIX}{term}", key)
+            pipe.expire(f"{TERM_PREFIX}{term}", timeout)
+        pipe.zcard(LRU_KEY)
+        size = pipe.execute()[-1]
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = self.client.zrange(LRU_KEY, 0, overflow - 1)
+            if evicted:
+                pipe = self.client.pipeline()
+                pipe.delete(*evicted)
+                pipe.zrem(LRU_KEY, *evicted)
+                pipe.execute()
+
+    def invalidate_terms(self, terms):
+        terms = list(terms)
+        if not terms:
+            return 0
+        pipe = self.client.pipeline()
+        for term in terms:
+            pipe.smembers(f"{TERM_PREFIX}{term}")
+        keys = set()
+        for members in pipe.execute():
+            keys.update(members)
+
+        pipe = self.client.pipeline()
+        if keys:
+            pipe.delete(*keys)
+            pipe.zrem(LRU_KEY, *keys)
+        pipe.delete(*[f"{TERM_PREFIX}{term}" for term in terms])
+        pipe.execute()
+        return len(keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f"{KEY_PREFIX}*", count=500))
+        keys.extend(self.client.scan_iter(match=f"{TERM_PREFIX}*", count=500))
+        for i in range(0, len(keys), 500):
+            self.client.delete(*keys[i:i + 500])
+
+
+class SearchResultCache:
+    """
+    搜索结果缓存，Redis 操作失败时自动使用进程内缓存
+    """
+
+    def __init__(self, max_entries=1000, timeout=7200):
+        self.timeout = timeout
+        self._local = _LocalBackend(max_entries)
+        self._redis = _RedisBackend(redis_client, max_entries) if redis_client is not None else None
+
+    def _call(self, method, *args):
+        if self._redis is not None:
+            try:
+                return getattr(self._redis, method)(*args)
+            except Exception as e:
+                logger.warning(f"Redis 搜索缓存不可用，使用进程内缓存: {e}")
+        return getattr(self._local, method)(*args)
+
+    def get(self, terms, page):
+        """获取缓存结果，未命中返回 None"""
+        if not terms:
+            return None
+        return self._call('get', _entry_key(terms, page))
+
+    def set(self, terms, page, result, timeout=None):
+        """缓存结果，result 必须可以 JSON 序列化"""
+        if not terms:
+            return
+        self._call('set', _entry_key(terms, page), list(terms), result, timeout or self.timeout)
+
+    def invalidate_terms(self, terms):
+        """失效所有查询中包含给定词项的缓存"""
+        terms = set(terms)
+        # 进程内缓存可能在 Redis 故障期间写入过，一并失效
+        count = self._local.invalidate_terms(terms)
+        if self._redis is not None:
+            try:
+                count += self._redis.invalidate_terms(terms)
+            except Exception as e:
+                logger.warning(f"Redis 搜索缓存失效失败: {e}")
+        return count
+
+    def clear(self):
+        self._local.clear()
+        if self._redis is not None:
+            try:
+                self._redis.clear()
+            except Exception as e:
+                logger.warning(f"Redis 搜索缓存清理失败: {e}")
+
+
+search_result_cache = SearchResultCache(
+    max_entries=app_config.SEARCH_CACHE_MAX_ENTRIES,
+    timeout=app_config.MAX_CACHE_TIMESTAMP
+)
@@ -0,0 +1,164 @@
+"""
+搜索历史
+每次查询只记录一条历史，写入先进入内存缓冲区，由调度器定期批量落库；
+用户最近搜索的关键词保存在 Redis 的定长列表中，Redis 不可用或列表未建立时
+走 (user_id, created_at) 索引查询最近的去重关键词。
+"""
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import func, insert
+
+from src.database import get_db, redis_client
+from src.models import SearchHistory, db
+
+logger = logging.getLogger(__name__)
+
+RECENT_KEYWORDS_LIMIT = 20
+RECENT_KEYWORDS_TTL = 7 * 24 * 3600
+RECENT_KEY_PREFIX = 'search:history:'
+
+
+def _recent_key(user_id):
+    return f"{RECENT_KEY_PREFIX}{user_id}"
+
+
+class SearchHistoryWriter:
+    """
+    搜索历史缓冲写入器，线程安全；缓冲区满时丢弃最旧的记录
+    """
+
+    def __init__(self, max_pending=10000, batch_size=500):
+        self.batch_size = batch_size
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+
+    def record(self, user_id, keyword, results_count):
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                logger.warning("搜索历史缓冲区已满，最旧的记录将被丢弃")
+            self._pending.append({
+                'user_id': user_id,
+                'keyword': keyword,
+                'results_count': results_count,
+                'created_at': datetime.now()
+            })
+
+    def pending_for(self, user_id):
+        """获取尚未落库的某个用户的关键词（按时间倒序）"""
+        with self._lock:
+            return [row['keyword'] for row in reversed(self._pending) if row['user_id'] == user_id]
+
+    def discard(self, user_id=None):
+        """丢弃缓冲区中的记录，user_id 为 None 时全部丢弃"""
+        with self._lock:
+            if user_id is None:
+                self._pending.clear()
+            else:
+                kept = [row for row in self._pending if row['user_id'] != user_id]
+                self._pending.clear()
+                self._pending.extend(kept)
+
+    def flush(self):
+        """将缓冲区的记录批量写入数据库，返回写入条数"""
+        with self._lock:
+            rows = list(self._pending)
+            self._pending.clear()
+        if not rows:
+            return 0
+
+        try:
+            with get_db() as session:
+                for i in range(0, len(rows), self.batch_size):
+                    session.execute(insert(SearchHistory), rows[i:i + self.batch_size])
+        except Exception as e:
+            # 写入失败时放回缓冲区（在期间新记录之前），等待下次重试；超出容量时丢弃最旧的记录
+            with self._lock:
+                merged = rows + list(self._pending)
+                dropped = max(len(merged) - self._pending.maxlen, 0)
+                self._pending.clear()
+                self._pending.extend(merged[dropped:])
+            if dropped:
+                logger.warning(f"搜索历史缓冲区已满，丢弃最旧的 {dropped} 条记录")
+            logger.error(f"批量写入搜索历史失败: {e}")
+            return 0
+        return len(rows)
+
+
+search_history_writer = SearchHistoryWriter()
+
+
+def save_search_history(user_id, keyword, results_count):
+    """记录一次搜索，不阻塞请求"""
+    if not keyword:
+        return
+    search_history_writer.record(user_id, keyword, results_count)
+
+    if redis_client is None:
+        return
+    try:
+        key = _recent_key(user_id)
+        # 列表尚未从数据库加载时不写入，避免只包含部分历史
+        if redis_client.exists(key):
+            pipe = redis_client.pipeline()
+            pipe.lrem(key, 0, keyword)
+            pipe.lpush(key, keyword)
+            pipe.ltrim(key, 0, RECENT_KEYWORDS_LIMIT - 1)
+            pipe.expire(key, RECENT_KEYWORDS_TTL)
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"更新最近搜索列表失败: {e}")
+
+
+def _query_recent_keywords(user_id, limit):
+    """通过 (user_id, created_at) 索引查询最近的去重关键词"""
+    last_searched = func.max(SearchHistory.created_at)
+    rows = db.session.query(SearchHistory.keyword).filter(
+        SearchHistory.user_id == user_id
+    ).group_by(SearchHistory.keyword).order_by(last_searched.desc()).limit(limit).all()
+    return [row[0] for row in rows]
+
+
+def get_user_search_history(user_id, limit=RECENT_KEYWORDS_LIMIT):
+    """获取用户最近搜索的去重关键词（按时间倒序）"""
+    if redis_client is not None:
+        try:
+            cached = redis_client.lrange(_recent_key(user_id), 0, limit - 1)
+            if cached:
+                return cached
+        except Exception as e:
+            logger.warning(f"读取最近搜索列表失败: {e}")
+
+    keywords = list(dict.fromkeys(
+        search_history_writer.pending_for(user_id) + _query_recent_keywords(user_id, limit)
+    ))[:limit]
+
+    if redis_client is not None and keywords:
+        try:
+            key = _recent_key(user_id)
+            pipe = redis_client.pipeline()
+            pipe.delete(key)
+            pipe.rpush(key, *keywords)
+            pipe.expire(key, RECENT_KEYWORDS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"写入最近搜索列表失败: {e}")
+    return keywords
+
+
+def clear_recent_keywords(user_id=None):
+    """删除搜索历史后调用，清除缓冲区与最近搜索列表，user_id 为 None 时清除全部"""
+    search_history_writer.discard(user_id)
+    if redis_client is None:
+        return
+    try:
+        if user_id is not None:
+            redis_client.delete(_recent_key(user_id))
+        else:
+            keys = list(redis_client.scan_iter(match=f"{RECENT_KEY_PREFIX}*", count=500))
+            for i in range(0, len(keys), 500):
+                redis_client.delete(*keys[i:i + 500])
+    except Exception as e:
+        logger.warning(f"清除最近搜索列表失败: {e}")
@@ -0,0 +1,254 @@
+"""
+文章全文检索倒排索引
+中文等CJK文本按二元组(bigram)切分并同时收录单字，拉丁文字按单词切分；
+索引只收录已发布且未隐藏的文章，在文章创建、编辑、状态变更时增量维护。
+全量重建在一个事务中完成，重建期间查询仍读到旧索引；多个进程同时触发时只有取得锁的进程执行。
+"""
+import logging
+import math
+import re
+from collections import Counter
+
+from sqlalchemy import case, func
+
+from src.models import Article, ArticleContent, SearchIndex, db
+from src.other.search_cache import search_result_cache
+from src.utils.cache_protection import CacheLock
+
+logger = logging.getLogger(__name__)
+
+# 标题中出现的词项权重放大倍数
+TITLE_BOOST = 5
+MAX_TERM_LENGTH = 32
+MAX_QUERY_TERMS = 16
+REBUILD_LOCK_KEY = 'search_index_rebuild'
+REBUILD_LOCK_EXPIRE = 3600
+
+_HTML_TAG_RE = re.compile(r'<[^<]+?>')
+# 平假名/片假名、CJK统一汉字(含扩展A)、韩文音节、兼容汉字
+_CJK_CHARS = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+_CJK_RE = re.compile(f'[{_CJK_CHARS}]+')
+_TOKEN_RE = re.compile(f'[{_CJK_CHARS}]+|[0-9a-z_]+')
+
+
+def strip_html_tags(text):
+    """去除HTML标签"""
+    if text is None:
+        return ''
+    return _HTML_TAG_RE.sub('', text)
+
+
+def tokenize(text, unigrams=False):
+    """
+    将文本切分为检索词项
+
+    CJK连续片段切分为重叠二元组，单字片段保留单字；其余按字母数字单词切分。
+
+    Args:
+        unigrams: 为多字的CJK片段同时输出每个单字，建立索引时使用，单字查询才能命中词中的字
+    """
+    if not text:
+        return []
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.fullmatch(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+                if unigrams:
+                    tokens.extend(run)
+        else:
+            tokens.append(run[:MAX_TERM_LENGTH])
+    return tokens
+
+
+def _build_term_weights(title, content):
+    """根据标题和正文计算词项权重（对数词频，标题加权）"""
+    counts = Counter()
+    for term in tokenize(title, unigrams=True):
+        counts[term] += TITLE_BOOST
+    for term in tokenize(strip_html_tags(content), unigrams=True):
+        counts[term] += 1
+    return {term: 1 + math.log(tf) for term, tf in counts.items()}
+
+
+def query_terms(keyword):
+    """将搜索关键词转换为去重后的查询词项，多字CJK片段只用二元组查询"""
+    return list(dict.fromkeys(tokenize(keyword)))[:MAX_QUERY_TERMS]
+
+
+def _is_indexable(article):
+    return article is not None and article.status == 1 and not article.hidden
+
+
+def remove_article(article_id, commit=True):
+    """从索引中移除文章"""
+    db.session.query(SearchIndex).filter(SearchIndex.article_id == article_id).delete(synchronize_session=False)
+    if commit:
+        db.session.commit()
+
+
+def index_article(article_id, commit=True):
+    """
+    重新索引单篇文章；未发布、已隐藏或不存在的文章会被移出索引
+
+    Returns:
+        写入的词项数量
+    """
+    try:
+        old_terms = {row[0] for row in db.session.query(SearchIndex.term).filter(
+            SearchIndex.article_id == article_id).all()}
+        remove_article(article_id, commit=False)
+
+        weights = {}
+        article = db.session.query(Article).filter_by(article_id=article_id).first()
+        if _is_indexable(article):
+            content = db.session.query(ArticleContent.content).filter_by(aid=article_id).scalar()
+            weights = _build_term_weights(article.title, content)
+            if weights:
+                db.session.bulk_insert_mappings(SearchIndex, [
+                    {'term': term, 'article_id': article_id, 'weight': weight}
+                    for term, weight in weights.items()
+                ])
+        if commit:
+            db.session.commit()
+
+        # 文章变更前后包含的词项所对应的搜索缓存都可能过期
+        search_result_cache.invalidate_terms(old_terms | weights.keys())
+        return len(weights)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"索引文章 {article_id} 失败: {e}")
+        return 0
+
+
+def rebuild_search_index(batch_size=200):
+    """
+    全量重建索引，删除与写入在同一事务中提交
+
+    Returns:
+        索引的文章数；其他进程正在重建时返回 None
+    """
+    lock = CacheLock(REBUILD_LOCK_KEY, expire=REBUILD_LOCK_EXPIRE)
+    if not lock.acquire(timeout=0):
+        logger.info("其他进程正在重建搜索索引，跳过")
+        return None
+    try:
+        indexed = _rebuild_search_index(batch_size)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        lock.release()
+
+    search_result_cache.clear()
+    logger.info(f"搜索索引重建完成，共索引 {indexed} 篇文章")
+    return indexed
+
+
+def _rebuild_search_index(batch_size):
+    db.session.query(SearchIndex).delete(synchronize_session=False)
+
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Article.article_id, Article.title, ArticleContent.content).outerjoin(
+            ArticleContent, Article.article_id == ArticleContent.aid
+        ).filter(
+            Article.status == 1,
+            Article.hidden == False,
+            Article.article_id > last_id
+        ).order_by(Article.article_id).limit(batch_size).all()
+        if not rows:
+            break
+
+        mappings = []
+        for article_id, title, content in rows:
+            mappings.extend(
+                {'term': term, 'article_id': article_id, 'weight': weight}
+                for term, weight in _build_term_weights(title, content).items()
+            )
+        db.session.bulk_insert_mappings(SearchIndex, mappings)
+
+        indexed += len(rows)
+        last_id = rows[-1][0]
+
+    db.session.commit()
+    return indexed
+
+
+def ensure_search_index():
+    """索引为空而存在已发布文章时执行一次全量重建"""
+    if db.session.query(SearchIndex.article_id).first() is not None:
+        return 0
+    return rebuild_search_index() or 0
+
+
+def search_articles(keyword, page=1, page_size=20):
+    """
+    查询索引，返回按相关度排序的文章分页
+
+    所有查询词项都必须命中；得分为 sum(权重 * idf)。
+
+    Returns:
+        (hits, total) hits 为 [{'article_id', 'title', 'slug', 'created_at', 'excerpt', 'score'}]
+    """
+    terms = query_terms(keyword)
+    if not terms:
+        return [], 0
+
+    doc_freq = dict(db.session.query(SearchIndex.term, func.count(SearchIndex.article_id)).filter(
+        SearchIndex.term.in_(terms)
+    ).group_by(SearchIndex.term).all())
+    if len(doc_freq) < len(terms):
+        # 有词项未命中任何文章
+        return [], 0
+
+    total_docs = max(db.session.query(func.count(Article.article_id)).filter(
+        Article.status == 1,
+        Article.hidden == False
+    ).scalar() or 0, 1)
+    idf = {term: math.log(1 + total_docs / df) for term, df in doc_freq.items()}
+
+    score = func.sum(SearchIndex.weight * case(idf, value=SearchIndex.term, else_=0.0)).label('score')
+    query = db.session.query(SearchIndex.article_id, score).filter(
+        SearchIndex.term.in_(terms)
+    ).group_by(SearchIndex.article_id).having(func.count(SearchIndex.term) == len(terms))
+
+    total = query.count()
+    if total == 0:
+        return [], 0
+
+    page = max(int(page), 1)
+    ranked = query.order_by(score.desc(), SearchIndex.article_id.desc()).offset(
+        (page - 1) * page_size).limit(page_size).all()
+    scores = {article_id: value for article_id, value in ranked}
+
+    articles = db.session.query(Article).filter(
+        Article.article_id.in_(scores.keys()),
+        Article.status == 1,
+        Article.hidden == False
+    ).all()
+
+    # 只为缺少摘要的当前页文章加载正文
+    missing_excerpt = [a.article_id for a in articles if not a.excerpt]
+    contents = {}
+    if missing_excerpt:
+        contents = dict(db.session.query(ArticleContent.aid, ArticleContent.content).filter(
+            ArticleContent.aid.in_(missing_excerpt)
+        ).all())
+
+    hits = []
+    for article in articles:
+        excerpt = article.excerpt or strip_html_tags(contents.get(article.article_id))[:200] + '...'
+        hits.append({
+            'article_id': article.article_id,
+            'title': article.title,
+            'slug': article.slug,
+            'created_at': article.created_at,
+            'excerpt': excerpt,
+            'score': float(scores[article.article_id]),
+        })
+    hits.sort(key=lambda hit: (hit['score'], hit['article_id']), reverse=True)
+    return hits, total
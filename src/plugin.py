@@ -2,7 +2,7 @@ from flask import Blueprint, jsonify, render_template, request
 
 from plugins.manager import PluginManager
 from src.auth_utils import admin_required
-from src.models import User
+from src.user.entities import get_user
 
 plugin_bp = Blueprint('plugin_bp', __name__, url_prefix='/api/plugins')
 
@@ -41,7 +41,7 @@ def uninstall_plugin(plugin_name):  # 修复：添加缺失的参数
 @admin_required
 def plugin_dashboard(user_id):
     plugins = plugins_manager.get_plugin_list()
-    current_user = User.query.get(user_id)
+    current_user = get_user(user_id)
     return render_template('dashboard/plugins.html', plugins=plugins, current_user=current_user)
 
 
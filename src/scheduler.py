@@ -6,7 +6,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
 from src.extensions import db
-from src.models import UserSession, Article
+from src.models import UserSession
 
 # 配置日志
 logging.basicConfig()
@@ -53,21 +53,142 @@ class SessionScheduler:
             replace_existing=True
         )
 
-        # 同步文章浏览量，每5分钟执行一次
+        # 无状态认证模式下同步令牌吊销过滤器，每分钟执行一次
+        if self.app.config.get('JWT_STATELESS_AUTH'):
+            self.scheduler.add_job(
+                func=self.sync_revocation_filter,
+                trigger=IntervalTrigger(minutes=1),
+                id='sync_revocation_filter',
+                name='同步令牌吊销过滤器',
+                replace_existing=True
+            )
+
+        # 写入合并后的会话活动时间，每分钟执行一次
+        self.scheduler.add_job(
+            func=self.flush_session_activity,
+            trigger=IntervalTrigger(minutes=1),
+            id='flush_session_activity',
+            name='写入会话活动时间',
+            replace_existing=True
+        )
+
+        # 写入待写的上传分块记录，每30秒执行一次
+        self.scheduler.add_job(
+            func=self.flush_upload_chunks,
+            trigger=IntervalTrigger(seconds=30),
+            id='flush_upload_chunks',
+            name='写入上传分块记录',
+            replace_existing=True
+        )
+
+        # 清理长时间未更新的上传任务及其临时文件，每小时执行一次
+        self.scheduler.add_job(
+            func=self.cleanup_stale_uploads,
+            trigger=IntervalTrigger(hours=1),
+            id='cleanup_stale_uploads',
+            name='清理过期上传任务',
+            replace_existing=True
+        )
+
+        # 同步文章浏览量，每30秒执行一次
         self.scheduler.add_job(
             func=self.sync_article_views,
-            trigger=IntervalTrigger(minutes=5),
+            trigger=IntervalTrigger(seconds=30),
             id='sync_article_views',
             name='同步文章浏览量',
             replace_existing=True
         )
 
+        # 批量写入缓冲的搜索历史，每5秒执行一次
+        self.scheduler.add_job(
+            func=self.flush_search_history,
+            trigger=IntervalTrigger(seconds=5),
+            id='flush_search_history',
+            name='批量写入搜索历史',
+            replace_existing=True
+        )
+
+        # 启动时检查搜索索引，索引为空时执行全量构建
+        self.scheduler.add_job(
+            func=self.ensure_search_index,
+            trigger='date',
+            id='ensure_search_index',
+            name='初始化搜索索引',
+            replace_existing=True
+        )
+
+        # 重建搜索索引，修正增量维护遗漏的数据，每天凌晨3点执行
+        self.scheduler.add_job(
+            func=self.rebuild_search_index,
+            trigger='cron',
+            hour=3,
+            minute=0,
+            id='rebuild_search_index',
+            name='重建搜索索引',
+            replace_existing=True
+        )
+
+        # 启动时检查文章列表，列表为空时执行全量构建
+        self.scheduler.add_job(
+            func=self.ensure_article_listing,
+            trigger='date',
+            id='ensure_article_listing',
+            name='初始化文章列表',
+            replace_existing=True
+        )
+
+        # 重建文章列表，修正并发维护可能产生的位置错乱，每天凌晨3点30分执行
+        self.scheduler.add_job(
+            func=self.rebuild_article_listing,
+            trigger='cron',
+            hour=3,
+            minute=30,
+            id='rebuild_article_listing',
+            name='重建文章列表',
+            replace_existing=True
+        )
+
+        # 校正用户空间统计，每天凌晨4点30分执行
+        self.scheduler.add_job(
+            func=self.reconcile_user_stats,
+            trigger='cron',
+            hour=4,
+            minute=30,
+            id='reconcile_user_stats',
+            name='校正用户统计',
+            replace_existing=True
+        )
+
+        # 启动时检查标签表，为空时由文章标签构建
+        self.scheduler.add_job(
+            func=self.ensure_tag_index,
+            trigger='date',
+            id='ensure_tag_index',
+            name='初始化标签索引',
+            replace_existing=True
+        )
+
+        # 重建标签关联并校正标签计数，每天凌晨4点执行
+        self.scheduler.add_job(
+            func=self.rebuild_tag_index,
+            trigger='cron',
+            hour=4,
+            minute=0,
+            id='rebuild_tag_index',
+            name='重建标签索引',
+            replace_existing=True
+        )
+
         # 启动调度器
         if not self.scheduler.running:
             self.scheduler.start()
 
         # 注册关闭钩子
         atexit.register(lambda: self.scheduler.shutdown())
+        atexit.register(self.flush_search_history)
+        atexit.register(self.sync_article_views)
+        atexit.register(self.flush_session_activity)
+        atexit.register(self.flush_upload_chunks)
 
         print("会话管理计划任务已启动")
 
@@ -88,17 +209,22 @@ class SessionScheduler:
         """清理过期的access_token"""
         with self.app.app_context():
             try:
+                from src.user.authz.session_validation import revoke_token_digests
                 # 清理过期access_token（假设access_token有过期时间）
                 # 这里可以根据你的token实现逻辑进行调整
-                expired_tokens_count = UserSession.query.filter(
+                expired = UserSession.query.filter(
                     UserSession.access_token.isnot(None),
                     UserSession.expiry_time <= datetime.now()
-                ).update({
+                )
+                digests = [row[0] for row in expired.with_entities(UserSession.access_token_digest).all()]
+                expired_tokens_count = expired.update({
                     'access_token': None,
+                    'access_token_digest': None,
                     'refresh_token': None
-                })
+                }, synchronize_session=False)
 
                 db.session.commit()
+                revoke_token_digests(digests)
 
                 if expired_tokens_count > 0:
                     print(f"{datetime.now()}: 已清理 {expired_tokens_count} 个过期token")
@@ -118,57 +244,149 @@ class SessionScheduler:
             except Exception as e:
                 print(f"{datetime.now()}: 更新会话统计时出错: {e}")
 
-    def sync_article_views(self):
-        """同步文章浏览量"""
+    def sync_revocation_filter(self):
+        """从会话表重建进程内的令牌吊销过滤器"""
         with self.app.app_context():
             try:
-                # 延迟导入 cache 以避免循环导入
-                from src.extensions import cache
-
-                # 获取所有带缓存的文章浏览量
-                # 使用缓存的keys()方法而不是直接访问内部缓存
-                try:
-                    # 尝试使用缓存的keys方法，如果不可用则跳过
-                    if hasattr(cache.cache, 'keys'):
-                        keys = cache.cache.keys()
-                    else:
-                        # 如果缓存后端不支持keys()方法，可以使用其他方式获取
-                        # 这里使用一个安全的默认值，避免直接访问内部缓存
-                        keys = []
-                    
-                    article_keys = [key for key in keys if str(key).startswith('article_views_')]
-                except Exception:
-                    # 如果无法获取缓存键，则跳过同步
-                    article_keys = []
-
-                updated_count = 0
-                for key in article_keys:
-                    # 从键名中提取文章ID
-                    article_id = int(key.split('_')[-1])
-
-                    # 获取缓存中的浏览量
-                    cached_views = cache.get(key)
-
-                    if cached_views is not None:
-                        # 更新文章的浏览量
-                        article = db.session.query(Article).filter_by(article_id=article_id).first()
-                        if article:
-                            article.views = cached_views
-                            updated_count += 1
-
-                # 提交事务
-                db.session.commit()
+                from src.user.authz.stateless import revocation_filter
+                revocation_filter.sync()
+            except Exception as e:
+                print(f"{datetime.now()}: 同步令牌吊销过滤器时出错: {e}")
 
-                # 清除已同步的缓存
-                for key in article_keys:
-                    cache.delete(key)
+    def flush_session_activity(self):
+        """将合并后的会话活动时间批量写入数据库"""
+        with self.app.app_context():
+            try:
+                from src.user.session_activity import flush_session_activity
+                updated_count = flush_session_activity()
+                if updated_count > 0:
+                    print(f"{datetime.now()}: 已写入 {updated_count} 个会话的活动时间")
+            except Exception as e:
+                print(f"{datetime.now()}: 写入会话活动时间时出错: {e}")
+
+    def flush_upload_chunks(self):
+        """将待写的上传分块记录批量写入数据库"""
+        with self.app.app_context():
+            try:
+                from src.upload.chunk_ingest import flush_chunk_records
+                flushed_count = flush_chunk_records()
+                if flushed_count > 0:
+                    print(f"{datetime.now()}: 已写入 {flushed_count} 条上传分块记录")
+            except Exception as e:
+                print(f"{datetime.now()}: 写入上传分块记录时出错: {e}")
 
+    def cleanup_stale_uploads(self):
+        """删除已放弃的上传任务与遗留的临时文件"""
+        with self.app.app_context():
+            try:
+                from src.upload.chunk_ingest import cleanup_stale_uploads
+                tasks, files = cleanup_stale_uploads()
+                if tasks or files:
+                    print(f"{datetime.now()}: 已清理 {tasks} 个过期上传任务、{files} 个临时文件")
+            except Exception as e:
+                print(f"{datetime.now()}: 清理过期上传任务时出错: {e}")
+
+    def sync_article_views(self):
+        """将累计的文章浏览量批量写入数据库"""
+        with self.app.app_context():
+            try:
+                from src.blog.article.view_counter import flush_article_views
+                updated_count = flush_article_views()
                 if updated_count > 0:
                     print(f"{datetime.now()}: 成功同步 {updated_count} 篇文章的浏览量")
+            except Exception as e:
+                print(f"{datetime.now()}: 同步文章浏览量时出错: {e}")
+
+    def flush_search_history(self):
+        """将缓冲的搜索历史批量写入数据库"""
+        try:
+            from src.other.search_history import search_history_writer
+            search_history_writer.flush()
+        except Exception as e:
+            print(f"{datetime.now()}: 写入搜索历史时出错: {e}")
 
+    def ensure_search_index(self):
+        """索引为空时构建搜索索引"""
+        with self.app.app_context():
+            try:
+                from src.other.search_index import ensure_search_index
+                count = ensure_search_index()
+                if count > 0:
+                    print(f"{datetime.now()}: 搜索索引初始化完成，共 {count} 篇文章")
             except Exception as e:
                 db.session.rollback()
-                print(f"{datetime.now()}: 同步文章浏览量时出错: {e}")
+                print(f"{datetime.now()}: 初始化搜索索引时出错: {e}")
+
+    def rebuild_search_index(self):
+        """全量重建搜索索引"""
+        with self.app.app_context():
+            try:
+                from src.other.search_index import rebuild_search_index
+                count = rebuild_search_index()
+                if count is not None:
+                    print(f"{datetime.now()}: 搜索索引已重建，共 {count} 篇文章")
+            except Exception as e:
+                db.session.rollback()
+                print(f"{datetime.now()}: 重建搜索索引时出错: {e}")
+
+    def ensure_article_listing(self):
+        """列表为空时构建文章列表"""
+        with self.app.app_context():
+            try:
+                from src.blog.listing import ensure_article_listing
+                count = ensure_article_listing()
+                if count > 0:
+                    print(f"{datetime.now()}: 文章列表初始化完成，共 {count} 个列表")
+            except Exception as e:
+                db.session.rollback()
+                print(f"{datetime.now()}: 初始化文章列表时出错: {e}")
+
+    def rebuild_article_listing(self):
+        """全量重建文章列表"""
+        with self.app.app_context():
+            try:
+                from src.blog.listing import rebuild_article_listing
+                count = rebuild_article_listing()
+                if count is not None:
+                    print(f"{datetime.now()}: 文章列表已重建，共 {count} 个列表")
+            except Exception as e:
+                db.session.rollback()
+                print(f"{datetime.now()}: 重建文章列表时出错: {e}")
+
+    def ensure_tag_index(self):
+        """标签表为空时构建标签索引"""
+        with self.app.app_context():
+            try:
+                from src.blog.tag import ensure_tag_index
+                count = ensure_tag_index()
+                if count > 0:
+                    print(f"{datetime.now()}: 标签索引初始化完成，共 {count} 个标签")
+            except Exception as e:
+                db.session.rollback()
+                print(f"{datetime.now()}: 初始化标签索引时出错: {e}")
+
+    def rebuild_tag_index(self):
+        """全量重建标签索引"""
+        with self.app.app_context():
+            try:
+                from src.blog.tag import rebuild_tag_index
+                count = rebuild_tag_index()
+                if count is not None:
+                    print(f"{datetime.now()}: 标签索引已重建，共 {count} 个标签")
+            except Exception as e:
+                db.session.rollback()
+                print(f"{datetime.now()}: 重建标签索引时出错: {e}")
+
+    def reconcile_user_stats(self):
+        """按当前数据校正用户统计"""
+        with self.app.app_context():
+            try:
+                from src.user.stats import reconcile_user_stats
+                corrected = reconcile_user_stats()
+                print(f"{datetime.now()}: 用户统计已校正，修正 {corrected} 项")
+            except Exception as e:
+                db.session.rollback()
+                print(f"{datetime.now()}: 校正用户统计时出错: {e}")
 
 
 # 创建全局调度器实例
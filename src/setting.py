@@ -117,8 +117,13 @@ class BaseConfig:
         'audio/mp3',
     ]
     UPLOAD_LIMIT = 60 * 1024 * 1024
+    CHUNKED_UPLOAD_MAX_SIZE = 20 * 1024 * 1024 * 1024  # 分块上传单个文件的大小上限，目标文件按此预分配
     MAX_LINE = 1000
     MAX_CACHE_TIMESTAMP = 7200
+    SEARCH_CACHE_MAX_ENTRIES = 1000  # 搜索结果缓存最大条目数
+    CACHE_REFRESH_WORKERS = 4  # 后台刷新过期缓存的线程数
+    RENDER_CACHE_FOLDER = 'temp/render'  # Redis 不可用时文章渲染结果的缓存目录
+    RENDER_CACHE_TIMEOUT = 7 * 24 * 3600  # 文章渲染结果缓存时间
     USER_FREE_STORAGE_LIMIT = 0.5 * 1024 * 1024 * 1024  # 512MB 用户免费空间限制
     RATELIMIT_DEFAULT = "10/second"
     # 邮件配置
@@ -142,6 +147,9 @@ class BaseConfig:
     JWT_COOKIE_CSRF_PROTECT = False
     JWT_COOKIE_SAMESITE = 'Lax'  # 添加SameSite属性以防范CSRF攻击
     JWT_SESSION_COOKIE = False
+    # 无状态令牌认证：已认证请求仅校验访问令牌与吊销过滤器
+    JWT_STATELESS_AUTH = os.environ.get('JWT_STATELESS_AUTH', 'False').lower() == 'true'
+    REVOCATION_FILTER_CAPACITY = int(os.environ.get('REVOCATION_FILTER_CAPACITY', 100000))
     REMEMBER_COOKIE_DURATION = timedelta(days=30)  # 记住登录状态30天
     PERMANENT_SESSION_LIFETIME = timedelta(days=30)
 
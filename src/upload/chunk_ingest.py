@@ -0,0 +1,429 @@
+"""
+分块接收状态
+每个上传任务用位图记录已收到的分块：Redis 可用时为 upload:bitmap:<upload_id>（SETBIT/BITCOUNT），
+否则为分块目录下的 <upload_id>.bitmap 稀疏文件，每个分块占一个字节，用 pwrite 在分块索引处写入，多进程并发写入互不覆盖。
+首次收到分块时同时按索引记下分块的 SHA-256（upload:digests:<upload_id> 哈希表，或 <upload_id>.digests 文件中每个分块 32 字节），
+完成上传时与目标文件中的实际内容比对。
+分块上传只写目标文件和位图，不开启数据库事务；分块记录先进入待写队列，由调度器批量写入 upload_chunks，
+并把 upload_tasks.uploaded_chunks 更新为位图计数。任务的基本信息缓存在 Redis 中（不可用时为应用缓存），
+所有进程共享，任务完成或取消后立即失效；接收分块和查询进度时不访问数据库。
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+
+from src.database import get_db, redis_client
+from src.extensions import cache
+from src.models import UploadChunk, UploadTask
+from src.upload.chunk_storage import DATA_DIR, PreallocatedUploadFile
+from src.utils.cache_protection import CacheLock
+
+logger = logging.getLogger(__name__)
+
+BITMAP_PREFIX = 'upload:bitmap:'
+DIGEST_PREFIX = 'upload:digests:'
+TASK_META_PREFIX = 'upload:task:'
+PENDING_KEY = 'upload:chunks:pending'
+FLUSHING_KEY = 'upload:chunks:flushing'
+FLUSH_LOCK_KEY = 'upload_chunks_flush'
+# 位图与任务信息的保留时间，超过后断点续传从数据库恢复；任务超过该时间未更新视为已放弃，由调度器清理
+STATE_TIMEOUT = 7 * 24 * 3600
+LIVE_STATUSES = ('initialized', 'uploading')
+
+_RECEIVED = b'\x01'
+_DIGEST_SIZE = 32
+
+
+class UploadBitmap:
+    """单个上传任务的分块位图"""
+
+    def __init__(self, upload_id, chunk_dir='upload_chunks'):
+        self.upload_id = upload_id
+        self.key = f"{BITMAP_PREFIX}{upload_id}"
+        self.digest_key = f"{DIGEST_PREFIX}{upload_id}"
+        self.path = os.path.join(chunk_dir, f"{upload_id}.bitmap")
+        self.digest_path = os.path.join(chunk_dir, f"{upload_id}.digests")
+
+    def _use_redis(self):
+        return redis_client is not None
+
+    def is_received(self, chunk_index):
+        if self._use_redis():
+            try:
+                return bool(redis_client.getbit(self.key, chunk_index))
+            except Exception as e:
+                logger.warning(f"读取分块位图失败: {e}")
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            return os.pread(fd, 1, chunk_index) == _RECEIVED
+        finally:
+            os.close(fd)
+
+    def mark_received(self, chunk_index, chunk_hash=None):
+        """标记分块已收到，首次收到时记下分块哈希，返回 (是否为首次收到, 已收到的分块数)"""
+        if self._use_redis():
+            try:
+                # 事务中执行，首次置位的请求同时写入分块哈希
+                pipe = redis_client.pipeline()
+                pipe.setbit(self.key, chunk_index, 1)
+                if chunk_hash:
+                    pipe.hsetnx(self.digest_key, chunk_index, chunk_hash)
+                pipe.expire(self.digest_key, STATE_TIMEOUT)
+                pipe.expire(self.key, STATE_TIMEOUT)
+                pipe.bitcount(self.key)
+                results = pipe.execute()
+                return results[0] == 0, results[-1]
+            except Exception as e:
+                logger.warning(f"写入分块位图失败，改用稀疏文件: {e}")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            first = os.pread(fd, 1, chunk_index) != _RECEIVED
+            if first:
+                # 先写分块哈希再置位，读到位图已置位时哈希一定已写入
+                if chunk_hash:
+                    self._write_digest(chunk_index, bytes.fromhex(chunk_hash))
+                os.pwrite(fd, _RECEIVED, chunk_index)
+        finally:
+            os.close(fd)
+        return first, self.count()
+
+    def _write_digest(self, chunk_index, digest):
+        fd = os.open(self.digest_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(fd, digest, chunk_index * _DIGEST_SIZE)
+        finally:
+            os.close(fd)
+
+    def digests(self, total_chunks):
+        """各分块首次收到时记录的哈希，未记录的分块为 None"""
+        if self._use_redis():
+            try:
+                recorded = redis_client.hgetall(self.digest_key)
+                return [recorded.get(str(index)) for index in range(total_chunks)]
+            except Exception as e:
+                logger.warning(f"读取分块哈希失败: {e}")
+        try:
+            with open(self.digest_path, 'rb') as f:
+                data = f.read(total_chunks * _DIGEST_SIZE)
+        except FileNotFoundError:
+            data = b''
+        digests = []
+        for index in range(total_chunks):
+            digest = data[index * _DIGEST_SIZE:(index + 1) * _DIGEST_SIZE]
+            digests.append(digest.hex() if len(digest) == _DIGEST_SIZE and any(digest) else None)
+        return digests
+
+    def unmark(self, chunk_indices):
+        """清除分块的收到标记与哈希，客户端续传时重新上传这些分块"""
+        if self._use_redis():
+            try:
+                pipe = redis_client.pipeline()
+                for index in chunk_indices:
+                    pipe.setbit(self.key, index, 0)
+                    pipe.hdel(self.digest_key, index)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"写入分块位图失败: {e}")
+        if not os.path.exists(self.path):
+            return
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            for index in chunk_indices:
+                os.pwrite(fd, b'\x00', index)
+                self._write_digest(index, bytes(_DIGEST_SIZE))
+        finally:
+            os.close(fd)
+
+    def count(self):
+        if self._use_redis():
+            try:
+                return redis_client.bitcount(self.key)
+            except Exception as e:
+                logger.warning(f"读取分块位图失败: {e}")
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read().count(_RECEIVED)
+        except FileNotFoundError:
+            return 0
+
+    def received_indices(self, total_chunks):
+        if self._use_redis():
+            try:
+                pipe = redis_client.pipeline()
+                for index in range(total_chunks):
+                    pipe.getbit(self.key, index)
+                return [index for index, bit in enumerate(pipe.execute()) if bit]
+            except Exception as e:
+                logger.warning(f"读取分块位图失败: {e}")
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read(total_chunks)
+        except FileNotFoundError:
+            return []
+        return [index for index, value in enumerate(data) if value == _RECEIVED[0]]
+
+    def restore(self, chunks):
+        """位图丢失（过期或 Redis 重启）时按数据库中的分块记录 (分块索引, 分块哈希) 恢复"""
+        for index, chunk_hash in chunks:
+            self.mark_received(index, chunk_hash)
+
+    def delete(self):
+        if self._use_redis():
+            try:
+                redis_client.delete(self.key, self.digest_key)
+            except Exception as e:
+                logger.warning(f"删除分块位图失败: {e}")
+        for path in (self.path, self.digest_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _task_meta(task):
+    return {
+        'user_id': task.user_id,
+        'total_chunks': task.total_chunks,
+        'total_size': task.total_size,
+        'filename': task.filename,
+    }
+
+
+def cache_task_meta(task):
+    """缓存接收分块时需要的任务信息"""
+    key = f"{TASK_META_PREFIX}{task.id}"
+    meta = _task_meta(task)
+    if redis_client is not None:
+        try:
+            redis_client.set(key, json.dumps(meta), ex=STATE_TIMEOUT)
+            return
+        except Exception as e:
+            logger.warning(f"Redis 写入任务信息失败，改用应用缓存: {e}")
+    cache.set(key, meta, timeout=STATE_TIMEOUT)
+
+
+def _cached_task_meta(upload_id):
+    key = f"{TASK_META_PREFIX}{upload_id}"
+    if redis_client is not None:
+        try:
+            raw = redis_client.get(key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"Redis 读取任务信息失败: {e}")
+    return cache.get(key)
+
+
+def load_bitmap(db, task, chunk_dir='upload_chunks'):
+    """取得任务的位图，位图为空而数据库中已有分块记录时先恢复"""
+    bitmap = UploadBitmap(task.id, chunk_dir)
+    if bitmap.count() == 0:
+        bitmap.restore(db.query(UploadChunk.chunk_index, UploadChunk.chunk_hash).filter_by(upload_id=task.id).all())
+    return bitmap
+
+
+def get_task_meta(upload_id, user_id, chunk_dir='upload_chunks'):
+    """读取进行中任务的信息，任务不存在、已结束或不属于该用户时返回 None"""
+    meta = _cached_task_meta(upload_id)
+    if meta is None:
+        with get_db() as db:
+            task = db.query(UploadTask).filter_by(id=upload_id).first()
+            if task is None or task.status not in LIVE_STATUSES:
+                return None
+            load_bitmap(db, task, chunk_dir)
+            meta = _task_meta(task)
+            cache_task_meta(task)
+    if meta['user_id'] != user_id:
+        return None
+    return meta
+
+
+def forget_task(upload_id, chunk_dir='upload_chunks'):
+    """任务完成或取消后清除位图与缓存的任务信息"""
+    key = f"{TASK_META_PREFIX}{upload_id}"
+    if redis_client is not None:
+        try:
+            redis_client.delete(key)
+        except Exception as e:
+            logger.warning(f"Redis 删除任务信息失败: {e}")
+    cache.delete(key)
+    UploadBitmap(upload_id, chunk_dir).delete()
+
+
+class _LocalQueue:
+    def __init__(self):
+        self._items = []
+        self._lock = threading.Lock()
+
+    def push(self, item):
+        with self._lock:
+            self._items.append(item)
+
+    def drain(self):
+        with self._lock:
+            items, self._items = self._items, []
+        return items
+
+    def merge(self, items):
+        with self._lock:
+            self._items[:0] = items
+
+
+local_chunk_queue = _LocalQueue()
+
+
+def queue_chunk_record(upload_id, chunk_index, chunk_hash, chunk_size, chunk_path):
+    """分块记录进入待写队列"""
+    record = {'upload_id': upload_id, 'chunk_index': chunk_index, 'chunk_hash': chunk_hash,
+              'chunk_size': chunk_size, 'chunk_path': chunk_path}
+    if redis_client is not None:
+        try:
+            redis_client.rpush(PENDING_KEY, json.dumps(record))
+            return
+        except Exception as e:
+            logger.warning(f"Redis 写入分块队列失败，改用进程内队列: {e}")
+    local_chunk_queue.push(record)
+
+
+def _insert_chunks_ignore(db, records):
+    """写入分块记录，(upload_id, chunk_index) 已存在时忽略"""
+    dialect = db.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.execute(insert(UploadChunk).values(records).on_conflict_do_nothing(
+            index_elements=['upload_id', 'chunk_index']))
+    elif dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        db.execute(insert(UploadChunk).values(records).prefix_with('IGNORE'))
+    else:
+        for record in records:
+            try:
+                with db.begin_nested():
+                    db.add(UploadChunk(**record))
+            except IntegrityError:
+                pass
+
+
+def _apply_records(records, batch_size=500):
+    """批量写入分块记录并同步任务进度，已完成、已取消或已删除任务的记录直接丢弃"""
+    upload_ids = {record['upload_id'] for record in records}
+    with get_db() as db:
+        live_ids = {row[0] for row in db.query(UploadTask.id).filter(
+            UploadTask.id.in_(upload_ids),
+            UploadTask.status.in_(LIVE_STATUSES)
+        ).all()}
+        records = [record for record in records if record['upload_id'] in live_ids]
+        for i in range(0, len(records), batch_size):
+            _insert_chunks_ignore(db, records[i:i + batch_size])
+        for upload_id in sorted(live_ids):
+            db.execute(update(UploadTask).where(
+                UploadTask.id == upload_id,
+                UploadTask.status.in_(LIVE_STATUSES)
+            ).values(uploaded_chunks=UploadBitmap(upload_id).count(), status='uploading'))
+    return len(records)
+
+
+def _take_redis_records():
+    """将待写队列改名为写入中的键并读出，上次写入失败时直接重试该键"""
+    if not redis_client.exists(FLUSHING_KEY):
+        try:
+            redis_client.rename(PENDING_KEY, FLUSHING_KEY)
+        except Exception:
+            # 没有待写的记录
+            return []
+    return [json.loads(item) for item in redis_client.lrange(FLUSHING_KEY, 0, -1)]
+
+
+def flush_chunk_records(wait=0):
+    """
+    将待写的分块记录批量写入数据库，返回写入的记录数
+
+    Args:
+        wait: 等待其他进程释放落库锁的秒数
+    """
+    flushed = 0
+
+    local_records = local_chunk_queue.drain()
+    if local_records:
+        try:
+            flushed += _apply_records(local_records)
+        except Exception as e:
+            local_chunk_queue.merge(local_records)
+            logger.error(f"写入分块记录失败: {e}")
+
+    if redis_client is None:
+        return flushed
+
+    lock = CacheLock(FLUSH_LOCK_KEY, expire=60)
+    if not lock.acquire(timeout=wait):
+        return flushed
+    try:
+        redis_records = _take_redis_records()
+        if redis_records:
+            flushed += _apply_records(redis_records)
+            redis_client.delete(FLUSHING_KEY)
+    except Exception as e:
+        logger.error(f"写入 Redis 中的分块记录失败，将在下次重试: {e}")
+    finally:
+        lock.release()
+    return flushed
+
+
+def _upload_id_of(filename):
+    """由目标文件、位图或旧版分块文件的文件名取出任务ID"""
+    return filename.split('.', 1)[0].split('_', 1)[0]
+
+
+def _remove_stale_files(directory, live_ids, cutoff):
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if _upload_id_of(name) in live_ids or os.path.getmtime(path) >= cutoff:
+                continue
+            os.remove(path)
+            removed += 1
+        except OSError as e:
+            logger.warning(f"删除过期上传文件 {path} 失败: {e}")
+    return removed
+
+
+def cleanup_stale_uploads(data_dir=DATA_DIR, chunk_dir='upload_chunks'):
+    """
+    删除超过 STATE_TIMEOUT 未更新的进行中任务，以及没有进行中任务且超时未修改的目标文件、位图等临时文件
+
+    Returns:
+        (删除的任务数, 删除的文件数)
+    """
+    cutoff = datetime.now() - timedelta(seconds=STATE_TIMEOUT)
+    with get_db() as db:
+        last_update = func.coalesce(UploadTask.updated_at, UploadTask.created_at)
+        stale_ids = [row[0] for row in db.query(UploadTask.id).filter(
+            UploadTask.status.in_(LIVE_STATUSES),
+            last_update < cutoff
+        ).all()]
+        if stale_ids:
+            db.query(UploadChunk).filter(UploadChunk.upload_id.in_(stale_ids)).delete(synchronize_session=False)
+            db.query(UploadTask).filter(UploadTask.id.in_(stale_ids)).delete(synchronize_session=False)
+        live_ids = {row[0] for row in db.query(UploadTask.id).filter(UploadTask.status.in_(LIVE_STATUSES)).all()}
+
+    for upload_id in stale_ids:
+        forget_task(upload_id, chunk_dir)
+        PreallocatedUploadFile(upload_id, 0, 1, data_dir).delete()
+    removed = _remove_stale_files(data_dir, live_ids, cutoff.timestamp())
+    removed += _remove_stale_files(chunk_dir, live_ids, cutoff.timestamp())
+    return len(stale_ids), removed
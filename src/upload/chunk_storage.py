@@ -0,0 +1,130 @@
+"""
+分块上传的目标文件
+初始化上传任务时在存储目录的临时目录下创建与文件等长的目标文件，优先用 fallocate 预分配磁盘空间，
+文件系统不支持时用 ftruncate 扩展为稀疏文件。每个分块用 pwrite 写入自己的偏移（分块索引 × 分块大小），
+并发、乱序到达的分块互不影响；全部到齐后顺序读取一遍目标文件计算哈希并逐个核对分块，
+再直接改名到按哈希存储的位置，不再生成分块文件，也不再合并复制。
+"""
+import errno
+import hashlib
+import math
+import os
+
+# 目标文件与存储目录位于同一文件系统，完成时可以原子地改名
+DATA_DIR = os.path.join('hashed_files', 'tmp')
+
+
+class PreallocatedUploadFile:
+    """单个上传任务的目标文件"""
+
+    def __init__(self, upload_id, total_size, chunk_size, directory=DATA_DIR):
+        self.upload_id = upload_id
+        self.total_size = total_size
+        self.chunk_size = chunk_size
+        self.path = os.path.join(directory, f"{upload_id}.upload")
+
+    @property
+    def total_chunks(self):
+        return max(math.ceil(self.total_size / self.chunk_size), 1)
+
+    def chunk_length(self, chunk_index):
+        """分块应有的长度，只有最后一个分块可以不足分块大小"""
+        offset = chunk_index * self.chunk_size
+        return max(min(self.chunk_size, self.total_size - offset), 0)
+
+    def _open(self, create=False):
+        """打开目标文件，长度不足时先预分配；create 为 False 时文件不存在会抛出 FileNotFoundError"""
+        flags = os.O_RDWR
+        if create:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            flags |= os.O_CREAT
+        fd = os.open(self.path, flags, 0o644)
+        try:
+            if os.fstat(fd).st_size < self.total_size:
+                self._preallocate(fd)
+        except Exception:
+            os.close(fd)
+            raise
+        return fd
+
+    def _preallocate(self, fd):
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, self.total_size)
+                return
+            except OSError as e:
+                # 磁盘空间不足时直接报错，其他错误（文件系统不支持）改用稀疏文件
+                if e.errno == errno.ENOSPC:
+                    raise
+        os.ftruncate(fd, self.total_size)
+
+    def allocate(self):
+        """创建并预分配目标文件，断点续传时已写入的数据保持不变"""
+        os.close(self._open(create=True))
+
+    def write_chunk(self, chunk_index, chunk_data):
+        """
+        将分块写入其偏移处
+        目标文件只由 allocate 创建，任务已完成（文件已改名）或已取消（文件已删除）时抛出 FileNotFoundError
+        """
+        fd = self._open()
+        try:
+            offset = chunk_index * self.chunk_size
+            view = memoryview(chunk_data)
+            while view:
+                written = os.pwrite(fd, view, offset)
+                view = view[written:]
+                offset += written
+        finally:
+            os.close(fd)
+
+    def read_chunk(self, chunk_index):
+        """读取分块所在区间的数据，目标文件不存在时返回 None"""
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            return os.pread(fd, self.chunk_length(chunk_index), chunk_index * self.chunk_size)
+        finally:
+            os.close(fd)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def sync(self):
+        """将目标文件写入磁盘"""
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def hash(self, verification_size, chunk_digests=None):
+        """
+        按分块顺序读取一遍目标文件计算哈希，并核对各分块的内容
+
+        Args:
+            chunk_digests: 各分块上传时记录的 SHA-256，为 None 的分块不核对
+
+        Returns:
+            (完整文件哈希, 前 verification_size 字节的哈希, 内容与记录不符的分块索引)
+        """
+        full_hasher = hashlib.sha256()
+        verification_hasher = hashlib.sha256()
+        remaining = verification_size
+        mismatched = []
+        with open(self.path, 'rb') as f:
+            for index in range(self.total_chunks):
+                block = f.read(self.chunk_length(index))
+                full_hasher.update(block)
+                if remaining > 0:
+                    verification_hasher.update(block[:remaining])
+                    remaining -= min(remaining, len(block))
+                if chunk_digests and chunk_digests[index] and hashlib.sha256(block).hexdigest() != chunk_digests[index]:
+                    mismatched.append(index)
+        return full_hasher.hexdigest(), verification_hasher.hexdigest(), mismatched
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
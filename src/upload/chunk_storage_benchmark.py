@@ -0,0 +1,89 @@
+"""
+分块存储基准测试
+对比每个分块写一个文件、完成时用 copyfileobj 合并（旧实现）与预分配目标文件、按偏移 pwrite 分块、完成时改名的耗时。
+分块按乱序写入，模拟并发上传。
+
+用法: python -m src.upload.chunk_storage_benchmark [--size-mb 256] [--chunk-mb 5] [--rounds 3]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from src.upload.chunk_storage import PreallocatedUploadFile
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def legacy_store(directory, upload_id, chunks, order):
+    """旧实现：每个分块单独成文件，全部到齐后依次复制到合并文件，返回 (文件数, 写入字节数)"""
+    chunk_paths = [os.path.join(directory, f"{upload_id}_{index}.chunk") for index in range(len(chunks))]
+    for index in order:
+        partial_path = f"{chunk_paths[index]}.tmp"
+        with open(partial_path, 'wb') as f:
+            f.write(chunks[index])
+        os.replace(partial_path, chunk_paths[index])
+
+    merged_path = os.path.join(directory, f"{upload_id}.part")
+    with open(merged_path, 'wb') as merged_file:
+        for chunk_path in chunk_paths:
+            with open(chunk_path, 'rb') as chunk_file:
+                shutil.copyfileobj(chunk_file, merged_file, COPY_BUFFER_SIZE)
+        merged_file.flush()
+        os.fsync(merged_file.fileno())
+    os.replace(merged_path, os.path.join(directory, f"{upload_id}.done"))
+    for chunk_path in chunk_paths:
+        os.remove(chunk_path)
+    total_size = sum(len(chunk) for chunk in chunks)
+    return len(chunks) + 1, total_size * 2
+
+
+def preallocated_store(directory, upload_id, chunks, order):
+    """预分配实现：分块写入目标文件中的偏移，完成时直接改名，返回 (文件数, 写入字节数)"""
+    total_size = sum(len(chunk) for chunk in chunks)
+    storage = PreallocatedUploadFile(upload_id, total_size, len(chunks[0]), directory)
+    storage.allocate()
+    for index in order:
+        storage.write_chunk(index, chunks[index])
+    storage.sync()
+    os.replace(storage.path, os.path.join(directory, f"{upload_id}.done"))
+    return 1, total_size
+
+
+def _measure(func, chunks, rounds):
+    order = list(range(len(chunks)))
+    elapsed = 0
+    for n in range(rounds):
+        random.shuffle(order)
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            files, written = func(directory, f"bench{n}", chunks, order)
+            elapsed += time.perf_counter() - start
+    return elapsed / rounds * 1000, files, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分块存储基准测试')
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--chunk-mb', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    chunk_size = args.chunk_mb * 1024 * 1024
+    data = os.urandom(args.size_mb * 1024 * 1024)
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    legacy_ms, legacy_files, legacy_written = _measure(legacy_store, chunks, args.rounds)
+    prealloc_ms, prealloc_files, prealloc_written = _measure(preallocated_store, chunks, args.rounds)
+
+    print(f"文件 {args.size_mb}MB，分块 {args.chunk_mb}MB × {len(chunks)}")
+    print(f"{'实现':<8}{'平均耗时(ms)':>14}{'创建文件数':>12}{'写入(MB)':>12}")
+    print(f"{'分块文件':<8}{legacy_ms:>14.1f}{legacy_files:>12}{legacy_written / 1024 / 1024:>12.0f}")
+    print(f"{'预分配':<8}{prealloc_ms:>14.1f}{prealloc_files:>12}{prealloc_written / 1024 / 1024:>12.0f}")
+    print(f"加速比: {legacy_ms / prealloc_ms:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+秒传协商
+客户端在传输文件内容前先提交文件大小与完整文件的 SHA-256。存储中已有同样大小、同样哈希的文件时，
+服务端随机选取若干抽样区间作为挑战返回，客户端提交这些区间的 SHA-256，与已存储文件一致才视为持有该文件，
+直接为用户创建媒体记录，不再传输文件内容。抽样区间由服务端每次随机生成，仅凭泄露的文件哈希无法通过校验。
+挑战保存在 Redis 中，所有工作进程共享，只能使用一次；Redis 不可用时退回应用缓存。
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+
+from src.database import get_db, redis_client
+from src.extensions import cache
+from src.models import FileHash
+from src.setting import app_config
+
+logger = logging.getLogger(__name__)
+
+CHALLENGE_PREFIX = 'upload:instant:'
+CHALLENGE_TIMEOUT = 300
+SAMPLE_COUNT = 4
+SAMPLE_SIZE = 64 * 1024
+
+
+def sample_ranges(file_size, count=SAMPLE_COUNT, sample_size=SAMPLE_SIZE):
+    """随机选取抽样区间，返回 [(偏移, 长度), ...]；文件较小时整个文件作为一个区间"""
+    if file_size <= count * sample_size:
+        return [(0, file_size)]
+    return sorted((secrets.randbelow(file_size - sample_size + 1), sample_size) for _ in range(count))
+
+
+def resolve_storage_path(storage_path):
+    """文件哈希记录中的存储路径可能是相对路径"""
+    return os.path.join(app_config.base_dir or os.getcwd(), storage_path)
+
+
+def hash_ranges(path, ranges):
+    """计算文件中各区间的 SHA-256"""
+    hashes = []
+    with open(path, 'rb') as f:
+        for offset, length in ranges:
+            f.seek(offset)
+            hashes.append(hashlib.sha256(f.read(length)).hexdigest())
+    return hashes
+
+
+def _store_challenge(token, meta):
+    key = f"{CHALLENGE_PREFIX}{token}"
+    if redis_client is not None:
+        try:
+            redis_client.set(key, json.dumps(meta), ex=CHALLENGE_TIMEOUT)
+            return
+        except Exception as e:
+            logger.warning(f"Redis 写入秒传挑战失败，改用应用缓存: {e}")
+    cache.set(key, meta, timeout=CHALLENGE_TIMEOUT)
+
+
+def _take_challenge(token):
+    """取出并删除挑战，同一挑战只有一个请求能取到"""
+    key = f"{CHALLENGE_PREFIX}{token}"
+    if redis_client is not None:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.get(key)
+            pipe.delete(key)
+            raw, deleted = pipe.execute()
+            return json.loads(raw) if raw and deleted else None
+        except Exception as e:
+            logger.warning(f"Redis 读取秒传挑战失败: {e}")
+    meta = cache.get(key)
+    if meta is None or not cache.delete(key):
+        return None
+    return meta
+
+
+def create_challenge(user_id, filename, file_size, file_hash):
+    """
+    存储中已有该文件时生成抽样挑战
+
+    Returns:
+        {'challenge': 挑战令牌, 'ranges': [[偏移, 长度], ...]}；文件不存在或大小不一致时返回 None
+    """
+    with get_db() as db:
+        existing = db.query(FileHash.file_size, FileHash.storage_path).filter_by(hash=file_hash).first()
+    if existing is None or existing.file_size != int(file_size):
+        return None
+    if not os.path.exists(resolve_storage_path(existing.storage_path)):
+        return None
+
+    token = secrets.token_urlsafe(24)
+    ranges = sample_ranges(existing.file_size)
+    _store_challenge(token, {
+        'user_id': user_id,
+        'filename': filename,
+        'file_hash': file_hash,
+        'file_size': existing.file_size,
+        'ranges': ranges,
+    })
+    return {'challenge': token, 'ranges': [list(r) for r in ranges]}
+
+
+def verify_challenge(user_id, challenge, sample_hashes):
+    """
+    校验客户端提交的抽样哈希，挑战无论成功与否都会失效
+
+    Returns:
+        通过时返回挑战信息（user_id、filename、file_hash、file_size），否则返回 None
+    """
+    meta = _take_challenge(challenge)
+    if meta is None:
+        return None
+    if meta['user_id'] != user_id or len(sample_hashes) != len(meta['ranges']):
+        return None
+
+    with get_db() as db:
+        storage_path = db.query(FileHash.storage_path).filter_by(hash=meta['file_hash']).scalar()
+    if storage_path is None:
+        return None
+    try:
+        expected = hash_ranges(resolve_storage_path(storage_path), meta['ranges'])
+    except OSError:
+        return None
+    if not all(hmac.compare_digest(a, str(b).lower()) for a, b in zip(expected, sample_hashes)):
+        return None
+    return meta
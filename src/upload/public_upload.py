@@ -1,16 +1,20 @@
 import hashlib
 import os
-import shutil
 import uuid
 
 import magic
-from flask import jsonify, request
+from flask import current_app, jsonify, request
+from sqlalchemy import func
 from werkzeug.utils import secure_filename
 
 from src.auth_utils import jwt_required
 from src.database import get_db
 from src.extensions import limiter
 from src.models import Media, FileHash, UploadChunk, UploadTask
+from src.upload.chunk_ingest import LIVE_STATUSES, UploadBitmap, cache_task_meta, flush_chunk_records, forget_task, get_task_meta, \
+    load_bitmap, queue_chunk_record
+from src.upload.chunk_storage import PreallocatedUploadFile
+from src.upload.instant_upload import create_challenge, verify_challenge
 from src.utils.shortener.links import create_special_url
 
 
@@ -41,18 +45,35 @@ class FileProcessor:
         """计算文件哈希"""
         return hashlib.sha256(file_data).hexdigest()
 
-    def save_file(self, file_hash, file_data, original_filename):
-        """保存文件到存储系统"""
-        hash_prefix = file_hash[:2]
-        hash_subdir = os.path.join('hashed_files', hash_prefix)
+    def get_storage_path(self, file_hash):
+        """按哈希计算存储路径，并确保目录存在"""
+        hash_subdir = os.path.join('hashed_files', file_hash[:2])
         os.makedirs(hash_subdir, exist_ok=True)
+        return os.path.join(hash_subdir, file_hash)
 
-        storage_path = os.path.join(hash_subdir, file_hash)
+    def save_file(self, file_hash, file_data, original_filename):
+        """保存文件到存储系统"""
+        storage_path = self.get_storage_path(file_hash)
         with open(storage_path, 'wb') as f:
             f.write(file_data)
 
         return storage_path
 
+    def create_temp_path(self):
+        """在存储目录下创建临时文件路径，写完后可原子地改名到存储路径"""
+        temp_dir = os.path.join('hashed_files', 'tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        return os.path.join(temp_dir, f"{uuid.uuid4().hex}.part")
+
+    def save_temp_file(self, file_hash, temp_path):
+        """将写好的临时文件改名到存储路径；相同内容的文件已存在时丢弃临时文件"""
+        storage_path = self.get_storage_path(file_hash)
+        if os.path.exists(storage_path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, storage_path)
+        return storage_path
+
     def create_file_hash_record(self, db, file_hash, filename, file_size, mime_type, storage_path, reference_count=1):
         """创建文件哈希记录"""
         # 使用当前会话查询，避免会话冲突
@@ -103,21 +124,21 @@ class ChunkedUploadProcessor:
             try:
                 # 如果提供了现有的upload_id，检查是否可以进行断点续传
                 if existing_upload_id:
-                    # 使用当前会话查询现有任务
+                    # 使用当前会话查询现有任务，已完成的任务不能续传，否则会重新创建目标文件并再次接收分块
                     existing_task = db.query(UploadTask).filter_by(
                         id=existing_upload_id,
                         user_id=self.user_id,
                         filename=filename,
                         total_size=total_size,
                         total_chunks=total_chunks
-                    ).first()
+                    ).filter(UploadTask.status.in_(LIVE_STATUSES)).first()
 
                     if existing_task:
                         # 获取已上传的分块信息
-                        uploaded_chunks = db.query(UploadChunk.chunk_index).filter_by(
-                            upload_id=existing_upload_id
-                        ).all()
-                        uploaded_chunk_indices = [chunk.chunk_index for chunk in uploaded_chunks]
+                        cache_task_meta(existing_task)
+                        self._storage(existing_upload_id, total_size).allocate()
+                        uploaded_chunk_indices = load_bitmap(db, existing_task, self.temp_dir).received_indices(
+                            existing_task.total_chunks)
 
                         return {
                             'success': True,
@@ -131,27 +152,16 @@ class ChunkedUploadProcessor:
 
                 upload_id = str(uuid.uuid4())
 
-                # 如果提供了文件哈希，检查是否已存在
+                # 如果提供了文件哈希且文件已存在，返回抽样挑战，客户端通过秒传接口完成上传
                 if file_hash:
-                    # 使用当前会话查询
-                    existing_file = db.query(FileHash).filter_by(hash=file_hash).first()
-                    if existing_file:
-                        # 为用户创建媒体记录
-                        file_processor = FileProcessor(self.user_id)
-                        media_record = file_processor.create_media_record(db, file_hash, filename, check_existing=True)
-
-                        # 增加文件哈希的引用计数
-                        existing_file.reference_count += 1
-
-                        db.commit()
-
+                    challenge = create_challenge(self.user_id, filename, total_size, file_hash)
+                    if challenge:
                         return {
                             'success': True,
                             'upload_id': upload_id,
                             'file_exists': True,
                             'file_hash': file_hash,
-                            'media_id': media_record.id,
-                            'instant': True
+                            **challenge
                         }
 
                 # 检查是否有相同文件名和用户正在进行中的上传任务
@@ -167,10 +177,10 @@ class ChunkedUploadProcessor:
 
                 if existing_task:
                     # 获取已上传的分块信息
-                    uploaded_chunks = db.query(UploadChunk.chunk_index).filter_by(
-                        upload_id=existing_task.id
-                    ).all()
-                    uploaded_chunk_indices = [chunk.chunk_index for chunk in uploaded_chunks]
+                    cache_task_meta(existing_task)
+                    self._storage(existing_task.id, existing_task.total_size).allocate()
+                    uploaded_chunk_indices = load_bitmap(db, existing_task, self.temp_dir).received_indices(
+                        existing_task.total_chunks)
 
                     # 更新任务状态为上传中
                     existing_task.status = 'uploading'
@@ -186,6 +196,18 @@ class ChunkedUploadProcessor:
                         'total_chunks': existing_task.total_chunks
                     }
 
+                # 目标文件按文件大小预分配，先检查大小与剩余空间
+                size_error = self._check_total_size(db, total_size)
+                if size_error:
+                    return {'success': False, 'error': size_error}
+
+                # 分块按固定大小写入目标文件中的偏移，分块数必须与之一致
+                storage = self._storage(upload_id, total_size)
+                if storage.total_chunks != total_chunks:
+                    return {'success': False, 'error': f'分块数与文件大小不符，分块大小应为 {self.chunk_size} 字节'}
+
+                # 预分配目标文件，磁盘空间不足时在此报错
+                storage.allocate()
                 task = UploadTask(
                     id=upload_id,
                     user_id=self.user_id,
@@ -198,6 +220,7 @@ class ChunkedUploadProcessor:
                 )
                 db.add(task)
                 db.commit()
+                cache_task_meta(task)
 
                 return {
                     'success': True,
@@ -207,86 +230,112 @@ class ChunkedUploadProcessor:
                 }
             except Exception as e:
                 db.rollback()
+                if 'storage' in locals():
+                    storage.delete()
                 return {'success': False, 'error': str(e)}
 
-    def upload_chunk(self, upload_id, chunk_index, chunk_data, chunk_hash):
-        """上传单个分块"""
-        with get_db() as db:
-            try:
-                # 获取上传任务 - 使用当前会话查询
-                task = db.query(UploadTask).filter_by(id=upload_id, user_id=self.user_id).first()
-                if not task:
-                    return {'success': False, 'error': '上传任务不存在'}
+    def _check_total_size(self, db, total_size):
+        """检查新任务的文件大小：正整数、不超过上限，且加上进行中任务已预留的空间不超过用户的剩余空间"""
+        if not isinstance(total_size, int) or isinstance(total_size, bool) or total_size <= 0:
+            return '文件大小无效'
+        max_size = current_app.config.get('CHUNKED_UPLOAD_MAX_SIZE')
+        if max_size and total_size > max_size:
+            return f"文件大小超过限制: {max_size / 1024 / 1024}MB"
+
+        from src.blueprints.media import get_user_storage_limit, get_user_storage_used
+        reserved = db.query(func.coalesce(func.sum(UploadTask.total_size), 0)).filter(
+            UploadTask.user_id == self.user_id,
+            UploadTask.status.in_(LIVE_STATUSES)
+        ).scalar()
+        if get_user_storage_used(self.user_id) + reserved + total_size > get_user_storage_limit(self.user_id):
+            return '存储空间不足'
+        return None
+
+    def _storage(self, upload_id, total_size):
+        """上传任务的目标文件"""
+        return PreallocatedUploadFile(upload_id, total_size, self.chunk_size)
+
+    def _verification_size(self, total_chunks):
+        """前端计算 file_hash 时使用的数据长度（前2个分块）"""
+        return min(2, total_chunks) * self.chunk_size
 
-                # 检查分块是否已上传 - 使用当前会话查询
-                existing_chunk = db.query(UploadChunk).filter_by(
-                    upload_id=upload_id,
-                    chunk_index=chunk_index
-                ).first()
+    def upload_chunk(self, upload_id, chunk_index, chunk_data, chunk_hash):
+        """
+        上传单个分块，服务端校验分块哈希，首次收到时按索引记下分块哈希，完成上传时与目标文件中的内容核对
+        只写目标文件中分块所在的区间和位图，同一任务的多个分块可以并发、乱序上传；分块记录由调度器批量写入数据库
+        """
+        if hashlib.sha256(chunk_data).hexdigest() != chunk_hash:
+            return {'success': False, 'error': '分块哈希验证失败'}
 
-                if existing_chunk:
-                    # 验证分块哈希是否匹配
-                    if existing_chunk.chunk_hash != chunk_hash:
-                        return {'success': False, 'error': '分块哈希不匹配'}
-                    return {'success': True, 'message': '分块已存在'}
-
-                # 保存分块文件
-                chunk_filename = f"{upload_id}_{chunk_index}.chunk"
-                chunk_path = os.path.join(self.temp_dir, chunk_filename)
-
-                # 确保目录存在
-                os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
-
-                with open(chunk_path, 'wb') as f:
-                    f.write(chunk_data)
-
-                # 记录分块信息
-                chunk_record = UploadChunk(
-                    upload_id=upload_id,
-                    chunk_index=chunk_index,
-                    chunk_hash=chunk_hash,
-                    chunk_size=len(chunk_data),
-                    chunk_path=chunk_path
-                )
-                db.add(chunk_record)
+        try:
+            meta = get_task_meta(upload_id, self.user_id, self.temp_dir)
+            if meta is None:
+                return {'success': False, 'error': '上传任务不存在'}
+            total_chunks = meta['total_chunks']
+            if not 0 <= chunk_index < total_chunks:
+                return {'success': False, 'error': '分块索引无效'}
+
+            storage = self._storage(upload_id, meta['total_size'])
+            if len(chunk_data) != storage.chunk_length(chunk_index):
+                return {'success': False, 'error': '分块大小无效'}
+
+            bitmap = UploadBitmap(upload_id, self.temp_dir)
+            if bitmap.is_received(chunk_index):
+                # 验证分块哈希是否匹配
+                stored = storage.read_chunk(chunk_index)
+                if stored is not None and hashlib.sha256(stored).hexdigest() != chunk_hash:
+                    return {'success': False, 'error': '分块哈希不匹配'}
+                return {'success': True, 'message': '分块已存在'}
+
+            # 写入目标文件后再标记位图
+            try:
+                storage.write_chunk(chunk_index, chunk_data)
+            except FileNotFoundError:
+                # 任务已在其他进程中完成或取消
+                return {'success': False, 'error': '上传任务不存在'}
 
-                # 更新任务进度
-                task.uploaded_chunks += 1
-                task.status = 'uploading'
-                db.commit()
+            first, uploaded_count = bitmap.mark_received(chunk_index, chunk_hash)
+            if first:
+                queue_chunk_record(upload_id, chunk_index, chunk_hash, len(chunk_data), storage.path)
 
-                return {'success': True, 'message': '分块上传成功'}
+            return {'success': True, 'message': '分块上传成功', 'uploaded_count': uploaded_count}
 
-            except Exception as e:
-                db.rollback()
-                # 记录详细的错误信息
-                import traceback
-                error_details = f"分块 {chunk_index} 上传失败: {str(e)}\n{traceback.format_exc()}"
-                import logging
-                logging.getLogger(__name__).error(error_details)
-                return {'success': False, 'error': error_details}
+        except Exception as e:
+            # 记录详细的错误信息
+            import traceback
+            error_details = f"分块 {chunk_index} 上传失败: {str(e)}\n{traceback.format_exc()}"
+            import logging
+            logging.getLogger(__name__).error(error_details)
+            return {'success': False, 'error': error_details}
 
     def get_upload_progress(self, upload_id):
-        """获取上传进度"""
-        with get_db() as db:
-            # 使用当前会话查询
-            task = db.query(UploadTask).filter_by(id=upload_id, user_id=self.user_id).first()
-            if not task:
-                return {'success': False, 'error': '上传任务不存在'}
-
-            uploaded_chunks = db.query(UploadChunk).filter_by(upload_id=upload_id).count()
-
-            return {
-                'success': True,
-                'upload_id': upload_id,
-                'total_chunks': task.total_chunks,
-                'uploaded_chunks': uploaded_chunks,
-                'progress': round((uploaded_chunks / task.total_chunks) * 100, 2) if task.total_chunks > 0 else 0,
-                'status': task.status
-            }
+        """获取上传进度，进行中的任务只读取位图"""
+        meta = get_task_meta(upload_id, self.user_id, self.temp_dir)
+        if meta is not None:
+            uploaded_chunks = UploadBitmap(upload_id, self.temp_dir).count()
+            total_chunks = meta['total_chunks']
+            status = 'uploading' if uploaded_chunks else 'initialized'
+        else:
+            with get_db() as db:
+                # 使用当前会话查询
+                task = db.query(UploadTask).filter_by(id=upload_id, user_id=self.user_id).first()
+                if not task:
+                    return {'success': False, 'error': '上传任务不存在'}
+                total_chunks = task.total_chunks
+                uploaded_chunks = total_chunks if task.status == 'completed' else task.uploaded_chunks or 0
+                status = task.status
+
+        return {
+            'success': True,
+            'upload_id': upload_id,
+            'total_chunks': total_chunks,
+            'uploaded_chunks': uploaded_chunks,
+            'progress': round((uploaded_chunks / total_chunks) * 100, 2) if total_chunks > 0 else 0,
+            'status': status
+        }
 
     def complete_upload(self, upload_id, file_hash, mime_type):
-        """完成上传，合并所有分块"""
+        """完成上传，将目标文件改名到存储位置"""
         with get_db() as db:
             try:
                 # 使用当前会话查询
@@ -295,73 +344,42 @@ class ChunkedUploadProcessor:
                     return {'success': False, 'error': '上传任务不存在'}
 
                 # 检查是否所有分块都已上传
-                uploaded_count = db.query(UploadChunk).filter_by(upload_id=upload_id).count()
+                bitmap = load_bitmap(db, task, self.temp_dir)
+                uploaded_count = bitmap.count()
                 if uploaded_count != task.total_chunks:
                     return {
                         'success': False,
                         'error': f'分块不完整: {uploaded_count}/{task.total_chunks}'
                     }
 
-                # 获取所有分块并按索引排序 - 使用当前会话查询
-                chunks = db.query(UploadChunk).filter_by(upload_id=upload_id).order_by(UploadChunk.chunk_index).all()
+                storage = self._storage(upload_id, task.total_size)
+                if not storage.exists():
+                    return {'success': False, 'error': f'上传文件不存在: {storage.path}'}
 
-                # 合并分块
-                merged_file_path = os.path.join(self.temp_dir, f"{upload_id}_merged")
-
-                # 确保目录存在
-                os.makedirs(os.path.dirname(merged_file_path), exist_ok=True)
-
-                with open(merged_file_path, 'wb') as merged_file:
-                    for chunk in chunks:
-                        # 检查分块文件是否存在
-                        if not os.path.exists(chunk.chunk_path):
-                            return {'success': False, 'error': f'分块文件不存在: {chunk.chunk_path}'}
-
-                        with open(chunk.chunk_path, 'rb') as chunk_file:
-                            shutil.copyfileobj(chunk_file, merged_file)
-
-                # 修复：只对前几个分块进行哈希校验，与前端保持一致
-                # 读取前2个分块的数据进行哈希校验（与前端保持一致）
-                with open(merged_file_path, 'rb') as f:
-                    chunk_count_for_verification = min(2, task.total_chunks)
-                    total_verification_size = chunk_count_for_verification * self.chunk_size
-                    data_for_verification = f.read(total_verification_size)
-                    verification_hash = hashlib.sha256(data_for_verification).hexdigest()
-
-                # 校验哈希值（只校验前几个分块）
-                if verification_hash != file_hash:
-                    # 记录详细信息以便调试
-                    import logging
-                    logging.getLogger(__name__).error(f"哈希不匹配：期望 {file_hash}, 实际 {verification_hash}")
-                    logging.getLogger(__name__).error(f"用于验证的数据大小: {len(data_for_verification)} bytes")
-
-                    # 清理临时文件
-                    if os.path.exists(merged_file_path):
-                        os.remove(merged_file_path)
-                    return {'success': False, 'error': f'文件哈希验证失败：期望 {file_hash}, 实际 {verification_hash}'}
-
-                # 验证通过后再读取完整文件数据并计算完整哈希值
-                with open(merged_file_path, 'rb') as f:
-                    file_data = f.read()
-
-                # 计算完整文件的哈希值用于存储
-                full_file_hash = hashlib.sha256(file_data).hexdigest()
+                # 顺序读取一遍目标文件，同时计算完整哈希、前端校验用的前2个分块的哈希，并核对各分块；
+                # 同一分块被并发写入不同内容时，文件中的内容可能与记录的分块哈希不符，清除这些分块让客户端重传
+                processor = FileProcessor(self.user_id)
+                storage.sync()
+                full_file_hash, verification_hash, mismatched = storage.hash(
+                    self._verification_size(task.total_chunks), bitmap.digests(task.total_chunks))
+                if mismatched:
+                    bitmap.unmark(mismatched)
+                    db.query(UploadChunk).filter(
+                        UploadChunk.upload_id == upload_id,
+                        UploadChunk.chunk_index.in_(mismatched)
+                    ).delete(synchronize_session=False)
+                    db.commit()
+                    return {'success': False, 'error': f'分块内容校验失败，请重新上传分块: {mismatched}'}
 
-                # 校验哈希值（只校验前几个分块）
+                # 校验哈希值（只校验前几个分块，与前端保持一致）
                 if verification_hash != file_hash:
                     # 记录详细信息以便调试
                     import logging
                     logging.getLogger(__name__).error(f"哈希不匹配：期望 {file_hash}, 实际 {verification_hash}")
-                    logging.getLogger(__name__).error(f"用于验证的数据大小: {len(data_for_verification)} bytes")
-
-                    # 清理临时文件
-                    if os.path.exists(merged_file_path):
-                        os.remove(merged_file_path)
                     return {'success': False, 'error': f'文件哈希验证失败：期望 {file_hash}, 实际 {verification_hash}'}
 
-                # 保存到最终位置
-                processor = FileProcessor(self.user_id)
-                storage_path = processor.save_file(full_file_hash, file_data, task.filename)
+                # 改名到最终位置
+                storage_path = processor.save_temp_file(full_file_hash, storage.path)
 
                 # 创建文件记录
                 file_hash_record = processor.create_file_hash_record(
@@ -375,17 +393,11 @@ class ChunkedUploadProcessor:
                 task.status = 'completed'
                 task.file_hash = full_file_hash
 
-                # 清理分块文件
-                for chunk in chunks:
-                    if os.path.exists(chunk.chunk_path):
-                        os.remove(chunk.chunk_path)
-                    db.delete(chunk)
-
-                # 清理合并的临时文件
-                if os.path.exists(merged_file_path):
-                    os.remove(merged_file_path)
+                # 清理分块记录
+                db.query(UploadChunk).filter_by(upload_id=upload_id).delete(synchronize_session=False)
 
                 db.commit()
+                forget_task(upload_id, self.temp_dir)
 
                 return {
                     'success': True,
@@ -395,15 +407,10 @@ class ChunkedUploadProcessor:
 
             except Exception as e:
                 db.rollback()
-                # 清理临时文件，包括合并的文件和分块文件
-                if 'merged_file_path' in locals() and os.path.exists(merged_file_path):
-                    os.remove(merged_file_path)
-
-                # 尝试清理所有分块文件（如果已获取了chunks）
-                if 'chunks' in locals():
-                    for chunk in chunks:
-                        if os.path.exists(chunk.chunk_path):
-                            os.remove(chunk.chunk_path)
+                # 保留目标文件，与位图一致，客户端可以直接重试完成；
+                # 目标文件已改名到存储位置时清除位图，重试时重新预分配并上传全部分块
+                if 'storage' in locals() and not storage.exists():
+                    UploadBitmap(upload_id, self.temp_dir).delete()
 
                 # 记录详细错误信息
                 import traceback
@@ -414,6 +421,8 @@ class ChunkedUploadProcessor:
 
     def get_uploaded_chunks(self, upload_id):
         """获取已上传的分块列表"""
+        # 分块哈希等信息保存在数据库中，先写入待写队列中的记录
+        flush_chunk_records(wait=5)
         with get_db() as db:
             try:
                 # 检查上传任务是否存在
@@ -458,16 +467,14 @@ class ChunkedUploadProcessor:
                 if not task:
                     return {'success': False, 'error': '上传任务不存在'}
 
-                # 删除所有分块文件 - 使用当前会话查询
-                chunks = db.query(UploadChunk).filter_by(upload_id=upload_id).all()
-                for chunk in chunks:
-                    if os.path.exists(chunk.chunk_path):
-                        os.remove(chunk.chunk_path)
-                    db.delete(chunk)
+                # 删除目标文件和分块记录
+                self._storage(upload_id, task.total_size).delete()
+                db.query(UploadChunk).filter_by(upload_id=upload_id).delete(synchronize_session=False)
 
                 # 删除任务记录
                 db.delete(task)
                 db.commit()
+                forget_task(upload_id, self.temp_dir)
 
                 return {'success': True, 'message': '上传任务已取消'}
 
@@ -569,6 +576,68 @@ def handle_user_upload(user_id, allowed_size=10 * 1024 * 1024, allowed_mimes=Non
         return jsonify({'message': 'failed', 'error': str(e)}), 500
 
 
+def complete_instant_upload(user_id, challenge, sample_hashes):
+    """抽样哈希校验通过后为用户创建媒体记录，用户已有该文件时返回已有记录"""
+    meta = verify_challenge(user_id, challenge, sample_hashes)
+    if meta is None:
+        return {'success': False, 'error': '秒传校验失败'}
+
+    with get_db() as db:
+        try:
+            file_hash_record = db.query(FileHash).filter_by(hash=meta['file_hash']).first()
+            if not file_hash_record:
+                return {'success': False, 'error': '文件不存在'}
+
+            processor = FileProcessor(user_id)
+            media_record = processor.create_media_record(db, meta['file_hash'], meta['filename'], check_existing=True)
+            if media_record in db.new:
+                file_hash_record.reference_count += 1
+            db.commit()
+
+            return {
+                'success': True,
+                'file_hash': meta['file_hash'],
+                'media_id': media_record.id,
+                'instant': True
+            }
+        except Exception as e:
+            db.rollback()
+            return {'success': False, 'error': str(e)}
+
+
+@jwt_required
+@limiter.limit("30 per minute")
+def handle_instant_upload(user_id):
+    """
+    秒传协商，不传输文件内容
+    第一步提交 filename、file_size 与完整文件的 file_hash，文件已存在时返回 challenge 与抽样区间 ranges；
+    第二步提交 challenge 与各区间的 SHA-256（sample_hashes），校验通过后创建媒体记录
+    """
+    try:
+        data = request.get_json() or {}
+        challenge = data.get('challenge')
+        if challenge:
+            sample_hashes = data.get('sample_hashes')
+            if not isinstance(sample_hashes, list):
+                return jsonify({'success': False, 'error': '缺少必要参数'}), 400
+            result = complete_instant_upload(user_id, challenge, sample_hashes)
+            return jsonify(result), 200 if result['success'] else 400
+
+        filename = data.get('filename')
+        file_size = data.get('file_size')
+        file_hash = data.get('file_hash')
+        if not filename or not isinstance(file_size, int) or not file_hash:
+            return jsonify({'success': False, 'error': '缺少必要参数'}), 400
+
+        challenge = create_challenge(user_id, filename, file_size, file_hash.lower())
+        if challenge is None:
+            return jsonify({'success': True, 'file_exists': False}), 200
+        return jsonify({'success': True, 'file_exists': True, **challenge}), 200
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @jwt_required
 @limiter.limit("5 per minute")
 # 大文件分块上传接口
@@ -609,11 +678,7 @@ def handle_chunked_upload_chunk(user_id):
         chunk_file = request.files['chunk']
         chunk_data = chunk_file.read()
 
-        # 验证分块哈希
-        actual_chunk_hash = hashlib.sha256(chunk_data).hexdigest()
-        if actual_chunk_hash != chunk_hash:
-            return jsonify({'success': False, 'error': '分块哈希验证失败'}), 400
-
+        # 分块哈希由 upload_chunk 校验
         processor = ChunkedUploadProcessor(user_id)
         result = processor.upload_chunk(upload_id, chunk_index, chunk_data, chunk_hash)
 
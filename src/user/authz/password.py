@@ -1,10 +1,12 @@
 from flask import request
 
-from src.models import User, Notification, db
+from src.models import Notification, db
+from src.user.entities import get_user
+from src.user.stats import adjust_user_stats
 
 
 def update_password(user_id, new_password, confirm_password, ip):
-    user = db.session.query(User).filter_by(id=user_id).first()
+    user = get_user(user_id)
 
     if user:
         # 验证新密码和确认密码是否一致，并且长度是否符合要求
@@ -18,6 +20,7 @@ def update_password(user_id, new_password, confirm_password, ip):
                     message=f"{ip} changed password"
                 )
                 db.session.add(notice)
+                adjust_user_stats(user_id, unread_notifications=1)
                 return True
             except Exception as e:
                 print(e)
@@ -33,7 +36,7 @@ def update_password(user_id, new_password, confirm_password, ip):
 def validate_password(user_id):
     password = request.form.get('password')
     # 查询用户
-    user = db.session.query(User).filter_by(id=user_id).first()
+    user = get_user(user_id)
     if user:
         return user.check_password(password=password)
     return False
@@ -0,0 +1,160 @@
+"""
+用户权限集
+用户的角色名与权限代码由一次联表查询编译为不可变集合，缓存在 Redis（不可用时使用应用缓存）中。
+缓存值中记录编译时的全局版本（角色与权限的对应关系）和用户版本（用户的角色分配），
+读取时用一次 MGET 同时取出缓存值与两个当前版本，版本不一致即视为失效并重新编译。
+修改角色、权限或用户角色后调用 invalidate_* 递增相应版本；无状态令牌中的角色声明按受影响用户吊销。
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import FrozenSet
+
+from src.database import redis_client
+from src.extensions import cache
+from src.models import Permission, Role, RolePermission, User, UserRole, db
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'authz:perms:'
+GLOBAL_VERSION_KEY = 'authz:version'
+USER_VERSION_PREFIX = 'authz:version:'
+PERMISSION_SET_TIMEOUT = 3600
+
+
+@dataclass(frozen=True)
+class PermissionSet:
+    exists: bool
+    roles: FrozenSet[str]
+    permissions: FrozenSet[str]
+
+    def has_role(self, role_name):
+        return role_name in self.roles
+
+    def has_permission(self, permission_code):
+        return permission_code in self.permissions
+
+
+_MISSING = PermissionSet(exists=False, roles=frozenset(), permissions=frozenset())
+
+
+def compile_permission_set(user_id):
+    """查询用户的全部角色与权限"""
+    rows = db.session.query(User.id, Role.name, Permission.code).outerjoin(
+        UserRole, UserRole.user_id == User.id
+    ).outerjoin(
+        Role, Role.id == UserRole.role_id
+    ).outerjoin(
+        RolePermission, RolePermission.role_id == Role.id
+    ).outerjoin(
+        Permission, Permission.id == RolePermission.permission_id
+    ).filter(User.id == user_id).all()
+    if not rows:
+        return _MISSING
+    return PermissionSet(
+        exists=True,
+        roles=frozenset(row[1] for row in rows if row[1] is not None),
+        permissions=frozenset(row[2] for row in rows if row[2] is not None),
+    )
+
+
+def _user_version_key(user_id):
+    return f"{USER_VERSION_PREFIX}{user_id}"
+
+
+def _encode(permission_set, versions):
+    return json.dumps({
+        'versions': versions,
+        'exists': permission_set.exists,
+        'roles': sorted(permission_set.roles),
+        'permissions': sorted(permission_set.permissions),
+    })
+
+
+def _decode(raw, versions):
+    if raw is None:
+        return None
+    data = json.loads(raw)
+    if data.get('versions') != versions:
+        return None
+    return PermissionSet(exists=data['exists'], roles=frozenset(data['roles']),
+                         permissions=frozenset(data['permissions']))
+
+
+def _read(user_id):
+    """一次读取缓存值与当前版本，返回 (permission_set 或 None, versions)"""
+    keys = (f"{KEY_PREFIX}{user_id}", GLOBAL_VERSION_KEY, _user_version_key(user_id))
+    if redis_client is not None:
+        try:
+            raw, global_version, user_version = redis_client.mget(keys)
+            versions = [int(global_version or 0), int(user_version or 0)]
+            return _decode(raw, versions), versions
+        except Exception as e:
+            logger.warning(f"读取权限集缓存失败: {e}")
+    raw, global_version, user_version = cache.get_many(*keys)
+    versions = [int(global_version or 0), int(user_version or 0)]
+    return _decode(raw, versions), versions
+
+
+def _write(user_id, permission_set, versions):
+    key = f"{KEY_PREFIX}{user_id}"
+    value = _encode(permission_set, versions)
+    if redis_client is not None:
+        try:
+            redis_client.set(key, value, ex=PERMISSION_SET_TIMEOUT)
+            return
+        except Exception as e:
+            logger.warning(f"写入权限集缓存失败: {e}")
+    cache.set(key, value, timeout=PERMISSION_SET_TIMEOUT)
+
+
+def get_permission_set(user_id):
+    """获取用户的权限集，缓存命中时不访问数据库"""
+    permission_set, versions = _read(user_id)
+    if permission_set is None:
+        permission_set = compile_permission_set(user_id)
+        _write(user_id, permission_set, versions)
+    return permission_set
+
+
+def get_user_version(user_id):
+    """用户当前的权限版本，作为访问令牌中的会话版本"""
+    key = _user_version_key(user_id)
+    if redis_client is not None:
+        try:
+            return int(redis_client.get(key) or 0)
+        except Exception as e:
+            logger.warning(f"读取权限版本失败: {e}")
+    return int(cache.get(key) or 0)
+
+
+def _bump(key):
+    if redis_client is not None:
+        try:
+            redis_client.incr(key)
+            return
+        except Exception as e:
+            logger.warning(f"更新权限版本失败: {e}")
+    cache.set(key, int(cache.get(key) or 0) + 1, timeout=0)
+
+
+def invalidate_user_permissions(user_id):
+    """用户的角色分配变化后调用"""
+    _bump(_user_version_key(user_id))
+    from src.user.authz.stateless import revoke_user_tokens
+    revoke_user_tokens(user_id)
+
+
+def invalidate_all_permissions(role_ids=()):
+    """
+    角色或权限本身、角色与权限的对应关系变化后调用
+    role_ids 为受影响的角色：持有这些角色的用户逐个递增用户版本并吊销令牌，令牌中的角色声明随之失效
+    """
+    _bump(GLOBAL_VERSION_KEY)
+    if not role_ids:
+        return
+    user_ids = [row[0] for row in db.session.query(UserRole.user_id).filter(
+        UserRole.role_id.in_(list(role_ids))
+    ).distinct().all()]
+    for user_id in user_ids:
+        invalidate_user_permissions(user_id)
@@ -73,7 +73,9 @@ from flask_jwt_extended import create_access_token
 from flask_login import login_user
 from datetime import datetime, timezone
 import uuid
-from src.models import User, UserSession, db
+from src.models import UserSession, db
+from src.user.entities import get_user
+from src.user.authz.stateless import token_claims
 from src.setting import app_config
 
 
@@ -89,7 +91,7 @@ def check_qr_login_back(cache_instance):
         user_id = cache_qr_allowed.get('user_id')
         # print(user_id)
 
-        scan_user = User.query.filter_by(id=user_id).first()
+        scan_user = get_user(user_id)
         if not scan_user:
             return jsonify({'status': 'error', 'message': '用户不存在'})
 
@@ -97,8 +99,7 @@ def check_qr_login_back(cache_instance):
         access_token = create_access_token(
             identity=str(scan_user.id),
             additional_claims={
-                'user_id': scan_user.id,
-                'email': scan_user.email,
+                **token_claims(scan_user.id, scan_user.email),
                 'jti': str(uuid.uuid4())
             },
             expires_delta=app_config.JWT_ACCESS_TOKEN_EXPIRES
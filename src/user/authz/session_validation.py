@@ -0,0 +1,112 @@
+"""
+会话令牌校验
+以访问令牌的 SHA-256 摘要为键，校验结果缓存在 Redis（不可用时使用应用缓存）中，所有进程共享；
+缓存未命中时按带唯一索引的 access_token_digest 列查询。有效会话缓存其过期时间，缓存时长不超过会话剩余有效期；
+退出会话、封禁用户与定时清理时调用 revoke_* 直接写入失效标记，校验始终只需一次键读取。
+"""
+import logging
+import time
+from datetime import datetime
+
+from src.database import redis_client
+from src.extensions import cache
+from src.models import UserSession, db
+from src.models.userSession import token_digest
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'session:valid:'
+SESSION_CACHE_TIMEOUT = 300
+# 失效标记
+_REVOKED = '0'
+
+
+def _key(digest):
+    return f"{KEY_PREFIX}{digest}"
+
+
+def _cache_get(key):
+    if redis_client is not None:
+        try:
+            return redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"读取会话校验缓存失败: {e}")
+    return cache.get(key)
+
+
+def _cache_set_many(mapping, timeout):
+    if not mapping:
+        return
+    if redis_client is not None:
+        try:
+            pipe = redis_client.pipeline()
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=timeout)
+            pipe.execute()
+            return
+        except Exception as e:
+            logger.warning(f"写入会话校验缓存失败: {e}")
+    cache.set_many(mapping, timeout=timeout)
+
+
+def _load(access_token, digest):
+    """查询会话，返回过期时间戳，会话不存在、已停用或已过期时返回 None"""
+    row = db.session.query(UserSession.is_active, UserSession.expiry_time).filter_by(
+        access_token_digest=digest
+    ).first()
+    if row is None:
+        # 摘要列上线前创建的会话
+        session = UserSession.query.filter_by(access_token=access_token, access_token_digest=None).first()
+        if session is None:
+            return None
+        session.access_token_digest = digest
+        db.session.commit()
+        row = session
+    if not row.is_active or row.expiry_time is None or row.expiry_time <= datetime.now():
+        return None
+    return row.expiry_time.timestamp()
+
+
+def validate_access_token(access_token):
+    """访问令牌对应的会话是否有效"""
+    digest = token_digest(access_token)
+    key = _key(digest)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached != _REVOKED and float(cached) > time.time()
+
+    expires_at = _load(access_token, digest)
+    if expires_at is None:
+        _cache_set_many({key: _REVOKED}, SESSION_CACHE_TIMEOUT)
+        return False
+    timeout = min(SESSION_CACHE_TIMEOUT, int(expires_at - time.time()))
+    if timeout > 0:
+        _cache_set_many({key: str(expires_at)}, timeout)
+    return True
+
+
+def revoke_token_digests(digests):
+    """将令牌摘要标记为失效"""
+    from src.user.authz.stateless import revoke_token_digest
+    digests = [digest for digest in digests if digest]
+    for digest in digests:
+        revoke_token_digest(digest)
+    _cache_set_many({_key(digest): _REVOKED for digest in digests}, SESSION_CACHE_TIMEOUT)
+
+
+def revoke_access_token(access_token):
+    """退出登录时调用，停用访问令牌所属的会话并使令牌立即失效"""
+    digest = token_digest(access_token)
+    try:
+        db.session.query(UserSession).filter_by(access_token_digest=digest).update(
+            {'is_active': False}, synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"停用会话失败: {e}")
+    revoke_token_digests([digest])
+
+
+def revoke_sessions(sessions):
+    """会话停用或删除后调用，使其访问令牌立即失效"""
+    revoke_token_digests(session.access_token_digest for session in sessions)
@@ -0,0 +1,206 @@
+"""
+无状态令牌认证
+开启 JWT_STATELESS_AUTH 后，访问令牌的声明中携带用户ID、角色名与会话版本（签发时的用户权限版本），
+jwt_required 只校验令牌签名与有效期，并查询进程内的吊销布隆过滤器，不访问数据库。
+过滤器由调度器定期从 user_sessions 中已停用但未过期的会话，以及 Redis 中记录的权限变更用户重建；
+本进程内的吊销与权限变更会立即加入过滤器，其他进程在下次同步后生效。
+过滤器命中（包括误判）时回退到精确校验：会话状态校验与会话版本比对，任一不通过则改走 Flask-Login 会话认证。
+通过认证的请求中，角色检查（User.has_role、admin_required）直接使用令牌中的 roles 声明。
+未开启无状态模式时吊销操作不做任何事。
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+
+from src.database import redis_client
+from src.models import UserSession, db
+from src.models.userSession import token_digest
+from src.user.authz.permission_set import get_permission_set, get_user_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 100000
+FALSE_POSITIVE_RATE = 0.01
+# 权限变更用户的标记及其保留截止时间（有序集合，分值为截止时间戳）
+REVOKED_USERS_KEY = 'authz:revoked_users'
+# 清理本进程过期条目的最小间隔
+PRUNE_INTERVAL = 60
+
+
+class BloomFilter:
+    """定长布隆过滤器，使用双重哈希计算位置"""
+
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.sha256(item.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def _user_marker(user_id):
+    return f"user:{user_id}"
+
+
+class RevocationFilter:
+    """进程内的吊销过滤器"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._filter = None
+        # 本进程加入的条目及其保留截止时间，重建过滤器时保留
+        self._local = {}
+        self._pruned_at = 0
+        self._lock = threading.Lock()
+
+    def retention(self):
+        try:
+            return current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
+        except (RuntimeError, KeyError, AttributeError):
+            return 7200
+
+    def _capacity(self):
+        try:
+            return current_app.config.get('REVOCATION_FILTER_CAPACITY', self.capacity)
+        except RuntimeError:
+            return self.capacity
+
+    def _prune(self, now):
+        self._local = {item: until for item, until in self._local.items() if until > now}
+        self._pruned_at = now
+
+    def sync(self):
+        """从 user_sessions 与权限变更记录重建过滤器，返回吊销的令牌数"""
+        digests = [row[0] for row in db.session.query(UserSession.access_token_digest).filter(
+            UserSession.is_active == False,
+            UserSession.access_token_digest.isnot(None),
+            UserSession.expiry_time > datetime.now()
+        ).all()]
+        now = time.time()
+        if redis_client is not None:
+            try:
+                digests.extend(redis_client.zrangebyscore(REVOKED_USERS_KEY, now, '+inf'))
+            except Exception as e:
+                logger.warning(f"读取权限变更用户失败: {e}")
+        with self._lock:
+            self._prune(now)
+            bloom = BloomFilter(max(self._capacity(), 2 * (len(digests) + len(self._local))))
+            for item in digests:
+                bloom.add(item)
+            for item in self._local:
+                bloom.add(item)
+            self._filter = bloom
+        return len(digests)
+
+    def add(self, item):
+        now = time.time()
+        with self._lock:
+            if now - self._pruned_at > PRUNE_INTERVAL:
+                self._prune(now)
+            self._local[item] = now + self.retention()
+            if self._filter is not None:
+                self._filter.add(item)
+
+    def might_contain(self, item):
+        bloom = self._filter
+        if bloom is None:
+            self.sync()
+            bloom = self._filter
+        return item in bloom
+
+
+revocation_filter = RevocationFilter()
+
+
+def _enabled():
+    try:
+        return bool(current_app.config.get('JWT_STATELESS_AUTH'))
+    except RuntimeError:
+        return False
+
+
+def revoke_token_digest(digest):
+    if _enabled():
+        revocation_filter.add(digest)
+
+
+def revoke_user_tokens(user_id):
+    """用户权限变化后调用，该用户的令牌改走精确校验；其他进程在下次同步过滤器后生效"""
+    if not _enabled():
+        return
+    marker = _user_marker(user_id)
+    revocation_filter.add(marker)
+    if redis_client is not None:
+        try:
+            now = time.time()
+            pipe = redis_client.pipeline()
+            pipe.zadd(REVOKED_USERS_KEY, {marker: now + revocation_filter.retention()})
+            pipe.zremrangebyscore(REVOKED_USERS_KEY, 0, now)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"记录权限变更用户失败: {e}")
+
+
+def token_roles(user_id):
+    """当前请求由无状态认证通过且属于该用户时返回令牌中的角色，否则返回 None"""
+    if has_request_context() and g.get('stateless_auth') and g.get('stateless_user_id') == user_id:
+        return g.token_roles
+    return None
+
+
+def token_claims(user_id, email=None):
+    """签发访问令牌时附加的声明"""
+    return {
+        'user_id': user_id,
+        'email': email,
+        'roles': sorted(get_permission_set(user_id).roles),
+        'sv': get_user_version(user_id),
+    }
+
+
+def authenticate_stateless():
+    """
+    仅凭访问令牌认证当前请求
+
+    Returns:
+        用户ID；令牌无效、不含无状态声明或已吊销时返回 None
+    """
+    try:
+        verify_jwt_in_request(locations=['cookies'])
+    except Exception as e:
+        logger.debug(f"无状态认证未通过: {e}")
+        return None
+    claims = get_jwt()
+    user_id = claims.get('user_id')
+    if user_id is None or 'sv' not in claims:
+        return None
+
+    access_token = request.cookies.get(current_app.config.get('JWT_ACCESS_COOKIE_NAME', 'access_token'))
+    digest = token_digest(access_token)
+    if revocation_filter.might_contain(digest) or revocation_filter.might_contain(_user_marker(user_id)):
+        from src.user.authz.session_validation import validate_access_token
+        if not validate_access_token(access_token) or claims['sv'] != get_user_version(user_id):
+            return None
+
+    g.stateless_auth = True
+    g.stateless_user_id = user_id
+    g.token_roles = frozenset(claims.get('roles', ()))
+    return user_id
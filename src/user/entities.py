@@ -1,7 +1,71 @@
+from flask import current_app
+from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import make_transient_to_detached
 
+from src.extensions import cache
+from src.logger_config import USER_LOOKUPS
 from src.models import Article, User, db
 
+# 跨请求的用户快照缓存时间，用户数据更新时主动失效
+USER_SNAPSHOT_TIMEOUT = 30
+USER_SNAPSHOT_PREFIX = 'user_snapshot:'
+# 不放入快照的敏感字段，访问时按需从数据库加载
+_SNAPSHOT_EXCLUDED = frozenset({'password', 'totp_secret', 'backup_codes'})
+_SNAPSHOT_FIELDS = tuple(attr.key for attr in User.__mapper__.column_attrs if attr.key not in _SNAPSHOT_EXCLUDED)
+
+
+def _snapshot_key(user_id):
+    return f"{USER_SNAPSHOT_PREFIX}{user_id}"
+
+
+def _from_snapshot(snapshot):
+    """由快照构造已持久化的 User 并加入当前会话，不执行查询"""
+    user = User.__mapper__.class_manager.new_instance()
+    for field, value in snapshot.items():
+        setattr(user, field, value)
+    make_transient_to_detached(user)
+    db.session.add(user)
+    return user
+
+
+def get_user(user_id):
+    """
+    按ID获取用户，同一请求内多次调用只查询一次：
+    先查当前会话的标识映射（请求级），再查短时间的用户快照缓存（跨请求），最后查询数据库
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    identity_key = db.session.identity_key(User, user_id)
+    user = db.session.identity_map.get(identity_key)
+    if user is not None:
+        USER_LOOKUPS.labels(source='request').inc()
+        return user
+
+    snapshot = cache.get(_snapshot_key(user_id))
+    if snapshot is not None:
+        USER_LOOKUPS.labels(source='snapshot').inc()
+        return _from_snapshot(snapshot)
+
+    USER_LOOKUPS.labels(source='database').inc()
+    user = db.session.get(User, user_id)
+    if user is not None:
+        cache.set(_snapshot_key(user_id), {field: getattr(user, field) for field in _SNAPSHOT_FIELDS},
+                  timeout=USER_SNAPSHOT_TIMEOUT)
+    return user
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user_snapshot(_mapper, _connection, target):
+    try:
+        cache.delete(_snapshot_key(target.id))
+    except Exception as e:
+        current_app.logger.warning(f"清除用户快照失败: {e}")
+
 
 def auth_by_uid(article_id, user_id):
     try:
@@ -29,7 +93,7 @@ def check_user_conflict(zone, value):
 
 def db_save_avatar(user_id, avatar_uuid):
     try:
-        user = db.session.query(User).filter_by(id=user_id).first()
+        user = get_user(user_id)
         if user:
             user.profile_picture = avatar_uuid
             db.session.commit()
@@ -40,7 +104,7 @@ def db_save_avatar(user_id, avatar_uuid):
 
 def db_save_bio(user_id, bio):
     try:
-        user = db.session.query(User).filter_by(id=user_id).first()
+        user = get_user(user_id)
         if user:
             user.bio = bio
             db.session.commit()
@@ -54,7 +118,7 @@ def change_username(user_id, new_username):
     # 导出资料: 点击右上角头像 -> 点击设置 -> 点击导出资料
     try:
 
-        user = db.session.query(User).filter_by(id=user_id).first()
+        user = get_user(user_id)
         if user:
             user.username = new_username
             db.session.commit()
@@ -68,7 +132,7 @@ def bind_email(user_id, param):
         return False
     try:
 
-        user = db.session.query(User).filter_by(id=user_id).first()
+        user = get_user(user_id)
         if user:
             user.email = param
             db.session.commit()
@@ -85,7 +149,7 @@ def get_avatar(domain, user_identifier=None, identifier_type='id'):
     try:
 
         if identifier_type == 'id':
-            user = db.session.query(User).filter_by(id=user_identifier).first()
+            user = get_user(user_identifier)
         elif identifier_type == 'username':
             user = db.session.query(User).filter_by(username=user_identifier).first()
         else:
@@ -0,0 +1,170 @@
+"""
+会话活动时间
+请求中只记录访问令牌摘要对应的最近活动时间，不访问数据库：Redis 可用时写入哈希 session:activity:pending，
+否则写入进程内字典；同一会话的多次活动在落库前合并为一条。调度器定期用一条 UPDATE 语句批量写入 last_activity，
+只会把时间向后推进。会话列表在落库前从活动存储中读取最新时间。
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.database import get_db, redis_client
+from src.setting import app_config
+from src.utils.cache_protection import CacheLock
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'session:activity:pending'
+FLUSHING_KEY = 'session:activity:flushing'
+FLUSH_LOCK_KEY = 'session_activity_flush'
+
+
+class LocalActivityStore:
+    """进程内的活动时间，同一会话只保留最近一次"""
+
+    def __init__(self):
+        self._activity = {}
+        self._lock = threading.Lock()
+
+    def record(self, digest, timestamp):
+        with self._lock:
+            if timestamp > self._activity.get(digest, 0):
+                self._activity[digest] = timestamp
+
+    def get_many(self, digests):
+        with self._lock:
+            return {digest: self._activity[digest] for digest in digests if digest in self._activity}
+
+    def drain(self):
+        with self._lock:
+            activity, self._activity = self._activity, {}
+        return activity
+
+    def merge(self, activity):
+        """落库失败时放回"""
+        for digest, timestamp in activity.items():
+            self.record(digest, timestamp)
+
+
+local_activity_store = LocalActivityStore()
+
+
+def record_activity(digest, timestamp=None):
+    """记录会话活动"""
+    if not digest:
+        return
+    timestamp = timestamp or time.time()
+    if redis_client is not None:
+        try:
+            redis_client.hset(PENDING_KEY, digest, timestamp)
+            return
+        except Exception as e:
+            logger.warning(f"Redis 记录会话活动失败，改用进程内存储: {e}")
+    local_activity_store.record(digest, timestamp)
+
+
+def get_live_activity(digests):
+    """读取尚未落库的活动时间，返回 {digest: datetime}"""
+    digests = [digest for digest in digests if digest]
+    latest = local_activity_store.get_many(digests)
+    if redis_client is not None and digests:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hmget(PENDING_KEY, digests)
+            pipe.hmget(FLUSHING_KEY, digests)
+            for values in pipe.execute():
+                for digest, value in zip(digests, values):
+                    if value is not None and float(value) > latest.get(digest, 0):
+                        latest[digest] = float(value)
+        except Exception as e:
+            logger.warning(f"读取会话活动失败: {e}")
+    return {digest: datetime.fromtimestamp(timestamp) for digest, timestamp in latest.items()}
+
+
+def apply_live_activity(sessions):
+    """用活动存储中更新的时间覆盖会话对象的 last_activity，不标记为待提交的修改"""
+    live = get_live_activity(session.access_token_digest for session in sessions)
+    for session in sessions:
+        last_activity = live.get(session.access_token_digest)
+        if last_activity is not None and (session.last_activity is None or last_activity > session.last_activity):
+            set_committed_value(session, 'last_activity', last_activity)
+    return sessions
+
+
+def _apply_activity(activity, batch_size=500):
+    """用一条 UPDATE 语句写入一批会话的活动时间"""
+    items = sorted(activity.items())
+    with get_db() as session:
+        for i in range(0, len(items), batch_size):
+            batch = items[i:i + batch_size]
+            params = {}
+            for n, (digest, timestamp) in enumerate(batch):
+                params[f"k{n}"] = digest
+                params[f"t{n}"] = datetime.fromtimestamp(timestamp)
+
+            if app_config.db_engine == 'postgresql':
+                values = ', '.join(f"(CAST(:k{n} AS VARCHAR), CAST(:t{n} AS TIMESTAMP))" for n in range(len(batch)))
+                statement = (
+                    "UPDATE user_sessions SET last_activity = v.ts "
+                    f"FROM (VALUES {values}) AS v(digest, ts) "
+                    "WHERE user_sessions.access_token_digest = v.digest AND user_sessions.last_activity < v.ts"
+                )
+            else:
+                # 其他数据库不支持 UPDATE ... FROM (VALUES ...)，改用 CASE 表达式，同样只向后推进
+                cases = ' '.join(
+                    f"WHEN access_token_digest = :k{n} AND last_activity < :t{n} THEN :t{n}" for n in range(len(batch))
+                )
+                keys = ', '.join(f":k{n}" for n in range(len(batch)))
+                statement = (
+                    f"UPDATE user_sessions SET last_activity = CASE {cases} "
+                    "ELSE last_activity END "
+                    f"WHERE access_token_digest IN ({keys})"
+                )
+            session.execute(text(statement), params)
+
+
+def _take_redis_activity():
+    """将待落库的活动改名为落库中的键并读出，上次落库失败时直接重试该键"""
+    if not redis_client.exists(FLUSHING_KEY):
+        try:
+            redis_client.rename(PENDING_KEY, FLUSHING_KEY)
+        except Exception:
+            # 没有待落库的活动
+            return {}
+    return {digest: float(timestamp) for digest, timestamp in redis_client.hgetall(FLUSHING_KEY).items()}
+
+
+def flush_session_activity():
+    """将合并后的会话活动时间写入数据库，返回更新的会话数"""
+    flushed = 0
+
+    local_activity = local_activity_store.drain()
+    if local_activity:
+        try:
+            _apply_activity(local_activity)
+            flushed += len(local_activity)
+        except Exception as e:
+            local_activity_store.merge(local_activity)
+            logger.error(f"写入会话活动失败: {e}")
+
+    if redis_client is None:
+        return flushed
+
+    lock = CacheLock(FLUSH_LOCK_KEY, expire=60)
+    if not lock.acquire(timeout=0):
+        return flushed
+    try:
+        redis_activity = _take_redis_activity()
+        if redis_activity:
+            _apply_activity(redis_activity)
+            redis_client.delete(FLUSHING_KEY)
+            flushed += len(redis_activity)
+    except Exception as e:
+        logger.error(f"写入 Redis 中的会话活动失败，将在下次重试: {e}")
+    finally:
+        lock.release()
+    return flushed
@@ -0,0 +1,162 @@
+"""
+用户空间统计
+统计数据保存在 user_stats 表中，用户空间页只需一次主键查询：
+关注、点赞、浏览、通知在写入时以 col = col + delta 增量更新，文章发布、下线、删除后
+按作者重新汇总文章相关的三项；统计行不存在时在首次读取时完整计算，调度器每天全量校正一次。
+"""
+import logging
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.models import Article, Notification, UserStats, UserSubscription, db
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = ('articles_count', 'followers_count', 'following_count',
+               'total_views', 'total_likes', 'unread_notifications')
+
+
+def _article_aggregates(user_ids):
+    rows = db.session.query(
+        Article.user_id, func.count(Article.article_id), func.sum(Article.views), func.sum(Article.likes)
+    ).filter(
+        Article.user_id.in_(user_ids),
+        Article.status == 1
+    ).group_by(Article.user_id).all()
+    return {user_id: (count, views or 0, likes or 0) for user_id, count, views, likes in rows}
+
+
+def compute_user_stats(user_ids):
+    """按当前数据计算一批用户的统计，返回 {user_id: {字段: 值}}"""
+    user_ids = list(user_ids)
+    stats = {user_id: dict.fromkeys(STAT_FIELDS, 0) for user_id in user_ids}
+    if not user_ids:
+        return stats
+
+    for user_id, (count, views, likes) in _article_aggregates(user_ids).items():
+        stats[user_id].update(articles_count=count, total_views=views, total_likes=likes)
+
+    followers = db.session.query(
+        UserSubscription.subscribed_user_id, func.count(UserSubscription.id)
+    ).filter(UserSubscription.subscribed_user_id.in_(user_ids)).group_by(UserSubscription.subscribed_user_id).all()
+    for user_id, count in followers:
+        stats[user_id]['followers_count'] = count
+
+    following = db.session.query(
+        UserSubscription.subscriber_id, func.count(UserSubscription.id)
+    ).filter(UserSubscription.subscriber_id.in_(user_ids)).group_by(UserSubscription.subscriber_id).all()
+    for user_id, count in following:
+        stats[user_id]['following_count'] = count
+
+    unread = db.session.query(
+        Notification.user_id, func.count(Notification.id)
+    ).filter(Notification.user_id.in_(user_ids), Notification.is_read == False).group_by(Notification.user_id).all()
+    for user_id, count in unread:
+        stats[user_id]['unread_notifications'] = count
+
+    return stats
+
+
+def get_user_stats(user_id):
+    """读取用户统计，统计行不存在时计算并写入"""
+    row = db.session.get(UserStats, user_id)
+    if row is not None:
+        return {field: getattr(row, field) for field in STAT_FIELDS}
+
+    stats = compute_user_stats([user_id])[user_id]
+    try:
+        with db.session.begin_nested():
+            db.session.add(UserStats(user_id=user_id, **stats))
+        db.session.commit()
+    except IntegrityError:
+        # 其他请求已写入
+        db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"写入用户 {user_id} 的统计失败: {e}")
+    return stats
+
+
+def adjust_user_stats(user_id, **deltas):
+    """
+    在当前事务中增量更新用户统计，由调用方提交；统计行不存在时不处理，首次读取时会完整计算
+    """
+    values = {getattr(UserStats, field): getattr(UserStats, field) + delta
+              for field, delta in deltas.items() if delta}
+    if values:
+        db.session.execute(update(UserStats).where(UserStats.user_id == user_id).values(values))
+
+
+def adjust_author_stats(article_id, **deltas):
+    """在当前事务中增量更新文章作者的统计"""
+    author_id = select(Article.user_id).where(Article.article_id == article_id).scalar_subquery()
+    values = {getattr(UserStats, field): getattr(UserStats, field) + delta
+              for field, delta in deltas.items() if delta}
+    if values:
+        db.session.execute(update(UserStats).where(UserStats.user_id == author_id).values(values))
+
+
+def set_user_stats(user_id, **values):
+    """在当前事务中直接设置用户统计字段"""
+    db.session.execute(update(UserStats).where(UserStats.user_id == user_id).values(**values))
+
+
+def apply_author_view_deltas(session, article_deltas):
+    """
+    浏览量落库时在同一事务中把文章的浏览量增量累加到作者统计，只计已发布文章
+
+    Args:
+        session: 执行浏览量落库的会话
+        article_deltas: {article_id: delta}
+    """
+    rows = session.execute(
+        select(Article.article_id, Article.user_id).where(
+            Article.article_id.in_(list(article_deltas)),
+            Article.status == 1
+        )
+    ).all()
+    user_deltas = {}
+    for article_id, user_id in rows:
+        if user_id is not None:
+            user_deltas[user_id] = user_deltas.get(user_id, 0) + article_deltas[article_id]
+    for user_id, delta in sorted(user_deltas.items()):
+        session.execute(update(UserStats).where(UserStats.user_id == user_id)
+                        .values(total_views=UserStats.total_views + delta))
+
+
+def refresh_author_article_stats(user_id):
+    """文章发布、编辑、下线或删除并提交后调用，重新汇总作者文章相关的统计"""
+    if user_id is None:
+        return
+    try:
+        count, views, likes = _article_aggregates([user_id]).get(user_id, (0, 0, 0))
+        set_user_stats(user_id, articles_count=count, total_views=views, total_likes=likes)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"更新用户 {user_id} 的文章统计失败: {e}")
+
+
+def reconcile_user_stats(batch_size=500):
+    """按当前数据重新计算所有已有统计行，修正增量维护产生的偏差，返回修正的字段数"""
+    corrected = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(UserStats).filter(
+            UserStats.user_id > last_id
+        ).order_by(UserStats.user_id).limit(batch_size).all()
+        if not rows:
+            break
+
+        stats = compute_user_stats(row.user_id for row in rows)
+        for row in rows:
+            for field, value in stats[row.user_id].items():
+                if getattr(row, field) != value:
+                    setattr(row, field, value)
+                    corrected += 1
+        last_id = rows[-1].user_id
+        db.session.commit()
+
+    logger.info(f"用户统计校正完成，修正 {corrected} 项")
+    return corrected
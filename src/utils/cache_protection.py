@@ -1,81 +1,334 @@
 """
 缓存防击穿保护工具模块
-实现三种常见的缓存防击穿策略：
-1. 错开TTL（在超时值中加入随机抖动）
-2. 基于锁的再生（只有一个请求会重新生成已过期的缓存）
-3. 提供过期数据（在后台重新生成时返回过期缓存）
+在 Flask-Caching 之上实现三种常见的缓存防击穿策略：
+1. 错开TTL（写入缓存时在超时值中加入随机抖动）
+2. 基于锁的再生（只有一个请求会重新生成已过期的缓存，Redis 可用时跨进程生效）
+3. 提供过期数据（在后台线程池中重新生成时返回过期缓存）
+
+装饰器的缓存键由函数全名和参数的 SHA-1 摘要组成，在不同进程、不同次启动之间保持一致。
+每个键前缀（第一个冒号之前的部分）的命中、未命中与返回过期数据次数可通过 get_cache_stats 查看。
 """
 
+import hashlib
 import random
 import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
-from typing import Any, Callable
+from typing import Any, Callable, Optional
 
 from flask import current_app
 from flask_caching import Cache
 
-# 用于实现锁机制的全局字典
-_cache_locks = {}
+from src.database import redis_client
+from src.logger_config import CACHE_REQUESTS
+from src.setting import app_config
+
+LOCK_PREFIX = 'cache:lock:'
+
+# 按键持有的进程内锁，没有线程持有或等待时自动回收
+_cache_locks = weakref.WeakValueDictionary()
 _locks_lock = threading.Lock()
 
+# 比较令牌后再删除，避免释放其他进程在锁过期后重新获得的锁
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 
 def staggered_ttl(timeout: int, jitter_range: float = 0.1) -> int:
     """
     为缓存超时添加随机抖动，避免大量缓存同时失效
-    
+
     Args:
         timeout: 基础超时时间（秒）
         jitter_range: 抖动范围（0-1之间的小数），例如0.1表示±10%
-    
+
     Returns:
         添加抖动后的超时时间
     """
     jitter = timeout * jitter_range
-    min_timeout = int(timeout - jitter)
-    max_timeout = int(timeout + jitter)
+    min_timeout = max(int(timeout - jitter), 1)
+    max_timeout = max(int(timeout + jitter), min_timeout)
     return random.randint(min_timeout, max_timeout)
 
 
-def cache_with_staggered_ttl(timeout: int = 300, jitter_range: float = 0.1):
+def make_cache_key(f: Callable, args: tuple, kwargs: dict) -> str:
     """
-    带有错开TTL的缓存装饰器
-    
-    Args:
-        timeout: 基础超时时间（秒）
-        jitter_range: 抖动范围（0-1之间的小数）
+    由函数全名和参数生成稳定的缓存键
+
+    参数使用 repr 序列化后取 SHA-1 摘要，关键字参数按名称排序，
+    不依赖每个进程随机化的 hash()。
     """
+    raw = repr((args, sorted(kwargs.items())))
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f"{f.__module__}.{f.__qualname__}:{digest}"
 
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            # 获取原始缓存装饰器
-            cache_decorator = current_app.extensions['cache']
 
-            # 生成带抖动的超时时间
-            staggered_timeout = staggered_ttl(timeout, jitter_range)
+class _CacheStats:
+    """按键前缀统计的命中、未命中与过期数据次数"""
 
-            # 应用缓存（此处简化实现，实际应该与Flask-Cache集成更紧密）
-            return f(*args, **kwargs)
+    RESULTS = ('hit', 'miss', 'stale')
 
-        return decorated_function
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
 
-    return decorator
+    def record(self, key: str, result: str):
+        prefix = key.split(':', 1)[0]
+        with self._lock:
+            counts = self._counts.setdefault(prefix, dict.fromkeys(self.RESULTS, 0))
+            counts[result] += 1
+        CACHE_REQUESTS.labels(prefix=prefix, result=result).inc()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {prefix: dict(counts) for prefix, counts in self._counts.items()}
+
+
+_stats = _CacheStats()
+
+
+def get_cache_stats() -> dict:
+    """当前进程内各键前缀的缓存统计，{prefix: {'hit': n, 'miss': n, 'stale': n}}"""
+    return _stats.snapshot()
 
 
 def get_cache_lock(key: str) -> threading.Lock:
     """
-    获取指定缓存键的锁对象
-    
+    获取指定缓存键的进程内锁对象
+
     Args:
         key: 缓存键
-        
+
     Returns:
-        对应的锁对象
+        对应的锁对象，调用方在使用期间需保持引用
     """
     with _locks_lock:
-        if key not in _cache_locks:
-            _cache_locks[key] = threading.Lock()
-        return _cache_locks[key]
+        lock = _cache_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _cache_locks[key] = lock
+        return lock
+
+
+class CacheLock:
+    """
+    缓存再生锁
+    Redis 可用时使用 SET NX PX 实现跨进程互斥，锁自带过期时间防止持有者崩溃后无法释放；
+    Redis 不可用或出错时退化为进程内锁。
+    """
+
+    def __init__(self, key: str, expire: int = 30):
+        self.key = key
+        self.expire = expire
+        self._token = None
+        self._local = None
+
+    def acquire(self, timeout: float = 10) -> bool:
+        """获取锁，timeout 为 0 时不等待"""
+        if redis_client is not None:
+            try:
+                return self._acquire_redis(timeout)
+            except Exception as e:
+                current_app.logger.warning(f"Redis cache lock unavailable for key {self.key}: {e}")
+        self._local = get_cache_lock(self.key)
+        if timeout <= 0:
+            return self._local.acquire(blocking=False)
+        return self._local.acquire(timeout=timeout)
+
+    def _acquire_redis(self, timeout: float) -> bool:
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        while True:
+            if redis_client.set(LOCK_PREFIX + self.key, token, nx=True, px=int(self.expire * 1000)):
+                self._token = token
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, 0.2)
+
+    def release(self):
+        if self._token is not None:
+            try:
+                redis_client.eval(_RELEASE_SCRIPT, 1, LOCK_PREFIX + self.key, self._token)
+            except Exception as e:
+                current_app.logger.warning(f"Failed to release cache lock {self.key}: {e}")
+            self._token = None
+        elif self._local is not None:
+            self._local.release()
+            self._local = None
+
+
+class _StaleRefresher:
+    """
+    过期数据的后台刷新
+    使用容量固定的线程池执行刷新任务，同一进程内同一个键同时只提交一个任务，
+    任务执行前再获取非阻塞的再生锁，避免多个进程重复刷新。
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='cache-refresh')
+        return self._executor
+
+    def submit(self, cache_instance: Cache, key: str, stale_key: str, generator_func: Callable,
+               fresh_timeout: int, stale_timeout: int) -> bool:
+        """提交刷新任务，该键已有任务在执行时返回 False"""
+        app = current_app._get_current_object()
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            try:
+                self._get_executor().submit(self._run, app, cache_instance, key, stale_key,
+                                            generator_func, fresh_timeout, stale_timeout)
+            except RuntimeError:
+                # 解释器退出时线程池已关闭
+                self._pending.discard(key)
+                return False
+        return True
+
+    def _run(self, app, cache_instance, key, stale_key, generator_func, fresh_timeout, stale_timeout):
+        try:
+            with app.app_context():
+                lock = CacheLock(key)
+                if not lock.acquire(timeout=0):
+                    return
+                try:
+                    _store(cache_instance, key, stale_key, generator_func(), fresh_timeout, stale_timeout)
+                except Exception as e:
+                    app.logger.error(f"Error updating stale cache {key}: {str(e)}")
+                finally:
+                    lock.release()
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+
+_refresher = _StaleRefresher(app_config.CACHE_REFRESH_WORKERS)
+
+
+def _store(cache_instance: Cache, key: str, stale_key: Optional[str], value: Any,
+           fresh_timeout: int, stale_timeout: int = 0, jitter_range: float = 0.1):
+    """写入新鲜数据（以及过期数据副本），超时时间均加入抖动"""
+    if value is None:
+        return
+    cache_instance.set(key, value, timeout=staggered_ttl(fresh_timeout, jitter_range))
+    if stale_key is not None:
+        cache_instance.set(stale_key, value, timeout=staggered_ttl(stale_timeout, jitter_range))
+
+
+def _get_with_staggered_ttl(cache_instance: Cache, key: str, generator_func: Callable,
+                            timeout: int, jitter_range: float) -> Any:
+    value = cache_instance.get(key)
+    if value is not None:
+        _stats.record(key, 'hit')
+        return value
+    _stats.record(key, 'miss')
+    value = generator_func()
+    _store(cache_instance, key, None, value, timeout, jitter_range=jitter_range)
+    return value
+
+
+def _get_with_lock(cache_instance: Cache, key: str, generator_func: Callable,
+                   timeout: int, lock_timeout: int) -> Any:
+    value = cache_instance.get(key)
+    if value is not None:
+        _stats.record(key, 'hit')
+        return value
+    _stats.record(key, 'miss')
+
+    lock = CacheLock(key, expire=max(lock_timeout * 3, 30))
+    if not lock.acquire(timeout=lock_timeout):
+        # 获取锁超时，可能数据库压力过大，直接查询数据库
+        current_app.logger.warning(f"Cache lock timeout for key: {key}")
+        return generator_func()
+
+    try:
+        # 再次检查缓存，等待期间其他请求可能已生成
+        value = cache_instance.get(key)
+        if value is not None:
+            return value
+        value = generator_func()
+        _store(cache_instance, key, None, value, timeout)
+        return value
+    finally:
+        lock.release()
+
+
+def _get_with_stale_data(cache_instance: Cache, key: str, generator_func: Callable,
+                         fresh_timeout: int, stale_timeout: int) -> Any:
+    stale_key = f"{key}:stale"
+
+    fresh_value = cache_instance.get(key)
+    if fresh_value is not None:
+        _stats.record(key, 'hit')
+        return fresh_value
+
+    stale_value = cache_instance.get(stale_key)
+    if stale_value is not None:
+        _stats.record(key, 'stale')
+        _refresher.submit(cache_instance, key, stale_key, generator_func, fresh_timeout, stale_timeout)
+        return stale_value
+
+    # 都没有时同步生成，通过锁保证只有一个请求查询数据库
+    _stats.record(key, 'miss')
+    lock = CacheLock(key)
+    if not lock.acquire(timeout=10):
+        current_app.logger.warning(f"Cache lock timeout for key: {key}")
+        return generator_func()
+    try:
+        value = cache_instance.get(key)
+        if value is not None:
+            return value
+        value = generator_func()
+        _store(cache_instance, key, stale_key, value, fresh_timeout, stale_timeout)
+        return value
+    finally:
+        lock.release()
+
+
+def _default_cache() -> Cache:
+    from src.extensions import cache
+    return cache
+
+
+def cache_with_staggered_ttl(timeout: int = 300, jitter_range: float = 0.1,
+                             cache_instance: Optional[Cache] = None):
+    """
+    带有错开TTL的缓存装饰器
+
+    Args:
+        timeout: 基础超时时间（秒）
+        jitter_range: 抖动范围（0-1之间的小数）
+        cache_instance: Flask-Cache实例，默认为应用的全局缓存
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return _get_with_staggered_ttl(cache_instance or _default_cache(),
+                                           make_cache_key(f, args, kwargs),
+                                           lambda: f(*args, **kwargs), timeout, jitter_range)
+
+        return decorated_function
+
+    return decorator
 
 
 def cache_with_regeneration(cache_instance: Cache,
@@ -83,7 +336,7 @@ def cache_with_regeneration(cache_instance: Cache,
                             lock_timeout: int = 10):
     """
     带有锁机制的缓存装饰器，防止缓存击穿
-    
+
     Args:
         cache_instance: Flask-Cache实例
         timeout: 缓存超时时间
@@ -93,39 +346,8 @@ def cache_with_regeneration(cache_instance: Cache,
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # 生成缓存键
-            cache_key = f"{f.__module__}.{f.__name__}:{hash(str(args) + str(kwargs))}"
-
-            # 尝试从缓存获取数据
-            value = cache_instance.get(cache_key)
-            if value is not None:
-                return value
-
-            # 缓存未命中，获取锁
-            lock = get_cache_lock(cache_key)
-            acquired = lock.acquire(timeout=lock_timeout)
-
-            if not acquired:
-                # 获取锁超时，可能数据库压力过大，直接查询数据库
-                current_app.logger.warning(f"Cache lock timeout for key: {cache_key}")
-                return f(*args, **kwargs)
-
-            try:
-                # 再次检查缓存，防止重复计算
-                value = cache_instance.get(cache_key)
-                if value is not None:
-                    return value
-
-                # 执行实际函数
-                value = f(*args, **kwargs)
-
-                # 存储到缓存
-                cache_instance.set(cache_key, value, timeout=timeout)
-
-                return value
-            finally:
-                # 释放锁
-                lock.release()
+            return _get_with_lock(cache_instance, make_cache_key(f, args, kwargs),
+                                  lambda: f(*args, **kwargs), timeout, lock_timeout)
 
         return decorated_function
 
@@ -137,7 +359,7 @@ def cache_with_stale_data(cache_instance: Cache,
                           stale_timeout: int = 3600):
     """
     支持返回过期数据的缓存装饰器
-    
+
     Args:
         cache_instance: Flask-Cache实例
         fresh_timeout: 新鲜数据的超时时间
@@ -147,77 +369,14 @@ def cache_with_stale_data(cache_instance: Cache,
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # 生成缓存键
-            cache_key = f"{f.__module__}.{f.__name__}:{hash(str(args) + str(kwargs))}"
-            stale_key = f"{cache_key}:stale"
-
-            # 尝试获取新鲜数据
-            fresh_value = cache_instance.get(cache_key)
-            if fresh_value is not None:
-                return fresh_value
-
-            # 尝试获取过期数据
-            stale_value = cache_instance.get(stale_key)
-            if stale_value is not None:
-                # 异步更新缓存（在新线程中执行）
-                thread = threading.Thread(
-                    target=update_stale_cache,
-                    args=(cache_instance, cache_key, stale_key, f, args, kwargs,
-                          fresh_timeout, stale_timeout)
-                )
-                thread.daemon = True
-                thread.start()
-
-                # 返回过期数据
-                return stale_value
-
-            # 都没有，执行函数获取数据
-            value = f(*args, **kwargs)
-
-            # 存储新鲜数据和过期数据
-            cache_instance.set(cache_key, value, timeout=fresh_timeout)
-            cache_instance.set(stale_key, value, timeout=stale_timeout)
-
-            return value
+            return _get_with_stale_data(cache_instance, make_cache_key(f, args, kwargs),
+                                        lambda: f(*args, **kwargs), fresh_timeout, stale_timeout)
 
         return decorated_function
 
     return decorator
 
 
-def update_stale_cache(cache_instance: Cache,
-                       cache_key: str,
-                       stale_key: str,
-                       func: Callable,
-                       args: tuple,
-                       kwargs: dict,
-                       fresh_timeout: int,
-                       stale_timeout: int):
-    """
-    更新过期缓存的辅助函数，在单独线程中运行
-    
-    Args:
-        cache_instance: Flask-Cache实例
-        cache_key: 新鲜数据缓存键
-        stale_key: 过期数据缓存键
-        func: 需要执行的函数
-        args: 函数参数
-        kwargs: 函数关键字参数
-        fresh_timeout: 新鲜数据超时时间
-        stale_timeout: 过期数据超时时间
-    """
-    try:
-        # 执行函数获取新数据
-        value = func(*args, **kwargs)
-
-        # 更新缓存
-        cache_instance.set(cache_key, value, timeout=fresh_timeout)
-        # 延长过期数据的生命周期
-        cache_instance.set(stale_key, value, timeout=stale_timeout)
-    except Exception as e:
-        current_app.logger.error(f"Error updating stale cache {cache_key}: {str(e)}")
-
-
 class ProtectedCache:
     """
     带有防击穿保护的缓存类
@@ -231,115 +390,47 @@ class ProtectedCache:
                                timeout: int = 300, jitter_range: float = 0.1) -> Any:
         """
         带有错开TTL的获取缓存方法
-        
+
         Args:
             key: 缓存键
-            default: 默认值
+            default: 默认值，未命中时以带抖动的超时时间写入缓存
             timeout: 基础超时时间
             jitter_range: 抖动范围
-            
+
         Returns:
             缓存值或默认值
         """
-        value = self.cache.get(key)
-        if value is None:
-            value = default
-            if default is not None:
-                staggered_timeout = staggered_ttl(timeout, jitter_range)
-                self.cache.set(key, default, timeout=staggered_timeout)
-        return value
+        return _get_with_staggered_ttl(self.cache, key, lambda: default, timeout, jitter_range)
 
     def get_with_lock(self, key: str, generator_func: Callable,
                       timeout: int = 300, lock_timeout: int = 10) -> Any:
         """
         带锁机制的获取缓存方法
-        
+
         Args:
             key: 缓存键
             generator_func: 用于生成缓存值的函数
             timeout: 缓存超时时间
             lock_timeout: 获取锁的超时时间
-            
+
         Returns:
             缓存值
         """
-        value = self.cache.get(key)
-        if value is not None:
-            return value
-
-        # 获取锁
-        lock = get_cache_lock(key)
-        acquired = lock.acquire(timeout=lock_timeout)
-
-        if not acquired:
-            # 获取锁超时，直接执行函数
-            current_app.logger.warning(f"Cache lock timeout for key: {key}")
-            return generator_func()
-
-        try:
-            # 再次检查缓存
-            value = self.cache.get(key)
-            if value is not None:
-                return value
-
-            # 生成值并缓存
-            value = generator_func()
-            self.cache.set(key, value, timeout=timeout)
-            return value
-        finally:
-            lock.release()
+        return _get_with_lock(self.cache, key, generator_func, timeout, lock_timeout)
 
     def get_with_stale_data(self, key: str, generator_func: Callable,
                             fresh_timeout: int = 300,
                             stale_timeout: int = 3600) -> Any:
         """
         支持过期数据的获取缓存方法
-        
+
         Args:
             key: 缓存键
             generator_func: 用于生成缓存值的函数
             fresh_timeout: 新鲜数据的超时时间
-            stale_timeout: 过期数据的超时时间
-            
+            stale_timeout: 过期数据的超时时间，过期数据保存在 "{key}:stale" 中
+
         Returns:
             缓存值
         """
-        stale_key = f"{key}:stale"
-
-        # 尝试获取新鲜数据
-        fresh_value = self.cache.get(key)
-        if fresh_value is not None:
-            return fresh_value
-
-        # 尝试获取过期数据
-        stale_value = self.cache.get(stale_key)
-        if stale_value is not None:
-            # 异步更新缓存
-            thread = threading.Thread(
-                target=self._update_stale_cache_async,
-                args=(key, stale_key, generator_func, fresh_timeout, stale_timeout)
-            )
-            thread.daemon = True
-            thread.start()
-
-            return stale_value
-
-        # 都没有，生成新值
-        value = generator_func()
-        self.cache.set(key, value, timeout=fresh_timeout)
-        self.cache.set(stale_key, value, timeout=stale_timeout)
-        return value
-
-    def _update_stale_cache_async(self, key: str, stale_key: str,
-                                  generator_func: Callable,
-                                  fresh_timeout: int, stale_timeout: int):
-        """
-        异步更新过期缓存
-        """
-        try:
-            value = generator_func()
-            self.cache.set(key, value, timeout=fresh_timeout)
-            # 延长过期数据生命周期
-            self.cache.set(stale_key, value, timeout=stale_timeout)
-        except Exception as e:
-            current_app.logger.error(f"Error updating stale cache {key}: {str(e)}")
+        return _get_with_stale_data(self.cache, key, generator_func, fresh_timeout, stale_timeout)
@@ -0,0 +1,141 @@
+"""
+系统设置快照
+SystemSettings 表的全部键值对由一次查询加载为只读映射，保存在进程内，热路径上的读取只是字典查找。
+后台修改设置后调用 publish_settings_changed：递增 Redis 中的版本号并通过发布/订阅通知所有进程，
+各进程的订阅线程收到通知后将快照标记为过期，下一次读取时重新加载。
+Redis 不可用或订阅中断期间，快照最多保留 SETTINGS_MAX_AGE 秒后重新加载。
+每个快照记录加载前读到的版本号，依赖设置的派生缓存（如站点框架）据此判断是否由当前快照生成。
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from types import MappingProxyType
+
+from src.database import redis_client
+from src.models import SystemSettings, db
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'system_settings:version'
+CHANNEL = 'system_settings:changed'
+SETTINGS_MAX_AGE = 300
+_RESUBSCRIBE_DELAY = 5
+
+
+class SettingsSnapshot:
+    """进程内的系统设置快照"""
+
+    def __init__(self, max_age=SETTINGS_MAX_AGE):
+        self.max_age = max_age
+        # (设置映射, 版本号)，一起替换，读取方不会拿到不配套的设置与版本
+        self._current = None
+        self._loaded_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def _is_fresh(self):
+        return (self._current is not None and not self._stale
+                and time.monotonic() - self._loaded_at < self.max_age)
+
+    def get(self):
+        """返回当前快照，过期时重新加载"""
+        return self.get_versioned()[0]
+
+    def get_versioned(self):
+        """返回 (当前快照, 快照版本号)，过期时重新加载"""
+        if self._is_fresh():
+            return self._current
+        return self._reload()
+
+    @staticmethod
+    def _read_version():
+        """加载前读取 Redis 中的版本号；Redis 不可用时每次加载都视为新版本"""
+        if redis_client is not None:
+            try:
+                return str(redis_client.get(VERSION_KEY) or 0)
+            except Exception as e:
+                logger.warning(f"读取系统设置版本失败: {e}")
+        return uuid.uuid4().hex
+
+    def _reload(self):
+        with self._lock:
+            if self._is_fresh():
+                return self._current
+            self._ensure_listener()
+            # 先清除标记，加载期间收到的通知会使本次结果再次过期；版本号在查询前读取，不会比设置内容新
+            self._stale = False
+            version = self._read_version()
+            try:
+                rows = db.session.query(SystemSettings.key, SystemSettings.value).all()
+            except Exception as e:
+                self._stale = True
+                if self._current is None:
+                    raise
+                logger.error(f"加载系统设置失败，继续使用旧快照: {e}")
+                return self._current
+            self._current = (MappingProxyType(dict(rows)), version)
+            self._loaded_at = time.monotonic()
+            return self._current
+
+    def mark_stale(self):
+        self._stale = True
+
+    def _ensure_listener(self):
+        if redis_client is None or (self._listener is not None and self._listener.is_alive()):
+            return
+        self._listener = threading.Thread(target=self._listen, name='settings-listener', daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # 订阅建立前的通知可能已错过
+                self.mark_stale()
+                for _ in pubsub.listen():
+                    self.mark_stale()
+            except Exception as e:
+                logger.warning(f"系统设置订阅中断，{_RESUBSCRIBE_DELAY} 秒后重试: {e}")
+                time.sleep(_RESUBSCRIBE_DELAY)
+
+    def _after_fork(self):
+        """子进程不继承订阅线程，重新订阅并加载"""
+        self._lock = threading.Lock()
+        self._listener = None
+        self._stale = True
+
+
+settings_snapshot = SettingsSnapshot()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=settings_snapshot._after_fork)
+
+
+def get_settings():
+    """全部系统设置的只读映射"""
+    return settings_snapshot.get()
+
+
+def get_versioned_settings():
+    """(全部系统设置的只读映射, 快照版本号)"""
+    return settings_snapshot.get_versioned()
+
+
+def get_setting(key, default=None):
+    """读取单个系统设置"""
+    return settings_snapshot.get().get(key, default)
+
+
+def publish_settings_changed():
+    """系统设置修改并提交后调用，通知所有进程重新加载"""
+    settings_snapshot.mark_stale()
+    if redis_client is None:
+        return
+    try:
+        redis_client.publish(CHANNEL, redis_client.incr(VERSION_KEY))
+    except Exception as e:
+        logger.error(f"发布系统设置版本失败: {e}")
@@ -1,6 +1,10 @@
+import hashlib
 import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from functools import lru_cache
+from urllib.parse import quote, urlencode
 
 from flask import current_app as app
 from pytz import UTC
@@ -54,64 +58,37 @@ def article_author(user_id):
 
 import markdown
 
-
-def md2html(markdown_text, **options):
-    """
-    专业的Markdown转HTML转换函数，支持多种扩展和配置
-
-    Args:
-        markdown_text: Markdown格式文本
-        **options: 转换选项，包含以下可配置项：
-            - style_theme: 样式主题 ('github', 'dark', 'minimal', 'academic', 'elegant')
-            - pygments_style: 代码高亮样式 ('default', 'github', 'monokai', 'vs', 'colorful', 'autumn')
-            - tab_length: 制表符长度 (默认4)
-            - enable_tables: 启用表格 (默认True)
-            - enable_fenced_code: 启用围栏代码块 (默认True)
-            - enable_sane_lists: 启用智能列表 (默认True)
-            - enable_footnotes: 启用脚注 (默认False)
-            - enable_attr_list: 启用属性列表 (默认False)
-            - enable_meta: 启用元数据 (默认False)
-            - enable_nl2br: 启用换行转<br> (默认False)
-            - enable_admonition: 启用警告框 (默认False)
-            - enable_code_highlight: 启用代码高亮 (默认True)
-            - enable_toc: 启用目录生成 (默认False)
-            - enable_superfences: 启用超级围栏(图表支持) (默认True)
-            - enable_tasklist: 启用任务列表 (默认True)
-            - enable_magiclink: 启用智能链接 (默认False)
-            - enable_emoji: 启用表情符号 (默认False)
-
-    Returns:
-        str: 转换后的HTML内容
-    """
-
-    # 默认选项
-    default_options = {
-        'style_theme': 'github',
-        'pygments_style': 'default',
-        'tab_length': 4,
-        'enable_tables': True,
-        'enable_fenced_code': True,
-        'enable_sane_lists': True,
-        'enable_footnotes': False,
-        'enable_attr_list': False,
-        'enable_meta': False,
-        'enable_nl2br': False,
-        'enable_admonition': False,
-        'enable_code_highlight': True,
-        'enable_toc': False,
-        'enable_superfences': True,
-        'enable_tasklist': True,
-        'enable_magiclink': False,
-        'enable_emoji': False,
-        'toc_title': '目录',
-        'toc_anchorlink': True,
-        'toc_permalink': True,
-        'toc_depth': 6,
-    }
-
-    # 合并用户选项
-    opts = {**default_options, **options}
-
+# 默认选项
+_MD_DEFAULT_OPTIONS = {
+    'style_theme': 'github',
+    'pygments_style': 'default',
+    'tab_length': 4,
+    'enable_tables': True,
+    'enable_fenced_code': True,
+    'enable_sane_lists': True,
+    'enable_footnotes': False,
+    'enable_attr_list': False,
+    'enable_meta': False,
+    'enable_nl2br': False,
+    'enable_admonition': False,
+    'enable_code_highlight': True,
+    'enable_toc': False,
+    'enable_superfences': True,
+    'enable_tasklist': True,
+    'enable_magiclink': False,
+    'enable_emoji': False,
+    'toc_title': '目录',
+    'toc_anchorlink': True,
+    'toc_permalink': True,
+    'toc_depth': 6,
+}
+
+# 只影响样式表、不影响转换结果的选项
+_MD_STYLE_OPTIONS = ('style_theme', 'inline_css')
+
+
+def _build_markdown(opts):
+    """按选项创建 Markdown 实例"""
     # 构建扩展列表
     extensions = []
     extension_configs = {}
@@ -196,25 +173,90 @@ def md2html(markdown_text, **options):
             'emoji_generator': lambda: None
         }
 
-    # 创建Markdown实例并转换
-    md = markdown.Markdown(
+    return markdown.Markdown(
         extensions=extensions,
         extension_configs=extension_configs,
         tab_length=opts['tab_length']
     )
 
-    html_content = md.convert(markdown_text)
 
-    # 添加CSS样式
-    css_style = _get_css_style(opts['style_theme'])
-    pygments_css = _get_pygments_css(opts['pygments_style'])
+class MarkdownPool:
+    """
+    按选项复用已初始化扩展的 Markdown 实例
+    实例在使用期间由调用方独占，归还前调用 reset() 清除上一次转换的状态
+    """
+
+    def __init__(self, max_idle=8):
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def converter(self, opts):
+        key = tuple(sorted((k, v) for k, v in opts.items() if k not in _MD_STYLE_OPTIONS))
+        with self._lock:
+            idle = self._idle.get(key)
+            md = idle.pop() if idle else None
+        if md is None:
+            md = _build_markdown(opts)
+        try:
+            yield md
+        finally:
+            md.reset()
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(md)
+
+
+markdown_pool = MarkdownPool()
+
+
+def md2html(markdown_text, **options):
+    """
+    专业的Markdown转HTML转换函数，支持多种扩展和配置
+
+    Args:
+        markdown_text: Markdown格式文本
+        **options: 转换选项，包含以下可配置项：
+            - style_theme: 样式主题 ('github', 'dark', 'minimal', 'academic', 'elegant')
+            - pygments_style: 代码高亮样式 ('default', 'github', 'monokai', 'vs', 'colorful', 'autumn')
+            - tab_length: 制表符长度 (默认4)
+            - enable_tables: 启用表格 (默认True)
+            - enable_fenced_code: 启用围栏代码块 (默认True)
+            - enable_sane_lists: 启用智能列表 (默认True)
+            - enable_footnotes: 启用脚注 (默认False)
+            - enable_attr_list: 启用属性列表 (默认False)
+            - enable_meta: 启用元数据 (默认False)
+            - enable_nl2br: 启用换行转<br> (默认False)
+            - enable_admonition: 启用警告框 (默认False)
+            - enable_code_highlight: 启用代码高亮 (默认True)
+            - enable_toc: 启用目录生成 (默认False)
+            - enable_superfences: 启用超级围栏(图表支持) (默认True)
+            - enable_tasklist: 启用任务列表 (默认True)
+            - enable_magiclink: 启用智能链接 (默认False)
+            - enable_emoji: 启用表情符号 (默认False)
+            - inline_css: 将样式内联到结果中，默认引用共享样式表 (默认False)
+
+    Returns:
+        str: 转换后的HTML内容
+    """
+
+    # 合并用户选项
+    opts = {**_MD_DEFAULT_OPTIONS, **options}
+
+    with markdown_pool.converter(opts) as md:
+        html_content = md.convert(markdown_text)
+
+    # 样式表按主题缓存，默认通过链接引用，浏览器只需下载一次
+    if opts.get('inline_css'):
+        style = f"<style>\n{markdown_stylesheet(opts['style_theme'], opts['pygments_style'])}\n</style>"
+    else:
+        style = f'<link rel="stylesheet" href="{markdown_stylesheet_url(opts["style_theme"], opts["pygments_style"])}">'
 
     # 包装结果
     result = f"""
-<style>
-{css_style}
-{pygments_css}
-</style>
+{style}
 <div class="markdown-content">
 {html_content}
 </div>
@@ -223,6 +265,23 @@ def md2html(markdown_text, **options):
     return result.strip()
 
 
+@lru_cache(maxsize=32)
+def markdown_stylesheet(theme, pygments_style='default'):
+    """获取指定主题与代码高亮样式的完整样式表"""
+    return f"{_get_css_style(theme)}\n{_get_pygments_css(pygments_style)}"
+
+
+@lru_cache(maxsize=32)
+def markdown_stylesheet_version(theme, pygments_style='default'):
+    """样式表内容摘要，用于链接的缓存版本号和 ETag"""
+    return hashlib.sha1(markdown_stylesheet(theme, pygments_style).encode('utf-8')).hexdigest()[:12]
+
+
+def markdown_stylesheet_url(theme, pygments_style='default'):
+    query = urlencode({'pygments': pygments_style, 'v': markdown_stylesheet_version(theme, pygments_style)})
+    return f"/markdown/{quote(theme)}.css?{query}"
+
+
 def _get_css_style(theme):
     """获取指定主题的CSS样式"""
     styles = {
@@ -0,0 +1,33 @@
+"""
+基于数据版本的 ETag
+由页面所依赖数据的版本（更新时间、数量等）计算 ETag，
+在查询正文数据和渲染模板之前与 If-None-Match 比较，命中时直接返回 304。
+"""
+import hashlib
+
+from flask import current_app, make_response, request
+
+# 上下文处理器注入、所有页面共用的变量，变化时页面也需要重新渲染
+_CHROME_KEYS = ('title', 'beian', 'domain', 'username', 'menu', 'footer', 'banner')
+
+
+def _chrome_version():
+    context = {}
+    current_app.update_template_context(context)
+    return repr([context.get(key) for key in _CHROME_KEYS])
+
+
+def data_etag(*parts):
+    """由数据版本计算强 ETag"""
+    raw = '|'.join(str(part) for part in parts) + '|' + _chrome_version()
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def not_modified(etag, cache_control='public, max-age=180'):
+    """If-None-Match 命中时返回 304 响应，否则返回 None"""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        return response
+    return None
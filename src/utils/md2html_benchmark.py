@@ -0,0 +1,78 @@
+"""
+md2html 微基准测试
+对比每次新建 Markdown 实例并内联样式（旧实现）与复用实例池并引用共享样式表的耗时。
+
+用法: python -m src.utils.md2html_benchmark [--rounds 200]
+"""
+import argparse
+import time
+
+from src.utils.filters import (_MD_DEFAULT_OPTIONS, _build_markdown, _get_css_style, _get_pygments_css,
+                               md2html)
+
+SAMPLE = '''
+# 标题
+
+一段包含 **加粗**、*斜体* 和 `行内代码` 的文字。
+
+- [x] 已完成
+- [ ] 未完成
+
+| 列1 | 列2 |
+| --- | --- |
+| a   | b   |
+
+```python
+def fib(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+```
+
+```mermaid
+graph TD; A-->B;
+```
+''' * 4
+
+
+def legacy_md2html(markdown_text, **options):
+    """旧实现：每次调用都创建 Markdown 实例并内联完整样式"""
+    opts = {**_MD_DEFAULT_OPTIONS, **options}
+    html_content = _build_markdown(opts).convert(markdown_text)
+    return f"""
+<style>
+{_get_css_style(opts['style_theme'])}
+{_get_pygments_css(opts['pygments_style'])}
+</style>
+<div class="markdown-content">
+{html_content}
+</div>
+""".strip()
+
+
+def _measure(func, rounds):
+    func(SAMPLE, style_theme='dark')
+    start = time.perf_counter()
+    for _ in range(rounds):
+        output = func(SAMPLE, style_theme='dark')
+    elapsed = time.perf_counter() - start
+    return elapsed / rounds * 1000, len(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='md2html 微基准测试')
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    legacy_ms, legacy_size = _measure(legacy_md2html, args.rounds)
+    pooled_ms, pooled_size = _measure(md2html, args.rounds)
+
+    print(f"{'实现':<8}{'平均耗时(ms)':>14}{'输出大小(字节)':>16}")
+    print(f"{'旧实现':<8}{legacy_ms:>14.3f}{legacy_size:>16}")
+    print(f"{'实例池':<8}{pooled_ms:>14.3f}{pooled_size:>16}")
+    print(f"加速比: {legacy_ms / pooled_ms:.2f}x")
+
+
+if __name__ == '__main__':
+    main()